@@ -0,0 +1,46 @@
+"""
+Micro-benchmark for FormatKeys key-path lookups.
+
+Compares resolving template paths with the key-path cache against parsing the
+path on every lookup, which is what FormatKeys.__getitem__ did before paths
+were compiled.
+
+    python benchmarks/format_keys_lookup.py
+"""
+import timeit
+
+from vespwood import FormatKeys
+from vespwood.format_object import compile_key_path
+
+
+PATHS = ["name", "docs#3", "docs#3.title", "docs#3.meta.tags#1", "docs#3.title?seen"]
+NUMBER = 100_000
+
+
+def build_keys() -> FormatKeys:
+    docs = [{"title": f"doc {i}", "meta": {"tags": ["a", "b", "c"]}} for i in range(50)]
+    format_keys = FormatKeys({"name": "bench", "docs": docs})
+    format_keys["docs#3.title?seen"] = True
+    return format_keys
+
+
+def lookup_uncached(format_keys: FormatKeys, key: str):
+    path = compile_key_path.__wrapped__(key)
+    value = format_keys.__resolve__(path.ops)
+    if path.extra is not None:
+        return value.extras[path.extra]
+    return value
+
+
+def main():
+    format_keys = build_keys()
+    print(f"{'path':<22}{'parse each time':>18}{'cached':>12}{'speedup':>10}")
+    for key in PATHS:
+        assert lookup_uncached(format_keys, key) == format_keys[key]
+        before = timeit.timeit(lambda: lookup_uncached(format_keys, key), number=NUMBER)
+        after = timeit.timeit(lambda: format_keys[key], number=NUMBER)
+        print(f"{key:<22}{before / NUMBER * 1e9:>15.0f} ns{after / NUMBER * 1e9:>9.0f} ns{before / after:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Micro-benchmark for the JSON backends of vespwood-generator.
+
+Encodes large tool results and decodes tool arguments with every installed
+backend, the standard library being what the converters used before the
+backend was pluggable.
+
+    python benchmarks/json_backend.py
+"""
+import timeit
+
+from vespwood_generator import ToolCall, get_json_backend, set_json_backend, json_dumps, json_loads
+
+
+BACKENDS = ["json", "orjson", "msgspec"]
+NUMBER = 200
+
+
+def build_results() -> dict[str, object]:
+    rows = [
+        {"id": i, "title": f"result {i}", "score": i / 7, "tags": ["alpha", "beta", "gamma"], "snippet": "lorem ipsum dolor sit amet " * 8}
+        for i in range(1_000)
+    ]
+    return {
+        "search results": {"query": "vespwood", "total": len(rows), "rows": rows},
+        "table": [[i * j for j in range(50)] for i in range(200)],
+        "document": {"text": "Tool output with a long body of text. " * 2_000},
+    }
+
+
+def main():
+    available = []
+    for name in BACKENDS:
+        try:
+            set_json_backend(name)
+            available.append(name)
+        except ImportError:
+            print(f"{name} is not installed, skipped")
+    default = get_json_backend().name
+
+    print(f"{'payload':<18}{'backend':<10}{'dumps':>12}{'loads':>12}{'tool repr':>12}")
+    for payload, result in build_results().items():
+        text = json_dumps(result)
+        tool = ToolCall(id="call_0", name="search", arguments={"query": "vespwood"}, result=result)
+        baseline = None
+        for name in available:
+            set_json_backend(name)
+            assert json_loads(json_dumps(result)) == json_loads(text)
+            dumps = timeit.timeit(lambda: json_dumps(result), number=NUMBER) / NUMBER
+            loads = timeit.timeit(lambda: json_loads(text), number=NUMBER) / NUMBER
+            tool_repr = timeit.timeit(lambda: str(tool), number=NUMBER) / NUMBER
+            baseline = baseline or dumps
+            print(f"{payload:<18}{name:<10}{dumps * 1e6:>9.0f} us{loads * 1e6:>9.0f} us{tool_repr * 1e6:>9.0f} us   dumps {baseline / dumps:.1f}x")
+    set_json_backend(default)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,16 @@
 
-import json
+from collections.abc import AsyncIterator
 import os
 from typing import Any
-from anthropic import AsyncAnthropic, RateLimitError as AnthropicRateLimitError, omit
+from anthropic import AsyncAnthropic, RateLimitError as AnthropicRateLimitError
 from vespwood_generator import (
+    Block,
+    Structured,
+    Delta, TextDelta, StructuredDelta, ToolCallDelta, BlockDone,
+    Usage,
     ToolCall,
     message_converter, 
+    json_dumps,
     Message, 
     Response,
     Generator, 
@@ -26,7 +31,7 @@ def _anthropic_messages_msg_converter(prompt: Message) -> list[dict[str, Any]]:
         if isinstance(block, str):
             content.append({"type": "text", "text": block})
         elif isinstance(block, dict):
-            content.append({"type": "text", "text": json.dumps(block)})
+            content.append({"type": "text", "text": json_dumps(block)})
         elif isinstance(block, ToolCall):
             content.append({"type": "tool_use", "id": block.id, "name": block.name, "input": block.arguments})
         
@@ -42,7 +47,7 @@ def _anthropic_messages_msg_converter(prompt: Message) -> list[dict[str, Any]]:
             content.append({
                 "type": "tool_result",
                 "tool_use_id": tool.id,
-                "content": json.dumps(tool.result)
+                "content": json_dumps(tool.result)
             })
         msgs.append({
             "role": "user",
@@ -51,31 +56,84 @@ def _anthropic_messages_msg_converter(prompt: Message) -> list[dict[str, Any]]:
     return msgs
 
 
+def _response_block(block: Any, idx: int, schema: Schema | None) -> Block | None:
+    if block.type == "text":
+        if schema and idx == 0:
+            return Structured(block.text, schema)
+        return block.text
+    elif block.type == "tool_use":
+        return ToolCall(id=block.id, name=block.name, arguments=block.input)
+    elif block.type == "thinking":
+        # TODO:
+        ...
+        # return ThinkingBlock(id=block.signature, content=block.thinking)
+    elif block.type == "redacted_thinking":
+        # TODO:
+        ...
+    return None
+
+
+def _usage(usage: Any) -> Usage:
+    return Usage(
+        input_tokens=(usage.input_tokens or 0) + (usage.cache_read_input_tokens or 0) + (usage.cache_creation_input_tokens or 0),
+        output_tokens=usage.output_tokens or 0,
+        cache_read_tokens=usage.cache_read_input_tokens or 0,
+        cache_write_tokens=usage.cache_creation_input_tokens or 0,
+    )
+
+
+def _mark_cached(message: dict[str, Any]) -> dict[str, Any]:
+    # Copied, converted messages can be shared between requests
+    content = message["content"]
+    return {**message, "content": [*content[:-1], {**content[-1], "cache_control": {"type": "ephemeral"}}]}
+
+
 class AnthropicMessagesGenerator(Generator):
-    __slots__ = ("model_name", "_model")
+    """
+    Messages with `cache` set become prompt cache breakpoints, so later requests
+    sharing the conversation up to them read it from the cache. With
+    `prompt_caching`, the end of every request is a breakpoint as well, which
+    caches the history of multi-turn conversations. At most MAX_CACHE_BREAKPOINTS
+    are sent, the last ones are kept.
+    """
+    __slots__ = ("model_name", "_model", "_prompt_caching")
+
+    MAX_CACHE_BREAKPOINTS = 4
 
     def __init__(self, 
                 api_key: str = os.getenv("ANTHROPIC_API_KEY"),
                 model: str | dict[str, str] = "claude-sonnet-4-5-20250929",
                 timeout: int = 300,
                 *args,
+                prompt_caching: bool = False,
                 **kwargs):
         self.model_name = model
         self._model = AsyncAnthropic(api_key=api_key, timeout=timeout)
-    
+        self._prompt_caching = prompt_caching
 
-    async def __prompt__(self, messages: list[Message], schema: Schema | None = None, tools: list[Tool] | None = None):
-        prompts = _anthropic_messages_msg_converter(messages)
-        
-        output_format = omit
-        if schema:
-            output_format = {
-                "type": "json_schema", 
-                "schema": schema.schema,
-            }
 
+    def __convert__(self, messages: list[Message]) -> list[dict[str, Any]]:
+        converted = []
+        breakpoints = []
+        for message in messages:
+            converted.extend(_anthropic_messages_msg_converter([message]))
+            if message.cache and converted:
+                breakpoints.append(len(converted) - 1)
+        if self._prompt_caching and converted:
+            breakpoints.append(len(converted) - 1)
+        for idx in sorted(set(breakpoints))[-self.MAX_CACHE_BREAKPOINTS:]:
+            if converted[idx]["content"]:
+                converted[idx] = _mark_cached(converted[idx])
+        return converted
+    
+
+    def __payload__(self, messages: list[Message], schema: Schema | None = None, tools: list[Tool] | None = None) -> dict[str, Any]:
+        payload = {
+            "max_tokens": 8192,
+            "model": self.model_name,
+            "messages": self.__convert__(messages),
+        }
 
-        anthropic_tools = omit
         if tools:
             anthropic_tools = []
             for tool in tools:
@@ -88,51 +146,78 @@ class AnthropicMessagesGenerator(Generator):
                         "description": tool.description
                     })
                 anthropic_tools.append(_anthropic_tool)
-                
+            payload["tools"] = anthropic_tools
+
+        if schema:
+            payload["output_format"] = {
+                "type": "json_schema", 
+                "schema": schema.schema,
+            }
+            payload["betas"] = ["structured-outputs-2025-11-13"]
+        return payload
+    
+
+    async def __prompt__(self, messages: list[Message], schema: Schema | None = None, tools: list[Tool] | None = None):
+        payload = self.__payload__(messages, schema, tools)
         
         try:
-            message = await self._model.messages.create(
-                max_tokens=8192,
-                model=self.model_name,
-                messages=prompts,
-                tools=anthropic_tools,
-            ) if output_format == omit else await self._model.beta.messages.create(
-                max_tokens=8192,
-                model=self.model_name,
-                messages=prompts,
-                tools=anthropic_tools,
-                output_format=output_format,
-                betas=["structured-outputs-2025-11-13"]
-            )
+            message = await self._model.messages.create(**payload) if "output_format" not in payload else await self._model.beta.messages.create(**payload)
 
             # Refusal
             if message.stop_reason == "refusal":
                 raise StopGeneration(f"Anthropic model {self.model_name} refused to respond to this request")
             
             # Tool Call
-            response = Response([])
+            response = Response([], usage=_usage(message.usage))
             for idx, block in enumerate(message.content):
-                if block.type == "text":
-                    if schema and idx == 0:
-                        response.append(json.loads(block.text))
-                    else:
-                        response.append(block.text)
-                elif block.type == "tool_use":
-                    response.append(ToolCall(id=block.id, name=block.name, arguments=block.input))
-                elif block.type == "thinking":
-                    # TODO:
-                    ...
-                    # response.append(ThinkingBlock(id=block.signature, content=block.thinking))
-                elif block.type == "redacted_thinking":
-                    # TODO:
-                    ...
+                if (_block := _response_block(block, idx, schema)) is not None:
+                    response.append(_block)
 
             # Unfinished Response
             if message.stop_reason == "max_tokens" or message.stop_reason == "model_context_window_exceeded":
                 print("Output token limit exceeded. Continuing generation...")
-                raise MaxTokenLimitError(response.content)
+                raise MaxTokenLimitError(response.content, usage=response.usage)
 
             return response
         
-        except AnthropicRateLimitError:
-            raise RateLimitError()
+        except AnthropicRateLimitError as e:
+            raise RateLimitError.from_headers(e.response.headers) from e
+
+
+    async def __prompt_stream__(self, messages: list[Message], schema: Schema | None = None, tools: list[Tool] | None = None) -> AsyncIterator[Delta]:
+        payload = self.__payload__(messages, schema, tools)
+        messages_api = self._model.messages if "output_format" not in payload else self._model.beta.messages
+
+        try:
+            async with messages_api.stream(**payload) as stream:
+                content: list[Block] = []
+                async for event in stream:
+                    if event.type == "content_block_start":
+                        if event.content_block.type == "tool_use":
+                            yield ToolCallDelta(event.index, event.content_block.id, event.content_block.name, "")
+                    elif event.type == "content_block_delta":
+                        if event.delta.type == "text_delta":
+                            if schema and event.index == 0:
+                                yield StructuredDelta(event.index, event.delta.text)
+                            else:
+                                yield TextDelta(event.index, event.delta.text)
+                        elif event.delta.type == "input_json_delta":
+                            yield ToolCallDelta(event.index, None, None, event.delta.partial_json)
+                    elif event.type == "content_block_stop":
+                        if (block := _response_block(event.content_block, event.index, schema)) is not None:
+                            content.append(block)
+                            yield BlockDone(event.index, block)
+                message = await stream.get_final_message()
+                yield _usage(message.usage)
+
+            # Refusal
+            if message.stop_reason == "refusal":
+                raise StopGeneration(f"Anthropic model {self.model_name} refused to respond to this request")
+
+            # Unfinished Response
+            if message.stop_reason == "max_tokens" or message.stop_reason == "model_context_window_exceeded":
+                print("Output token limit exceeded. Continuing generation...")
+                raise MaxTokenLimitError(content, usage=_usage(message.usage))
+
+        except AnthropicRateLimitError as e:
+            raise RateLimitError.from_headers(e.response.headers) from e
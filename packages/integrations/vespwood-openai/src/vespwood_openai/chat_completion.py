@@ -1,11 +1,14 @@
-import json
+from collections.abc import AsyncIterator
 import os
 from typing import Any
 
-from openai import NOT_GIVEN, AsyncOpenAI, RateLimitError as OpenAIRateLimitError
+from openai import AsyncOpenAI, RateLimitError as OpenAIRateLimitError
 
 from vespwood_generator import (
+    Delta, TextDelta, StructuredDelta, ToolCallDelta, BlockDone,
     message_converter, 
+    json_dumps,
+    json_loads,
     Message,
     Response,
     Structured,
@@ -34,7 +37,7 @@ def _openai_chat_completion_msg_converter(message: Message) -> list[dict[str, An
         elif isinstance(block, dict):
             msgs.append({
                 "role": message.role,
-                "content": json.dumps(block)
+                "content": json_dumps(block)
             })
         elif isinstance(block, ToolCall):
             msgs.append({
@@ -44,7 +47,7 @@ def _openai_chat_completion_msg_converter(message: Message) -> list[dict[str, An
                     "type": "function",
                     "function": {
                         "name": block.name,
-                        "arguments": json.dumps(block.arguments)
+                        "arguments": json_dumps(block.arguments)
                     }
                 }
             })
@@ -52,7 +55,7 @@ def _openai_chat_completion_msg_converter(message: Message) -> list[dict[str, An
                 msgs.append({
                     "role": "tool",
                     "tool_call_id": block.id,
-                    "content": json.dumps(block.result)
+                    "content": json_dumps(block.result)
                 })
     return [*msgs]
 
@@ -71,12 +74,14 @@ class OpenAIChatCompletionGenerator(Generator):
         self._model: AsyncOpenAI = AsyncOpenAI(api_key=api_key, timeout=timeout)
         
 
-    async def __prompt__(self, messages: list[Message], schema: Schema | None = None, tools: list[Tool] | None = None) -> Response: 
-        prompts = _openai_chat_completion_msg_converter(messages)
+    def __payload__(self, messages: list[Message], schema: Schema | None = None, tools: list[Tool] | None = None) -> dict[str, Any]:
+        payload = {
+            "model": self.model_name,
+            "messages": _openai_chat_completion_msg_converter(messages),
+        }
 
-        response_format = NOT_GIVEN
         if schema:
-            response_format = {
+            payload["response_format"] = {
                 "type": "json_schema", 
                 "json_schema": {
                     "name": schema.name,
@@ -85,9 +90,8 @@ class OpenAIChatCompletionGenerator(Generator):
                     }
                 }
 
-        tools_schema = NOT_GIVEN
         if tools:
-            tools_schema = [{
+            payload["tools"] = [{
             "type": "function",
             "function": {
                 "name": tool.name,
@@ -96,14 +100,14 @@ class OpenAIChatCompletionGenerator(Generator):
                 "strict": True
             }
         } for tool in tools]
+        return payload
+        
+
+    async def __prompt__(self, messages: list[Message], schema: Schema | None = None, tools: list[Tool] | None = None) -> Response: 
+        payload = self.__payload__(messages, schema, tools)
 
         try:
-            response = await self._model.chat.completions.create(
-                model=self.model_name, 
-                messages=prompts, 
-                response_format=response_format,
-                tools=tools_schema,
-            )
+            response = await self._model.chat.completions.create(**payload)
 
             # Refusal
             if response.choices[0].message.refusal:
@@ -111,21 +115,82 @@ class OpenAIChatCompletionGenerator(Generator):
 
             # Tool Call
             if response.choices[0].finish_reason == "tool_calls":
-                blocks = [ToolCall(id=tool.id, name=tool.function.name, arguments=json.loads(tool.function.arguments)) for tool in response.choices[0].message.tool_calls]
+                blocks = [ToolCall(id=tool.id, name=tool.function.name, arguments=json_loads(tool.function.arguments)) for tool in response.choices[0].message.tool_calls]
                 if text := response.choices[0].message.content:
                     blocks = [text, *blocks]
                 return Response(blocks)
                 
             # Unfinished Response
             elif response.choices[0].finish_reason == "length":
-                raise MaxTokenLimitError(response.choices[0].message.content)
+                content = response.choices[0].message.content
+                raise MaxTokenLimitError([content] if content else [])
             
             # Structured Response
             if schema:
-                return Response(Structured(response.choices[0].message.content))
+                return Response(Structured(response.choices[0].message.content, schema))
             
             # Content
             return Response(response.choices[0].message.content)
         
         except OpenAIRateLimitError as e:
-            raise RateLimitError()
\ No newline at end of file
+            raise RateLimitError.from_headers(e.response.headers) from e
+
+    async def __prompt_stream__(self, messages: list[Message], schema: Schema | None = None, tools: list[Tool] | None = None) -> AsyncIterator[Delta]:
+        payload = self.__payload__(messages, schema, tools)
+
+        # The text is block 0 and the tool call at index i is block i + 1
+        text: list[str] = []
+        refusal: list[str] = []
+        tool_calls: dict[int, tuple[str, str, list[str]]] = {}
+        done: set[int] = set()
+        finish_reason = None
+
+        def tool_call_done(idx: int) -> BlockDone:
+            done.add(idx)
+            id, name, arguments = tool_calls[idx]
+            return BlockDone(idx + 1, ToolCall(id=id, name=name, arguments=json_loads("".join(arguments))))
+
+        try:
+            stream = await self._model.chat.completions.create(**payload, stream=True)
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                delta = choice.delta
+                if delta.refusal:
+                    refusal.append(delta.refusal)
+                if delta.content:
+                    text.append(delta.content)
+                    yield StructuredDelta(0, delta.content) if schema else TextDelta(0, delta.content)
+                for call in delta.tool_calls or ():
+                    if call.index not in tool_calls:
+                        # Text comes before the tool calls, and each tool call's arguments before the next one
+                        if not tool_calls and text:
+                            yield BlockDone(0, "".join(text))
+                        for idx in tool_calls.keys() - done:
+                            yield tool_call_done(idx)
+                        tool_calls[call.index] = (call.id, call.function.name, [])
+                        yield ToolCallDelta(call.index + 1, call.id, call.function.name, "")
+                    if call.function and call.function.arguments:
+                        tool_calls[call.index][2].append(call.function.arguments)
+                        yield ToolCallDelta(call.index + 1, None, None, call.function.arguments)
+                if choice.finish_reason:
+                    finish_reason = choice.finish_reason
+
+        except OpenAIRateLimitError as e:
+            raise RateLimitError.from_headers(e.response.headers) from e
+
+        # Refusal
+        if refusal:
+            raise StopGeneration("".join(refusal))
+
+        # Unfinished Response
+        if finish_reason == "length":
+            raise MaxTokenLimitError(["".join(text)] if text else [])
+
+        if tool_calls:
+            for idx in sorted(tool_calls.keys() - done):
+                yield tool_call_done(idx)
+        elif text:
+            # Structured Response or Content
+            yield BlockDone(0, Structured("".join(text), schema) if schema else "".join(text))
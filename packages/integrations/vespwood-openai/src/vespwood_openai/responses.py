@@ -1,9 +1,14 @@
-import json
+from collections.abc import AsyncIterator
 import os
+from typing import Any
 
-from openai import NOT_GIVEN, AsyncOpenAI, RateLimitError as OpenAIRateLimitError
+from openai import AsyncOpenAI, RateLimitError as OpenAIRateLimitError
 from vespwood_generator import (
+    Block,
+    Delta, TextDelta, StructuredDelta, ToolCallDelta, BlockDone,
     message_converter, 
+    json_dumps,
+    json_loads,
     Message,
     Response,
     Structured,
@@ -24,12 +29,12 @@ def _openai_response_msg_converter(prompt: Message):
         if isinstance(block, str):
             content.append({"type": t, "text": block})
         elif isinstance(block, dict):
-            content.append({"type": t, "text": json.dumps(block)})
+            content.append({"type": t, "text": json_dumps(block)})
         elif isinstance(block, ToolCall):
             if content:
                 msgs.append({"role": prompt.role, "content": content})
                 content = []
-            msgs.append({"call_id": block.id, "type": "function_call", "name": block.name, "arguments": json.dumps(block.arguments)})
+            msgs.append({"call_id": block.id, "type": "function_call", "name": block.name, "arguments": json_dumps(block.arguments)})
         
     msgs.append({
         "role": "developer" if prompt.role == "system" else prompt.role,
@@ -43,11 +48,28 @@ def _openai_response_msg_converter(prompt: Message):
             msgs.append({
                 "type": "function_call_output",
                 "call_id": tool.id,
-                "output": json.dumps(tool.result)
+                "output": json_dumps(tool.result)
             })
     return msgs
 
 
+def _response_blocks(item: Any, schema: Schema | None) -> list[Block]:
+    if item.type == "message":
+        if schema:
+            text = item.model_dump()["content"][0]["text"]
+            return [Structured(text, schema)]
+        return [block.text for block in item.content if block.type == "output_text"]
+    elif item.type == "function_call":
+        return [ToolCall(id=item.id, name=item.name, arguments=json_loads(item.arguments))]
+    elif item.type == "reasoning":
+        # TODO:
+        ...
+    # elif block.type == "thinking":
+    #     response.append(ThinkingBlock(id=block.signature, content=block.thinking))
+    # elif block.type == "redacted_thinking":
+    return []
+
+
 class OpenAIResponsesGenerator(Generator):
     def __init__(self, 
         api_key: str = os.getenv("OPENAI_API_KEY"), 
@@ -60,35 +82,38 @@ class OpenAIResponsesGenerator(Generator):
         self._model = AsyncOpenAI(api_key=api_key, timeout=timeout)
 
 
-    async def __prompt__(self, messages: list[Message], schema: Schema | None = None, tools: list[Tool] | None = None) -> Response:
-        prompts = _openai_response_msg_converter(messages)
-        
-        output_format = NOT_GIVEN
+    def __payload__(self, messages: list[Message], schema: Schema | None = None, tools: list[Tool] | None = None) -> dict[str, Any]:
+        payload = {
+            "model": self.model_name,
+            "input": _openai_response_msg_converter(messages),
+            "store": False
+        }
+
         if schema:
-            output_format = {
-                "type": "json_schema", 
-                "name": schema.name,
-                "schema": schema.schema,
+            payload["text"] = {
+                "format": {
+                    "type": "json_schema", 
+                    "name": schema.name,
+                    "schema": schema.schema,
+                }
             }
 
-        openai_tools = NOT_GIVEN
         if tools:
-            openai_tools = [{
+            payload["tools"] = [{
                 "type": "function",
                 "name": tool.name,
                 "description": tool.description,
                 "parameters": tool.schema
                 } for tool in tools
             ]
+        return payload
+
+
+    async def __prompt__(self, messages: list[Message], schema: Schema | None = None, tools: list[Tool] | None = None) -> Response:
+        payload = self.__payload__(messages, schema, tools)
         
         try:
-            response = await self._model.responses.create(
-                model=self.model_name,
-                input=prompts,
-                tools=openai_tools,
-                text={"format": output_format},
-                store=False
-            )
+            response = await self._model.responses.create(**payload)
             
             # Unfinished Response
             # if response.stop_reason == "max_tokens" or response.stop_reason == "model_context_window_exceeded":
@@ -98,24 +123,40 @@ class OpenAIResponsesGenerator(Generator):
             # Tool Call
             r = Response()
             for message in response.output:
-                if message.type == "message":
-                    if schema:
-                        text = message.model_dump()["content"][0]["text"]
-                        r.append(Structured(text))
-                    else:
-                        for block in message.content:
-                            if block.type == "output_text":
-                                r.append(block.text)
-                elif message.type == "function_call":
-                    r.append(ToolCall(id=message.id, name= message.name, arguments=json.loads(message.arguments)))
-                elif message.type == "reasoning":
-                    # TODO:
-                    ...
-                # elif block.type == "thinking":
-                #     response.append(ThinkingBlock(id=block.signature, content=block.thinking))
-                # elif block.type == "redacted_thinking":
+                r.extend(_response_blocks(message, schema))
 
             return r
         
-        except OpenAIRateLimitError:
-            raise RateLimitError()
\ No newline at end of file
+        except OpenAIRateLimitError as e:
+            raise RateLimitError.from_headers(e.response.headers) from e
+
+    async def __prompt_stream__(self, messages: list[Message], schema: Schema | None = None, tools: list[Tool] | None = None) -> AsyncIterator[Delta]:
+        payload = self.__payload__(messages, schema, tools)
+
+        # Output items can hold several blocks, deltas are indexed by block in the Response
+        indices: dict[tuple[int, int], int] = {}
+        def index(output_index: int, content_index: int = 0) -> int:
+            return indices.setdefault((output_index, content_index), len(indices))
+
+        try:
+            stream = await self._model.responses.create(**payload, stream=True)
+            async for event in stream:
+                if event.type == "response.output_text.delta":
+                    idx = index(event.output_index, event.content_index)
+                    yield StructuredDelta(idx, event.delta) if schema else TextDelta(idx, event.delta)
+                elif event.type == "response.output_item.added":
+                    if event.item.type == "function_call":
+                        yield ToolCallDelta(index(event.output_index), event.item.id, event.item.name, "")
+                elif event.type == "response.function_call_arguments.delta":
+                    yield ToolCallDelta(index(event.output_index), None, None, event.delta)
+                elif event.type == "response.output_item.done":
+                    blocks = _response_blocks(event.item, schema)
+                    if event.item.type == "message" and not schema:
+                        content_indices = [i for i, block in enumerate(event.item.content) if block.type == "output_text"]
+                    else:
+                        content_indices = [0] * len(blocks)
+                    for content_index, block in zip(content_indices, blocks):
+                        yield BlockDone(index(event.output_index, content_index), block)
+
+        except OpenAIRateLimitError as e:
+            raise RateLimitError.from_headers(e.response.headers) from e
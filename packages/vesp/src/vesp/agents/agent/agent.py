@@ -68,6 +68,7 @@ class Agent(BaseAgent, Generic[O]):
     def __call__(self,  args: PreparedArgs) -> Invokation[O]:
         chain = Invokation()
         async def run_with() -> O:
+            chain.set_current()
             result = await self.invoke(args)
             return await self.__get_output__(*result, chain=chain)
         task = asyncio.create_task(run_with())
@@ -96,6 +97,7 @@ class LocalAgentMixin:
         interceptors: list[Interceptor] = [],
         max_requests: int = 0, 
         delay_constant: int = 0, 
+        stream: bool = False,
         *args, 
         **kwargs
     ):
@@ -118,12 +120,16 @@ class LocalAgentMixin:
                 interceptors=interceptors,
                 delay_constant=delay_constant, 
                 max_requests=max_requests, 
+                stream=stream,
             )
+            self._stream = stream
             super().__init__(*args, **kwargs)
 
 
     async def invoke(self, args: PreparedArgs) -> tuple[TaggedMessages, FormatKeys]:
-        return await self._completor(args)
+        # Deltas go to the invokation this call belongs to, see Invokation.stream
+        chain = Invokation.current() if self._stream else None
+        return await self._completor(args, on_delta=chain.add_delta if chain else None)
 
 
 T = TypeVar("T", bound=Agent)
@@ -137,7 +143,8 @@ def agent(
         hooks: list[Hook] = [],
         validators: list[Validator] = [], 
         max_requests: int = 0, 
-        delay_constant: int = 0
+        delay_constant: int = 0,
+        stream: bool = False
     ):
     def decorator(cls: type[T]) -> type[T]:
         if not issubclass(cls, Agent):
@@ -170,6 +177,7 @@ def agent(
                             interceptors=interceptors,
                             max_requests=max_requests,
                             delay_constant=delay_constant,
+                            stream=stream,
                             *args,
                             **kwargs
                         )                
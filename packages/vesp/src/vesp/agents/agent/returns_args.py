@@ -17,6 +17,8 @@ def returns_args(func: Callable[Concatenate[Agent[O], I], Iterator[PreparedArgs]
     def fn(self: Agent[O], *args: I.args, **kwargs: I.kwargs) -> Invokation[O]:
         chain = Invokation()
         async def run_with():
+            # Tasks started below inherit it, so the Completor can stream deltas to the chain
+            chain.set_current()
             completion_futures: list[asyncio.Future] = []
             # Step 1: Prepare Args
             prepared_args_list = await func(self, *args, **kwargs)
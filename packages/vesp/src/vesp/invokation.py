@@ -1,9 +1,13 @@
 from __future__ import annotations
 import asyncio
+from collections.abc import AsyncIterator
+from contextvars import ContextVar
 from typing import Callable, TypeVar, Generic
 import uuid
 from weakref import ReferenceType, ref
 
+from vespwood import Tag, Delta
+
 
 class AliveCountRef:
     __slots__ = '_count', '_dropped_to_zero', '_on_zero_alive_callbacks'
@@ -102,6 +106,8 @@ class Invokation(Generic[D]):
         '_on_next_callbacks', 
         '_on_complete_callbacks', 
         '_on_chain_dead_callbacks', 
+        '_on_delta_callbacks',
+        '_delta_queues',
         '_unprocessed_output_count_ref', 
         '_alive_chain_count_ref', 
         '_future',
@@ -121,6 +127,8 @@ class Invokation(Generic[D]):
         self._on_next_callbacks: list[Callable[["Invokation"], None]] = []
         self._on_complete_callbacks: list[Callable[[list[Output]], None]] = []
         self._on_chain_dead_callbacks: list[Callable[["Output"], None]] = []
+        self._on_delta_callbacks: list[Callable[[Tag, Delta], None]] = []
+        self._delta_queues: list[asyncio.Queue[tuple[Tag, Delta] | None]] = []
         self._unprocessed_output_count_ref: AliveCountRef = AliveCountRef()
         self._alive_chain_count_ref: AliveCountRef = AliveCountRef(1)
 
@@ -139,9 +147,22 @@ class Invokation(Generic[D]):
         self.inside = inside
         self.inside.on_chain_dead(lambda output: self.add_output(output.data))
         self.inside.on_all_chains_dead(lambda: self.mark_completed())
+        self.inside.on_delta(self.add_delta)
         return self
 
 
+    @staticmethod
+    def current() -> Invokation | None:
+        """
+        The invokation whose agent is running in the current task.
+        """
+        return _current.get()
+
+
+    def set_current(self):
+        _current.set(self)
+
+
     @property
     def route(self) -> str:
         return self._route
@@ -230,6 +251,33 @@ class Invokation(Generic[D]):
                     await self._event.wait()
 
 
+    def stream(self) -> AsyncIterator[tuple[Tag, Delta]]:
+        """
+        `async for tag, delta in invokation.stream():` iterates the deltas of the
+        responses generated from now on, until the invokation completes.
+        """
+        queue: asyncio.Queue[tuple[Tag, Delta] | None] = asyncio.Queue()
+        if self.is_completed:
+            queue.put_nowait(None)
+        else:
+            self._delta_queues.append(queue)
+        return self._iter_deltas(queue)
+
+
+    async def _iter_deltas(self, queue: asyncio.Queue[tuple[Tag, Delta] | None]):
+        try:
+            while (item := await queue.get()) is not None:
+                yield item
+        finally:
+            if queue in self._delta_queues:
+                self._delta_queues.remove(queue)
+
+
+    def add_delta(self, tag: Tag, delta: Delta):
+        for queue in self._delta_queues: queue.put_nowait((tag, delta))
+        for callback in self._on_delta_callbacks: callback(tag, delta)
+
+
     def add_output(self, output: D):
         if self.is_completed:
             raise ValueError("Cannot add new output after marking this invokation complete")
@@ -272,6 +320,7 @@ class Invokation(Generic[D]):
             async with self._event:
                 self._event.notify_all()
         asyncio.create_task(_notify())
+        for queue in self._delta_queues: queue.put_nowait(None)
         for callback in self._on_complete_callbacks: callback(self.outputs)
         if not self.outputs: self._unprocessed_output_count_ref.zero()
 
@@ -280,6 +329,10 @@ class Invokation(Generic[D]):
         self._on_output_callbacks.append(func)
 
 
+    def on_delta(self, func: Callable[[Tag, Delta], None]):
+        self._on_delta_callbacks.append(func)
+
+
     def on_complete(self, func: Callable[[list[Output[D]]], None]):
         self._on_complete_callbacks.append(func)
 
@@ -328,4 +381,7 @@ class Invokation(Generic[D]):
                 chains.extend(next.normalise())
             return chains
         else:
-            return [self.chain]
\ No newline at end of file
+            return [self.chain]
+
+
+_current: ContextVar[Invokation | None] = ContextVar("current_invokation", default=None)
@@ -15,19 +15,65 @@ from .message import (
     Response
 )
 
+from .usage import (
+    Usage
+)
+
+from .delta import (
+    Delta,
+    TextDelta,
+    StructuredDelta,
+    ToolCallDelta,
+    BlockDone
+)
+
 from .generator import (
     GeneratorClass,
     Generator
 )
 
+from .caching_generator import (
+    CachingGenerator
+)
+
+from .response_cache import (
+    ResponseCache,
+    MemoryResponseCache,
+    SQLiteResponseCache
+)
+
 from .message_converter import (
     message_converter
 )
 
+from .json_backend import (
+    JSONBackend,
+    get_json_backend,
+    set_json_backend,
+    json_dumps,
+    json_loads
+)
+
+from .scheduler import (
+    RateScheduler,
+    Permit,
+    TokenBucket,
+    estimate_tokens
+)
+
+from .backoff import (
+    backoff_delay
+)
+
+from .retry import (
+    RetryPolicy
+)
+
 from .schematic import (
     Schematic,
     Schema,
     Tool,
+    ToolCache,
 
     schema,
     tool
@@ -59,20 +105,44 @@ __all__ = [
     "ToolCall",
     "Block",
 
+    "Delta",
+    "TextDelta",
+    "StructuredDelta",
+    "ToolCallDelta",
+    "BlockDone",
+
     "GeneratorClass",
     "Generator",
+    "CachingGenerator",
+    "ResponseCache",
+    "MemoryResponseCache",
+    "SQLiteResponseCache",
 
     "message_converter",
+    "JSONBackend",
+    "get_json_backend",
+    "set_json_backend",
+    "json_dumps",
+    "json_loads",
+
+    "RateScheduler",
+    "Permit",
+    "TokenBucket",
+    "estimate_tokens",
+    "backoff_delay",
+    "RetryPolicy",
 
     "Validator",
     "validator",
 
     "Message",
     "Response",
+    "Usage",
 
     "Schematic",
     "Schema",
     "Tool",
+    "ToolCache",
     
     "schema",
     "tool",
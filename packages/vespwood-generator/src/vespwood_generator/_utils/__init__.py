@@ -1 +1,2 @@
-from .setup_init import setup_init
\ No newline at end of file
+from .setup_init import setup_init
+from .frozen import FrozenDict, FrozenList, freeze
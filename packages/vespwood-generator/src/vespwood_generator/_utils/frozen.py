@@ -0,0 +1,55 @@
+import copy
+from typing import Any
+
+
+def _read_only(self, *args, **kwargs):
+    raise TypeError(f"{type(self).__name__} is read-only, modify a copy of it instead")
+
+
+class FrozenDict(dict):
+    """
+    A dict that can't be modified, shared between its users. Serialized and
+    compared like a dict, copies of it are plain dicts.
+    """
+    __slots__ = ()
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __reduce__(self):
+        return type(self), (dict(self),)
+
+    def __copy__(self) -> dict:
+        return dict(self)
+
+    def __deepcopy__(self, memo: dict) -> dict:
+        return {key: copy.deepcopy(value, memo) for key, value in self.items()}
+
+
+class FrozenList(list):
+    """
+    A list that can't be modified, see FrozenDict.
+    """
+    __slots__ = ()
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = extend = insert = pop = remove = clear = sort = reverse = _read_only
+
+    def __reduce__(self):
+        return type(self), (list(self),)
+
+    def __copy__(self) -> list:
+        return list(self)
+
+    def __deepcopy__(self, memo: dict) -> list:
+        return [copy.deepcopy(value, memo) for value in self]
+
+
+def freeze(obj: Any) -> Any:
+    if isinstance(obj, (FrozenDict, FrozenList)):
+        return obj
+    if isinstance(obj, dict):
+        return FrozenDict({key: freeze(value) for key, value in obj.items()})
+    if isinstance(obj, list):
+        return FrozenList(freeze(value) for value in obj)
+    return obj
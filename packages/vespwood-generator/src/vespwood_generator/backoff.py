@@ -0,0 +1,9 @@
+import random
+
+
+def backoff_delay(attempt: int, *, base: float = 1.0, cap: float = 60.0, retry_after: float | None = None) -> float:
+    # Exponential backoff with full jitter, never shorter than what the provider asked for
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
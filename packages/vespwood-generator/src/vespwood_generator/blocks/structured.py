@@ -1,14 +1,49 @@
-import json
-from typing import Any
+from typing import Any, TYPE_CHECKING
+from vespwood_generator.json_backend import json_loads
+
+if TYPE_CHECKING:
+    from vespwood_generator.schematic import Schema
 
 
 class Structured(dict[str, Any]):
-    def __init__(self, data: str | dict):
+    __slots__ = "_value", "_error"
+
+    def __init__(self, data: str | dict, schema: "Schema | None" = None):
+        self._value = None
+        self._error: ValueError | None = None
+        if isinstance(data, str) and schema is not None and schema.fast:
+            # Decoded and validated straight from the text, the dict is built from the instance
+            try:
+                self._value = schema.decode(data)
+            except ValueError as e:
+                self._error = e
+            else:
+                data = schema.to_builtins(self._value)
         if isinstance(data, str):
-            super().__init__(json.loads(data))
+            super().__init__(json_loads(data))
         else:
             super().__init__(data)
 
+    @property
+    def value(self) -> Any:
+        """
+        The instance of the schema this block was decoded into, for responses
+        of fast schemas. None otherwise.
+        """
+        return self._value
+
+    def decode(self, schema: "Schema") -> Any:
+        """
+        Decodes the block into an instance of `schema`, unless it was already
+        decoded from the text of the response. Raises ValueError when it
+        doesn't match the schema.
+        """
+        if self._error is not None:
+            raise self._error
+        if self._value is None:
+            self._value = schema.decode(self)
+        return self._value
+
     def __getitem__(self, key):
         if "." in key:
             key_parts = key.split('.')
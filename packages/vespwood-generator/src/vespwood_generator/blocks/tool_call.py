@@ -1,6 +1,6 @@
 import copy
-import json
 from typing import Any
+from vespwood_generator.json_backend import json_dumps
 
 
 class ToolCall:
@@ -48,11 +48,11 @@ class ToolCall:
     
 
     def __str__(self):
-        return json.dumps(self.json, indent=2)
+        return json_dumps(self.json, indent=True)
     
     
     def __repr__(self):
-        return json.dumps(self.json, indent=2)
+        return json_dumps(self.json, indent=True)
     
 
     def copy(self):
@@ -0,0 +1,168 @@
+from __future__ import annotations
+from collections.abc import AsyncIterator
+from typing import Any
+import asyncio
+import copy
+import hashlib
+import json
+
+from vespwood_generator.blocks import Block
+from vespwood_generator.delta import Delta, BlockDone
+from vespwood_generator.generator import Generator
+from vespwood_generator.message import Message, Response
+from vespwood_generator.usage import Usage
+from vespwood_generator.schematic import Schema, Tool
+from vespwood_generator.response_cache import ResponseCache, MemoryResponseCache, _dumps, _loads
+
+
+class CachingGenerator(Generator):
+    """
+    Wraps a generator so identical requests are answered from `cache`, an
+    in-memory LRU unless given. Requests are keyed on a hash of the provider
+    payload, see `Generator.__payload__`. With `single_flight`, identical
+    requests made while one is in flight wait for it instead of being sent.
+
+    Every call returns its own Response, so it can be tagged with `@`.
+    """
+    __slots__ = "_generator", "_cache", "_single_flight", "_in_flight", "_hits", "_misses"
+
+    def __init__(self, generator: Generator, cache: ResponseCache | None = None, *, single_flight: bool = True):
+        self._generator = generator
+        self._cache = cache if cache is not None else MemoryResponseCache()
+        self._single_flight = single_flight
+        self._in_flight: dict[str, asyncio.Future] = {}
+        self._hits = 0
+        self._misses = 0
+
+
+    @property
+    def generator(self) -> Generator:
+        return self._generator
+
+
+    @property
+    def cache(self) -> ResponseCache:
+        return self._cache
+
+
+    @property
+    def hits(self) -> int:
+        return self._hits
+
+
+    @property
+    def misses(self) -> int:
+        return self._misses
+
+
+    def __getattr__(self, name: str) -> Any:
+        # model_name and other settings of the wrapped generator
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._generator, name)
+
+
+    def __payload__(self, messages: list[Message], schema: Schema | None = None, tools: list[Tool] | None = None) -> dict[str, Any] | None:
+        return self._generator.__payload__(messages, schema, tools)
+
+
+    async def __rejected__(self, messages: list[Message], schema: Schema | None, tools: list[Tool] | None, response: Response, **kwargs):
+        # Responses failing validation aren't replayed to the next identical request
+        await self._cache.delete(self.key(messages, schema, tools, **kwargs))
+        await self._generator.__rejected__(messages, schema, tools, response, **kwargs)
+
+
+    def key(self, messages: list[Message], schema: Schema | None = None, tools: list[Tool] | None = None, **kwargs) -> str:
+        payload = self._generator.__payload__(messages, schema, tools)
+        if payload is None:
+            payload = {
+                "messages": [message.json for message in messages],
+                "schema": { "name": schema.name, "schema": schema.schema } if schema else None,
+                "tools": [{ "name": tool.name, "description": tool.description, "schema": tool.schema } for tool in tools] if tools else None
+            }
+        generator = type(self._generator)
+        request = [f"{generator.__module__}.{generator.__qualname__}", getattr(self._generator, "model_name", None), payload, kwargs]
+        # Keys persisted by SQLiteResponseCache must not change with the installed JSON backend
+        data = json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+        return hashlib.sha256(data.encode()).hexdigest()
+
+
+    def __register__(self, key: str) -> asyncio.Future | None:
+        if not self._single_flight:
+            return None
+        # Registered before the cache lookup, which can yield to identical requests
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._in_flight[key] = future
+        return future
+
+
+    def __settle__(self, key: str, future: asyncio.Future | None, *, response: Response | None = None, error: BaseException | None = None):
+        if future is None:
+            return
+        if isinstance(error, (asyncio.CancelledError, GeneratorExit)):
+            future.cancel()
+        elif error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(_dumps(response))
+        del self._in_flight[key]
+
+
+    async def __prompt__(self, messages: list[Message], schema: Schema | None = None, tools: list[Tool] | None = None, **kwargs) -> Response:
+        key = self.key(messages, schema, tools, **kwargs)
+        if self._single_flight and key in self._in_flight:
+            self._hits += 1
+            return _loads(await asyncio.shield(self._in_flight[key]))
+
+        future = self.__register__(key)
+        try:
+            response = await self._cache.get(key)
+            if response is not None:
+                self._hits += 1
+            else:
+                self._misses += 1
+                response = await self._generator.__prompt__(messages, schema, tools, **kwargs)
+                await self._cache.set(key, response)
+        except BaseException as e:
+            self.__settle__(key, future, error=e)
+            raise
+        self.__settle__(key, future, response=response)
+        return response
+
+
+    async def __prompt_stream__(self, messages: list[Message], schema: Schema | None = None, tools: list[Tool] | None = None, **kwargs) -> AsyncIterator[Delta]:
+        # Misses stream from the wrapped generator, hits and shared requests only yield the finished blocks
+        key = self.key(messages, schema, tools, **kwargs)
+        if self._single_flight and key in self._in_flight:
+            self._hits += 1
+            response = _loads(await asyncio.shield(self._in_flight[key]))
+        else:
+            future = self.__register__(key)
+            try:
+                response = await self._cache.get(key)
+                if response is not None:
+                    self._hits += 1
+                else:
+                    self._misses += 1
+                    blocks: dict[int, Block] = {}
+                    usage = None
+                    async for delta in self._generator.__prompt_stream__(messages, schema, tools, **kwargs):
+                        if isinstance(delta, BlockDone):
+                            # Copied before the caller can give tool calls their results
+                            blocks[delta.index] = copy.deepcopy(delta.block)
+                        elif isinstance(delta, Usage):
+                            usage = delta
+                        yield delta
+                    generated = Response([blocks[index] for index in sorted(blocks)], usage=usage)
+                    await self._cache.set(key, generated)
+                    self.__settle__(key, future, response=generated)
+                    return
+            except BaseException as e:
+                self.__settle__(key, future, error=e)
+                raise
+            self.__settle__(key, future, response=response)
+        for index, block in enumerate(response):
+            yield BlockDone(index, block)
+        if response.usage is not None:
+            yield response.usage
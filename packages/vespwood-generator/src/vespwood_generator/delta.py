@@ -0,0 +1,44 @@
+from typing import NamedTuple, TypeAlias
+
+from vespwood_generator.blocks import Block
+from vespwood_generator.usage import Usage
+
+
+class TextDelta(NamedTuple):
+    """
+    More text for the block at `index` of the response.
+    """
+    index: int
+    text: str
+
+
+class StructuredDelta(NamedTuple):
+    """
+    More of the JSON text of the structured block at `index`, not valid JSON
+    until the block is done.
+    """
+    index: int
+    json: str
+
+
+class ToolCallDelta(NamedTuple):
+    """
+    More of the JSON arguments of the tool call at `index`. `id` and `name`
+    are set on the first delta of a tool call.
+    """
+    index: int
+    id: str | None
+    name: str | None
+    arguments: str
+
+
+class BlockDone(NamedTuple):
+    """
+    The finished block at `index`, as it appears in the Response.
+    """
+    index: int
+    block: Block
+
+
+# Streams may end with the Usage of the response
+Delta: TypeAlias = TextDelta | StructuredDelta | ToolCallDelta | BlockDone | Usage
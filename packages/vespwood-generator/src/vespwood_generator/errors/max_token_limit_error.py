@@ -1,7 +1,15 @@
 from vespwood_generator.blocks import Block
+from vespwood_generator.usage import Usage
 
 
 class MaxTokenLimitError(Exception):
-    def __init__(self, generated_content: list[Block]):
+    def __init__(self, generated_content: Block | list[Block] | None, *, usage: Usage | None = None):
+        # A single block, like the text of a truncated response, is the only block generated
+        if generated_content is None:
+            generated_content = []
+        elif not isinstance(generated_content, list):
+            generated_content = [generated_content]
         self.generated_content: list[Block] = generated_content
-        super().__init__(generated_content)
\ No newline at end of file
+        # Tokens billed for the truncated response, if the provider reported them
+        self.usage: Usage | None = usage
+        super().__init__(generated_content)
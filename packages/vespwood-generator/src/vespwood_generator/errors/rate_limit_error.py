@@ -1,3 +1,37 @@
+from __future__ import annotations
+from collections.abc import Mapping
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
 class RateLimitError(Exception):
-    def __init__(self, *args):
-        super().__init__(*args)
\ No newline at end of file
+    def __init__(self, *args, retry_after: float | None = None):
+        # Seconds the provider asked to wait before retrying, if it said
+        self.retry_after: float | None = retry_after
+        super().__init__(*args)
+
+
+    @classmethod
+    def from_headers(cls, headers: Mapping[str, str] | None, *args) -> RateLimitError:
+        return cls(*args, retry_after=parse_retry_after(headers))
+
+
+def parse_retry_after(headers: Mapping[str, str] | None) -> float | None:
+    if not headers:
+        return None
+    if value := headers.get("retry-after-ms"):
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+    if value := headers.get("retry-after"):
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        # HTTP date form
+        try:
+            return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            pass
+    return None
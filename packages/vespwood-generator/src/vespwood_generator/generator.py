@@ -1,6 +1,14 @@
 from abc import abstractmethod, ABCMeta
+from collections.abc import AsyncIterator
 import asyncio
-from typing import Any
+import inspect
+from typing import Any, Callable
+from vespwood_generator.backoff import backoff_delay
+from vespwood_generator.blocks import Block, Structured
+from vespwood_generator.delta import Delta, BlockDone
+from vespwood_generator.usage import Usage, sum_usage
+from vespwood_generator.retry import RetryPolicy
+from vespwood_generator.scheduler import RateScheduler, estimate_tokens
 from vespwood_generator.schematic import Schema, Tool
 from vespwood_generator.errors import MaxTokenLimitError, RateLimitError, ValidationError
 from vespwood_generator.message import Response, Message
@@ -23,54 +31,163 @@ class Generator(metaclass=GeneratorClass):
     ): ...
 
 
-    async def get_response(self, messages: list[Message], format_keys: dict[str, Any], schema: Schema | None, tools: list[Tool] | None, validators: list[Validator] | None, continue_on_max_token: bool = True, retry_on_rate_limit: bool = True, retry_with_delay: int = 0, **kwargs) -> Response:
-        response = None
+    def __payload__(self, messages: list[Message], schema: Schema | None = None, tools: list[Tool] | None = None) -> dict[str, Any] | None:
+        """
+        The request body sent to the provider for these arguments. Used to key
+        cached responses, generators returning None are keyed on the messages,
+        schema and tools instead.
+        """
+        return None
+
+
+    async def __rejected__(self, messages: list[Message], schema: Schema | None, tools: list[Tool] | None, response: Response, **kwargs):
+        """
+        Called when get_response retries because `response` to `messages` failed
+        validation, so wrappers can forget it.
+        """
+
+
+    async def __prompt_stream__(self, messages: list[Message], schema: Schema | None = None, tools: list[Tool] | None = None, **kwargs) -> AsyncIterator[Delta]:
+        """
+        Yields deltas of the response as it is generated, with a BlockDone for
+        every block of it. Generators without a streaming endpoint yield the
+        blocks and usage of __prompt__ once it returns.
+        """
+        response = await self.__prompt__(messages, schema, tools, **kwargs)
+        for index, block in enumerate(response):
+            yield BlockDone(index, block)
+        if response.usage is not None:
+            yield response.usage
+
+
+    async def __stream__(self, messages: list[Message], schema: Schema | None, tools: list[Tool] | None, on_delta: Callable[[Delta], Any], **kwargs) -> Response:
+        blocks: dict[int, Block] = {}
+        usage = None
         try:
-            response = await self.__prompt__(messages, schema, tools, **kwargs)
-            if validators:
-                for v in validators: v.validate(messages, response, format_keys)
-            return response
-        except ValidationError as e:
-            messages.append(response)
-            messages.append(Message(role="system", content=e.content))
-            return await self.get_response(
-                messages=messages,
-                format_keys=format_keys,
-                schema=schema,
-                tools=tools,
-                validators=validators,
-                continue_on_max_token=continue_on_max_token,
-                retry_on_rate_limit=retry_on_rate_limit,
-                retry_with_delay=retry_with_delay
-            )
+            async for delta in self.__prompt_stream__(messages, schema, tools, **kwargs):
+                if isinstance(delta, BlockDone):
+                    blocks[delta.index] = delta.block
+                elif isinstance(delta, Usage):
+                    usage = delta
+                result = on_delta(delta)
+                if inspect.isawaitable(result):
+                    await result
         except MaxTokenLimitError as e:
-            print("Output token limit exceeded.")
-            if continue_on_max_token:
+            if e.usage is None:
+                e.usage = usage
+            raise
+        return Response([blocks[index] for index in sorted(blocks)], usage=usage)
+
+
+    def __decode__(self, response: Response, schema: Schema):
+        for block in response:
+            if isinstance(block, Structured):
+                try:
+                    block.decode(schema)
+                except ValueError as e:
+                    raise ValidationError(f"The response does not match the schema {schema.name}: {e}") from e
+
+
+    async def get_response(self, messages: list[Message], format_keys: dict[str, Any], schema: Schema | None, tools: list[Tool] | None, validators: list[Validator] | None, continue_on_max_token: bool = True, retry_on_rate_limit: bool = True, retry_with_delay: int = 0, max_rate_limit_retries: int | None = None, on_rate_limit: Callable[[RateLimitError], None] | None = None, *, retry_policy: RetryPolicy | None = None, on_delta: Callable[[Delta], Any] | None = None, on_retry: Callable[[list], Any] | None = None, scheduler: RateScheduler | None = None, priority: int = 0, **kwargs) -> Response:
+        """
+        With a `scheduler`, every request sent to the provider waits for its own
+        permit, released before backing off from a rate limit. `on_retry` is
+        called before every retry with the content carried into it, anything
+        else streamed by the failed attempt is discarded.
+        """
+        if retry_policy is None:
+            retry_policy = RetryPolicy(max_rate_limit_retries=max_rate_limit_retries, backoff_base=retry_with_delay or 1)
+        if not continue_on_max_token:
+            retry_policy = retry_policy._replace(max_continuations=0)
+        if not retry_on_rate_limit:
+            retry_policy = retry_policy._replace(max_rate_limit_retries=0)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + retry_policy.total_timeout if retry_policy.total_timeout is not None else None
+        validation_retries = continuations = rate_limit_retries = 0
+
+        # The caller's list is never modified. At most one failed attempt with its feedback,
+        # and one assistant message holding the partial content, are carried between attempts.
+        feedback: list[Message] = []
+        partial: list = []
+        partial_usage: Usage | None = None
+        while True:
+            conversation = [*messages, *feedback]
+            if partial:
+                conversation.append(Message(role="assistant", content=list(partial)))
+            permit = None
+            if scheduler is not None:
+                permit = await scheduler.acquire(priority=priority, tokens=estimate_tokens(conversation) if scheduler.tokens_per_minute else 0)
+            timeout = None
+            if deadline is not None:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    if permit is not None:
+                        permit.release()
+                    raise TimeoutError("Retry time budget exhausted before getting a response")
+
+            try:
+                if on_delta is not None:
+                    response = await asyncio.wait_for(self.__stream__(conversation, schema, tools, on_delta, **kwargs), timeout)
+                else:
+                    response = await asyncio.wait_for(self.__prompt__(conversation, schema, tools, **kwargs), timeout)
+            except RateLimitError as e:
+                if permit is not None:
+                    permit.rate_limited(e)
+                    permit.release()
+                if on_rate_limit is not None:
+                    on_rate_limit(e)
+                if retry_policy.max_rate_limit_retries is not None and rate_limit_retries >= retry_policy.max_rate_limit_retries:
+                    raise
+                delay = backoff_delay(rate_limit_retries, base=retry_policy.backoff_base, cap=retry_policy.backoff_cap, retry_after=e.retry_after)
+                if deadline is not None and loop.time() + delay >= deadline:
+                    raise
+                rate_limit_retries += 1
+                if on_retry is not None:
+                    on_retry(list(partial))
+                await asyncio.sleep(delay)
+                continue
+            except MaxTokenLimitError as e:
+                if permit is not None:
+                    permit.release(used_tokens=e.usage.input_tokens + e.usage.output_tokens if e.usage is not None else None, succeeded=True)
+                print("Output token limit exceeded.")
+                if continuations >= retry_policy.max_continuations:
+                    # Hand back everything generated so far, not just the last part
+                    e.generated_content = [*partial, *e.generated_content]
+                    e.usage = sum_usage(partial_usage, e.usage)
+                    raise
                 print("Continuing generation...")
-                response = Message(role="assistant", content=e.generated_content)
-                messages.append(response)
-                remaining_response: Response = await self.get_response(
-                    messages=messages,
-                    format_keys=format_keys,
-                    tools=tools,
-                    validators=validators,
-                    continue_on_max_token=continue_on_max_token,
-                    retry_on_rate_limit=retry_on_rate_limit,
-                    retry_with_delay=retry_with_delay
-                )
-                response.extend(remaining_response.content)
+                continuations += 1
+                partial.extend(e.generated_content)
+                partial_usage = sum_usage(partial_usage, e.usage)
+                if on_retry is not None:
+                    on_retry(list(partial))
+                continue
+            except BaseException:
+                if permit is not None:
+                    permit.release()
+                raise
+
+            if permit is not None:
+                # The token bucket was charged an estimate, corrected with the real count when reported
+                usage = response.usage
+                permit.release(used_tokens=usage.input_tokens + usage.output_tokens if usage is not None else None, succeeded=True)
+            if partial:
+                # Every part was billed, the stitched response reports their total
+                response = Response([*partial, *response.content], usage=sum_usage(partial_usage, response.usage))
+            try:
+                if schema is not None and getattr(schema, "fast", False):
+                    self.__decode__(response, schema)
+                if validators:
+                    for v in validators: v.validate(messages, response, format_keys)
                 return response
-            raise e
-        except RateLimitError as e:
-            if retry_on_rate_limit:
-                await asyncio.sleep(retry_with_delay)
-                return await self.get_response(
-                    messages=messages,
-                    format_keys=format_keys,
-                    tools=tools,
-                    schema=schema,
-                    validators=validators,
-                    continue_on_max_token=continue_on_max_token,
-                    retry_on_rate_limit=retry_on_rate_limit,
-                    retry_with_delay=retry_with_delay
-                )
\ No newline at end of file
+            except ValidationError as e:
+                await self.__rejected__(conversation, schema, tools, response, **kwargs)
+                if validation_retries >= retry_policy.max_validation_retries:
+                    raise
+                validation_retries += 1
+                feedback = [response, Message(role="system", content=e.content)]
+                partial = []
+                partial_usage = None
+                if on_retry is not None:
+                    on_retry([])
@@ -0,0 +1,105 @@
+import json
+from typing import Any, Callable, NamedTuple
+
+
+class JSONBackend(NamedTuple):
+    """
+    Encodes and decodes the JSON of structured blocks, tool arguments and
+    tool results. `dumps` takes the object and whether to indent it.
+    """
+    name: str
+    dumps: Callable[[Any, bool], str]
+    loads: Callable[[str | bytes], Any]
+
+
+def _stdlib() -> JSONBackend:
+    # The standard library's defaults, so the text sent to providers is the same as without a fast backend installed
+    def dumps(obj: Any, indent: bool) -> str:
+        return json.dumps(obj, indent=2 if indent else None)
+    return JSONBackend("json", dumps, json.loads)
+
+
+def _orjson() -> JSONBackend:
+    import orjson
+
+    def dumps(obj: Any, indent: bool) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)).decode()
+    return JSONBackend("orjson", dumps, orjson.loads)
+
+
+def _msgspec() -> JSONBackend:
+    import msgspec
+
+    encoder = msgspec.json.Encoder()
+    decoder = msgspec.json.Decoder()
+
+    def dumps(obj: Any, indent: bool) -> str:
+        data = encoder.encode(obj)
+        if indent:
+            data = msgspec.json.format(data, indent=2)
+        return data.decode()
+
+    def loads(data: str | bytes) -> Any:
+        try:
+            return decoder.decode(data)
+        except msgspec.DecodeError as e:
+            # Like orjson's, caught by `except json.JSONDecodeError`
+            raise json.JSONDecodeError(str(e), data if isinstance(data, str) else data.decode(errors="replace"), 0) from e
+    return JSONBackend("msgspec", dumps, loads)
+
+
+_STDLIB = _stdlib()
+
+_BACKENDS: dict[str, Callable[[], JSONBackend]] = {
+    "orjson": _orjson,
+    "msgspec": _msgspec,
+    "json": lambda: _STDLIB,
+}
+
+
+def _default() -> JSONBackend:
+    for load in (_orjson, _msgspec):
+        try:
+            return load()
+        except ImportError:
+            pass
+    return _STDLIB
+
+
+_backend = _default()
+
+
+def get_json_backend() -> JSONBackend:
+    return _backend
+
+
+def set_json_backend(backend: str | JSONBackend | None = None) -> JSONBackend:
+    """
+    Sets the backend used by json_dumps and json_loads, by name ("orjson",
+    "msgspec" or "json") or as a JSONBackend. Without a backend, the fastest
+    one installed is used again.
+    """
+    global _backend
+    if backend is None:
+        _backend = _default()
+    elif isinstance(backend, JSONBackend):
+        _backend = backend
+    elif backend in _BACKENDS:
+        _backend = _BACKENDS[backend]()
+    else:
+        raise ValueError(f"Unknown JSON backend {backend}, expected one of {', '.join(_BACKENDS)}")
+    return _backend
+
+
+def json_dumps(obj: Any, *, indent: bool = False) -> str:
+    try:
+        return _backend.dumps(obj, indent)
+    except TypeError:
+        # Types only the standard library handles, like integers wider than 64 bits
+        if _backend is _STDLIB:
+            raise
+        return _STDLIB.dumps(obj, indent)
+
+
+def json_loads(data: str | bytes) -> Any:
+    return _backend.loads(data)
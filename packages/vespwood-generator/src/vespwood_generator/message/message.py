@@ -4,13 +4,17 @@ from vespwood_generator.types import Role
 
 
 class Message:
-    __slots__ = "_role", "_content", "_structured"
+    __slots__ = "_role", "_content", "_structured", "_cache", "_version", "__weakref__"
 
     def __init__(self, 
         role: Role, 
-        content: Block | list[Block] | None = None
+        content: Block | list[Block] | None = None,
+        *,
+        cache: bool = False
     ):
         self._role = role
+        self._cache = cache
+        self._version = 0
         self._content: list[Block] = []
         self._structured: dict = {}
         if isinstance(content, (str, Structured, ToolCall, Image, File)):
@@ -30,6 +34,22 @@ class Message:
     def content(self) -> list[Block]:
         return self._content
     
+    @property
+    def cache(self) -> bool:
+        """
+        Whether generators that support prompt caching should cache the
+        conversation up to and including this message.
+        """
+        return self._cache
+    
+    @property
+    def version(self) -> int:
+        """
+        Incremented every time the content of the message is changed, results
+        added to its tool calls aside.
+        """
+        return self._version
+    
     @property
     def json(self):
         data = { "role": self.role, "content": self.content }
@@ -40,6 +60,7 @@ class Message:
     
     def append(self, block: Block):
         self._content.append(block)
+        self._version += 1
         if isinstance(block, Structured):
             self._structured.update(block)
     
@@ -1,13 +1,15 @@
 from vespwood_generator.tag import Tag
 from vespwood_generator.blocks import Block
+from vespwood_generator.usage import Usage
 from .message import Message
 
 
 class Response(Message):
-    __slots__ = "_tag",  "_messages"
+    __slots__ = "_tag",  "_messages", "_usage"
 
-    def __init__(self, content: Block | list[Block] | None = None):
+    def __init__(self, content: Block | list[Block] | None = None, *, usage: Usage | None = None):
         self._tag: Tag | None = None
+        self._usage = usage
         super().__init__("assistant", content)
 
     @property
@@ -18,6 +20,10 @@ class Response(Message):
     def tag(self) -> Tag:
         return self._tag
     
+    @property
+    def usage(self) -> Usage | None:
+        return self._usage
+    
     @property
     def index(self) -> int | None:
         return self.tag.index
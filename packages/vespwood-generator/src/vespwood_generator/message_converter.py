@@ -1,22 +1,42 @@
+from vespwood_generator.blocks import ToolCall
 from vespwood_generator.message import Message
 from typing import Any
 from collections.abc import Callable
+from weakref import WeakKeyDictionary
+
+
+def _version(msg: Message) -> tuple:
+    # The content list can be changed in place, through `content` or by another message sharing it,
+    # and tool results are added to the blocks, neither changes the message version
+    content = msg.content
+    return (
+        msg.version,
+        id(content),
+        tuple(map(id, content)),
+        sum(1 for block in content if isinstance(block, ToolCall) and block.result is not None)
+    )
 
 
 def message_converter(func: Callable[[Message], dict[str, Any]] | None = None):
+    """
+    Turns a converter of a single message into one of a list of messages.
+    The encoding of every message is kept until the message changes, so
+    the history of a conversation isn't converted again on every turn.
+    Encodings are shared between calls and shouldn't be modified.
+    """
     def wrapper(f):
+        encoded: WeakKeyDictionary[Message, tuple[tuple, list[dict[str, Any]]]] = WeakKeyDictionary()
         def fn(prompts: list[Message]) -> list[dict[str, Any]]:
             converted_msgs = []
             for msg in prompts:
-                converted_msgs.extend(f(msg))
+                version = _version(msg)
+                cached = encoded.get(msg)
+                if cached is None or cached[0] != version:
+                    cached = encoded[msg] = (version, f(msg))
+                converted_msgs.extend(cached[1])
             return converted_msgs
         return fn
     if func:
         return wrapper(func)
     else:
         return wrapper
-    
-
-
-
-
@@ -0,0 +1,164 @@
+from __future__ import annotations
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+import asyncio
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from vespwood_generator.message import Response
+
+
+def _dumps(response: Response) -> bytes:
+    return pickle.dumps((response.content, response.usage), protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _loads(data: bytes) -> Response:
+    # A fresh Response on every hit, so it can be tagged and its tool calls given results
+    value = pickle.loads(data)
+    if isinstance(value, list):
+        # Stored without its usage
+        return Response(value)
+    content, usage = value
+    return Response(content, usage=usage)
+
+
+class ResponseCache(ABC):
+    """
+    Storage for generator responses keyed by a hash of the request payload.
+    """
+    __slots__ = ()
+
+    @abstractmethod
+    async def get(self, key: str) -> Response | None: ...
+
+
+    @abstractmethod
+    async def set(self, key: str, response: Response): ...
+
+
+    @abstractmethod
+    async def delete(self, key: str): ...
+
+
+    @abstractmethod
+    async def clear(self): ...
+
+
+class MemoryResponseCache(ResponseCache):
+    """
+    In-memory LRU of at most `maxsize` responses, each kept for `ttl` seconds
+    when given.
+    """
+    __slots__ = "_maxsize", "_ttl", "_entries"
+
+    def __init__(self, maxsize: int | None = 1024, ttl: float | None = None):
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._entries: OrderedDict[str, tuple[float | None, bytes]] = OrderedDict()
+
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+    async def get(self, key: str) -> Response | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, data = entry
+        if expires is not None and expires <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return _loads(data)
+
+
+    async def set(self, key: str, response: Response):
+        expires = time.monotonic() + self._ttl if self._ttl is not None else None
+        self._entries[key] = (expires, _dumps(response))
+        self._entries.move_to_end(key)
+        if self._maxsize is not None:
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+
+
+    async def delete(self, key: str):
+        self._entries.pop(key, None)
+
+
+    async def clear(self):
+        self._entries.clear()
+
+
+class SQLiteResponseCache(ResponseCache):
+    """
+    Responses stored in a SQLite database at `path`, shared between processes
+    and kept across runs. Entries older than `ttl` seconds are ignored.
+    """
+    __slots__ = "_path", "_ttl", "_connection", "_lock"
+
+    def __init__(self, path: str, ttl: float | None = None):
+        self._path = path
+        self._ttl = ttl
+        if directory := os.path.dirname(os.path.abspath(path)):
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value BLOB NOT NULL, created REAL NOT NULL)")
+        self._lock = threading.Lock()
+
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+
+    def __read__(self, key: str) -> bytes | None:
+        with self._lock:
+            row = self._connection.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, created = row
+        if self._ttl is not None and created + self._ttl <= time.time():
+            return None
+        return value
+
+
+    def __write__(self, key: str, value: bytes):
+        with self._lock:
+            self._connection.execute("INSERT OR REPLACE INTO responses (key, value, created) VALUES (?, ?, ?)", (key, value, time.time()))
+
+
+    def __remove__(self, key: str):
+        with self._lock:
+            self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+
+    def __clear__(self):
+        with self._lock:
+            self._connection.execute("DELETE FROM responses")
+
+
+    async def get(self, key: str) -> Response | None:
+        data = await asyncio.to_thread(self.__read__, key)
+        return _loads(data) if data is not None else None
+
+
+    async def set(self, key: str, response: Response):
+        await asyncio.to_thread(self.__write__, key, _dumps(response))
+
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self.__remove__, key)
+
+
+    async def clear(self):
+        await asyncio.to_thread(self.__clear__)
+
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
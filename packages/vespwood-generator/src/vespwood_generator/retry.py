@@ -0,0 +1,15 @@
+from typing import NamedTuple
+
+
+class RetryPolicy(NamedTuple):
+    """
+    Budgets for Generator.get_response. Each cause is counted separately, and
+    `total_timeout` (seconds) bounds the whole call including backoff sleeps.
+    Rate limits are retried until they stop when `max_rate_limit_retries` is None.
+    """
+    max_validation_retries: int = 3
+    max_continuations: int = 5
+    max_rate_limit_retries: int | None = None
+    backoff_base: float = 1.0
+    backoff_cap: float = 60.0
+    total_timeout: float | None = None
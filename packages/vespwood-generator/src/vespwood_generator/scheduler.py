@@ -0,0 +1,324 @@
+from __future__ import annotations
+from typing import Any, Hashable
+import asyncio
+import heapq
+import itertools
+import weakref
+
+from vespwood_generator.message import Message
+from vespwood_generator.errors import RateLimitError
+
+
+class TokenBucket:
+    """
+    Refills at `per_minute / 60` units a second up to `capacity` units.
+    """
+    __slots__ = "_per_minute", "_capacity", "_tokens", "_updated"
+
+    def __init__(self, per_minute: float, *, capacity: float | None = None):
+        if per_minute <= 0:
+            raise ValueError("per_minute must be greater than 0")
+        self._per_minute = per_minute
+        self._capacity = capacity or per_minute
+        self._tokens = self._capacity
+        self._updated: float | None = None
+
+
+    @property
+    def per_minute(self) -> float:
+        return self._per_minute
+
+
+    @property
+    def capacity(self) -> float:
+        return self._capacity
+
+
+    def _refill(self, now: float):
+        if self._updated is not None:
+            self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._per_minute / 60)
+        self._updated = now
+
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """
+        Seconds until `amount` can be taken, 0 if it can be taken now.
+        """
+        self._refill(now)
+        amount = min(amount, self._capacity)
+        if self._tokens >= amount:
+            return 0
+        return (amount - self._tokens) * 60 / self._per_minute
+
+
+    def take(self, amount: float, now: float):
+        self._refill(now)
+        self._tokens -= min(amount, self._capacity)
+
+
+    def adjust(self, amount: float, now: float):
+        # Positive amounts return unused tokens, negative amounts charge for extra ones
+        self._refill(now)
+        self._tokens = min(self._capacity, self._tokens + amount)
+
+
+class Permit:
+    __slots__ = "_scheduler", "_tokens", "_released"
+
+    def __init__(self, scheduler: RateScheduler, tokens: int):
+        self._scheduler = scheduler
+        self._tokens = tokens
+        self._released = False
+
+
+    @property
+    def tokens(self) -> int:
+        return self._tokens
+
+
+    def rate_limited(self, error: RateLimitError):
+        self._scheduler.on_rate_limit(error.retry_after)
+
+
+    def release(self, *, used_tokens: int | None = None, succeeded: bool = False):
+        if self._released:
+            return
+        self._released = True
+        self._scheduler.__release__(self, used_tokens)
+        if succeeded:
+            self._scheduler.on_success()
+
+
+class _Waiter:
+    __slots__ = "priority", "sequence", "tokens", "future"
+
+    def __init__(self, priority: int, sequence: int, tokens: int, future: asyncio.Future):
+        self.priority = priority
+        self.sequence = sequence
+        self.tokens = tokens
+        self.future = future
+
+
+    def __lt__(self, other: _Waiter) -> bool:
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+
+class RateScheduler:
+    """
+    Admits generator requests under a requests-per-minute bucket, a
+    tokens-per-minute bucket and a cap on requests in flight. Waiting requests
+    are admitted by priority (lower first), then in arrival order.
+
+    One scheduler can be shared by every Completor talking to the same
+    provider account, see `RateScheduler.shared`.
+
+    When `adaptive`, rate limit errors halve the number of requests allowed in
+    flight (at most once per cooldown) and pause admissions for the provider's
+    retry-after. Each successful request grows the limit back by 1/limit, up to
+    `max_concurrency`.
+    """
+    __slots__ = "_requests", "_tokens", "_max_concurrency", "_in_flight", "_waiters", "_sequence", "_timer", "_adaptive", "_min_concurrency", "_limit", "_paused_until", "_last_decrease", "__weakref__"
+
+    DECREASE_FACTOR = 0.5
+    DECREASE_COOLDOWN = 1.0
+
+    _shared: dict[Hashable, RateScheduler] = {}
+    _shared_by_ref: weakref.WeakKeyDictionary[Any, RateScheduler] = weakref.WeakKeyDictionary()
+
+    def __init__(self,
+                *,
+                requests_per_minute: float | None = None,
+                tokens_per_minute: float | None = None,
+                max_concurrency: int | None = None,
+                burst: float | None = None,
+                adaptive: bool = True,
+                min_concurrency: int = 1):
+        self._requests = TokenBucket(requests_per_minute, capacity=burst) if requests_per_minute else None
+        self._tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._max_concurrency = max_concurrency or None
+        self._in_flight = 0
+        self._waiters: list[_Waiter] = []
+        self._sequence = itertools.count()
+        self._timer: asyncio.TimerHandle | None = None
+        self._adaptive = adaptive
+        self._min_concurrency = max(1, min_concurrency)
+        # Adaptive limit, None until the first rate limit
+        self._limit: float | None = None
+        self._paused_until = 0.0
+        self._last_decrease: float | None = None
+
+
+    @classmethod
+    def shared(cls, key: Any, **kwargs) -> RateScheduler:
+        """
+        Returns the scheduler registered for `key`, usually a Generator or an API
+        key, creating it with `kwargs` the first time.
+        """
+        try:
+            registry = cls._shared_by_ref
+            weakref.ref(key)
+        except TypeError:
+            registry = cls._shared
+        scheduler = registry.get(key)
+        if scheduler is None:
+            scheduler = registry[key] = cls(**kwargs)
+        return scheduler
+
+
+    @property
+    def requests_per_minute(self) -> float | None:
+        return self._requests.per_minute if self._requests else None
+
+
+    @property
+    def tokens_per_minute(self) -> float | None:
+        return self._tokens.per_minute if self._tokens else None
+
+
+    @property
+    def max_concurrency(self) -> int | None:
+        return self._max_concurrency
+
+
+    @property
+    def concurrency_limit(self) -> int | None:
+        if self._limit is None:
+            return self._max_concurrency
+        limit = int(self._limit)
+        return min(limit, self._max_concurrency) if self._max_concurrency is not None else limit
+
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for waiter in self._waiters if not waiter.future.done())
+
+
+    async def acquire(self, *, priority: int = 0, tokens: int = 0) -> Permit:
+        """
+        Waits until the request can start. `tokens` is the estimated token usage
+        charged against the tokens-per-minute bucket.
+        """
+        loop = asyncio.get_running_loop()
+        if not self._waiters and self.__admissible__(tokens, loop.time()) == 0:
+            return self.__admit__(tokens, loop.time())
+
+        waiter = _Waiter(priority, next(self._sequence), tokens, loop.create_future())
+        heapq.heappush(self._waiters, waiter)
+        self.__dispatch__()
+        try:
+            return await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Admitted while being cancelled, hand the slot to the next one
+                waiter.future.result().release()
+            raise
+
+
+    def request(self, *, priority: int = 0, tokens: int = 0) -> _Acquire:
+        """
+        `async with scheduler.request(...) as permit:` holds a permit for the block.
+        """
+        return _Acquire(self, priority, tokens)
+
+
+    def __admissible__(self, tokens: int, now: float) -> float:
+        # Seconds until a request with `tokens` fits, 0 if it fits now, -1 if it has to wait for a release
+        limit = self.concurrency_limit
+        if limit is not None and self._in_flight >= limit:
+            return -1
+        wait = max(0, self._paused_until - now)
+        if self._requests:
+            wait = max(wait, self._requests.wait_time(1, now))
+        if self._tokens and tokens:
+            wait = max(wait, self._tokens.wait_time(tokens, now))
+        return wait
+
+
+    def __admit__(self, tokens: int, now: float) -> Permit:
+        if self._requests:
+            self._requests.take(1, now)
+        if self._tokens and tokens:
+            self._tokens.take(tokens, now)
+        self._in_flight += 1
+        return Permit(self, tokens)
+
+
+    def __dispatch__(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        loop = asyncio.get_running_loop()
+        while self._waiters:
+            waiter = self._waiters[0]
+            if waiter.future.done():
+                heapq.heappop(self._waiters)
+                continue
+            wait = self.__admissible__(waiter.tokens, loop.time())
+            if wait < 0:
+                return
+            if wait > 0:
+                self._timer = loop.call_later(wait, self.__dispatch__)
+                return
+            heapq.heappop(self._waiters)
+            waiter.future.set_result(self.__admit__(waiter.tokens, loop.time()))
+
+
+    def on_rate_limit(self, retry_after: float | None = None):
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        if retry_after:
+            self._paused_until = max(self._paused_until, now + retry_after)
+        if self._adaptive:
+            # A burst of requests hitting the same limit only shrinks it once
+            if self._last_decrease is None or now - self._last_decrease >= max(self.DECREASE_COOLDOWN, retry_after or 0):
+                current = self._limit if self._limit is not None else max(self._in_flight, self._min_concurrency)
+                self._limit = max(float(self._min_concurrency), current * self.DECREASE_FACTOR)
+                self._last_decrease = now
+
+
+    def on_success(self):
+        if not self._adaptive or self._limit is None:
+            return
+        self._limit += 1 / self._limit
+        if self._max_concurrency is not None and self._limit >= self._max_concurrency:
+            self._limit = float(self._max_concurrency)
+        if self._waiters:
+            self.__dispatch__()
+
+
+    def __release__(self, permit: Permit, used_tokens: int | None):
+        self._in_flight -= 1
+        if self._tokens and used_tokens is not None:
+            loop = asyncio.get_running_loop()
+            self._tokens.adjust(permit.tokens - used_tokens, loop.time())
+        if self._waiters:
+            self.__dispatch__()
+
+
+class _Acquire:
+    __slots__ = "_scheduler", "_priority", "_tokens", "_permit"
+
+    def __init__(self, scheduler: RateScheduler, priority: int, tokens: int):
+        self._scheduler = scheduler
+        self._priority = priority
+        self._tokens = tokens
+        self._permit: Permit | None = None
+
+
+    async def __aenter__(self) -> Permit:
+        self._permit = await self._scheduler.acquire(priority=self._priority, tokens=self._tokens)
+        return self._permit
+
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        self._permit.release(succeeded=exc_type is None)
+
+
+def estimate_tokens(messages: list[Message]) -> int:
+    # Rough count for tokens-per-minute budgeting, about 4 characters per token
+    return sum(len(block) if isinstance(block, str) else len(str(block)) for message in messages for block in message) // 4 + 1
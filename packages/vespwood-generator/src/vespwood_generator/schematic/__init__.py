@@ -1,3 +1,4 @@
 from .schematic import Schematic
 from .schema import schema, Schema
-from .tool import tool, Tool
\ No newline at end of file
+from .tool import tool, Tool
+from .tool_cache import ToolCache
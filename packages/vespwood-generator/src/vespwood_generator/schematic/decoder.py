@@ -0,0 +1,217 @@
+import dataclasses
+from enum import Enum
+import inspect
+from types import NoneType, UnionType
+from typing import Annotated, Any, Callable, Dict, List, Literal, Union, get_args, get_origin, get_type_hints
+
+from vespwood_generator.json_backend import json_loads
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+Converter = Callable[[Any, str], Any]
+
+_BUILTINS = (int, float, str, bool, list, dict)
+
+
+def _fail(expected: str, value: Any, path: str):
+    raise ValueError(f"Expected {expected} at `{path or '$'}`, got {type(value).__name__}")
+
+
+def _scalar(py_type: type) -> Converter:
+    def convert(value: Any, path: str) -> Any:
+        # bool is an int, but true isn't an integer in JSON
+        if type(value) is bool and py_type is not bool:
+            _fail(py_type.__name__, value, path)
+        if py_type is float and type(value) is int:
+            return float(value)
+        if not isinstance(value, py_type):
+            _fail(py_type.__name__, value, path)
+        return value
+    return convert
+
+
+def _object(cls: type, converters: dict[type, Converter]) -> Converter:
+    fields: list[tuple[str, Converter, bool]] = []
+
+    def convert(value: Any, path: str) -> Any:
+        if not isinstance(value, dict):
+            _fail(f"an object for {cls.__qualname__}", value, path)
+        arguments = {}
+        for name, field, required in fields:
+            if name not in value:
+                # Fields with defaults are optional, as they are for msgspec
+                if not required:
+                    continue
+                raise ValueError(f"Missing required field `{path}.{name}`" if path else f"Missing required field `{name}`")
+            arguments[name] = field(value[name], f"{path}.{name}" if path else name)
+        return cls(**arguments)
+
+    # Registered before the fields are compiled, so schemas can refer to themselves
+    converters[cls] = convert
+    hints = get_type_hints(cls, include_extras=True)
+    for name, parameter in inspect.signature(cls).parameters.items():
+        fields.append((name, _converter(hints.get(name, str), converters), parameter.default is inspect.Parameter.empty))
+    return convert
+
+
+def _converter(py_type: Any, converters: dict[type, Converter]) -> Converter:
+    origin = get_origin(py_type)
+    args = get_args(py_type)
+
+    if origin is Annotated:
+        return _converter(args[0], converters)
+
+    if origin is Literal:
+        def convert(value: Any, path: str) -> Any:
+            if value not in args:
+                raise ValueError(f"Expected one of {list(args)} at `{path or '$'}`, got {value!r}")
+            return value
+        return convert
+
+    if origin is Union or origin is UnionType:
+        options = [_converter(arg, converters) for arg in args]
+        def convert(value: Any, path: str) -> Any:
+            for option in options:
+                try:
+                    return option(value, path)
+                except ValueError:
+                    pass
+            _fail(" or ".join(getattr(arg, "__name__", str(arg)) for arg in args), value, path)
+        return convert
+
+    if py_type is None or py_type is NoneType:
+        def convert(value: Any, path: str) -> Any:
+            if value is not None:
+                _fail("null", value, path)
+            return value
+        return convert
+
+    if origin is list or origin is List or py_type is list:
+        item = _converter(args[0], converters) if args else None
+        def convert(value: Any, path: str) -> Any:
+            if not isinstance(value, list):
+                _fail("an array", value, path)
+            if item is None:
+                return value
+            return [item(v, f"{path}[{i}]") for i, v in enumerate(value)]
+        return convert
+
+    if origin is dict or origin is Dict or py_type is dict:
+        item = _converter(args[1], converters) if args else None
+        def convert(value: Any, path: str) -> Any:
+            if not isinstance(value, dict):
+                _fail("an object", value, path)
+            if item is None:
+                return value
+            return {k: item(v, f"{path}.{k}" if path else k) for k, v in value.items()}
+        return convert
+
+    if py_type in (int, float, str, bool):
+        return _scalar(py_type)
+
+    if inspect.isclass(py_type):
+        if py_type in converters:
+            return lambda value, path: converters[py_type](value, path)
+
+        if issubclass(py_type, Enum):
+            def convert(value: Any, path: str) -> Any:
+                try:
+                    return py_type(value)
+                except ValueError:
+                    raise ValueError(f"Expected one of {[m.value for m in py_type]} at `{path or '$'}`, got {value!r}") from None
+            return convert
+
+        if issubclass(py_type, _BUILTINS):
+            base = py_type
+            while (get_origin(base) or base) not in _BUILTINS:
+                base = getattr(base, "__orig_bases__")[0]
+            inner = _converter(base, converters)
+            return lambda value, path: py_type(inner(value, path))
+
+        return _object(py_type, converters)
+
+    return lambda value, path: value
+
+
+def _native(info: Any, seen: set[int]) -> bool:
+    # msgspec decodes classes it doesn't know, like schemas that aren't fast, only with a dec_hook
+    if isinstance(info, msgspec.inspect.CustomType):
+        return False
+    if id(info) in seen:
+        return True
+    seen.add(id(info))
+    for name in info.__struct_fields__:
+        value = getattr(info, name)
+        for item in value if isinstance(value, tuple) else (value,):
+            if isinstance(item, msgspec.inspect.Field):
+                item = item.type
+            if isinstance(item, msgspec.inspect.Type) and not _native(item, seen):
+                return False
+    return True
+
+
+def _is_native(cls: type) -> bool:
+    try:
+        return _native(msgspec.inspect.type_info(cls), set())
+    except TypeError:
+        # Types msgspec can't decode at all, like unions of several classes
+        return False
+
+
+def compile_decoder(cls: type) -> Callable[[str | bytes | dict[str, Any]], Any]:
+    """
+    Returns a function decoding JSON text, or the dict it was parsed into,
+    into an instance of `cls`. Raises ValueError when the data doesn't match
+    the type hints of `cls`. With msgspec installed, types it supports are
+    decoded and validated natively.
+    """
+    if msgspec is not None and _is_native(cls):
+        decoder = msgspec.json.Decoder(cls)
+        def decode(data: str | bytes | dict[str, Any]) -> Any:
+            try:
+                if isinstance(data, (str, bytes)):
+                    return decoder.decode(data)
+                return msgspec.convert(data, cls)
+            except msgspec.DecodeError as e:
+                raise ValueError(str(e)) from e
+        return decode
+
+    convert = _converter(cls, {})
+    def decode(data: str | bytes | dict[str, Any]) -> Any:
+        if isinstance(data, (str, bytes)):
+            data = json_loads(data)
+        return convert(data, "")
+    return decode
+
+
+def _to_builtins(value: Any) -> Any:
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if isinstance(value, dict):
+        return {k: _to_builtins(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_builtins(v) for v in value]
+    if dataclasses.is_dataclass(value):
+        return {field.name: _to_builtins(getattr(value, field.name)) for field in dataclasses.fields(value)}
+    if hasattr(value, "__dict__"):
+        return {k: _to_builtins(v) for k, v in vars(value).items()}
+    return value
+
+
+def to_builtins(value: Any) -> Any:
+    """
+    The JSON compatible dict, list or scalar a decoded instance stands for.
+    """
+    if msgspec is not None:
+        try:
+            return msgspec.to_builtins(value)
+        except TypeError:
+            # Plain schema classes nested in value
+            pass
+    return _to_builtins(value)
@@ -1,7 +1,9 @@
+import dataclasses
 from enum import Enum
-from typing import Any, Callable, dataclass_transform, overload, Generic, TypeVar
+from typing import Any, Callable, dataclass_transform, get_type_hints, overload, Generic, TypeVar
 from vespwood_generator._utils import setup_init
 from vespwood_generator.schematic import Schematic
+from vespwood_generator.schematic.decoder import compile_decoder, to_builtins
 
 T = TypeVar('T')
 
@@ -9,6 +11,8 @@ class Schema(type[T], Schematic, Generic[T]):
     _name: str
     _description: str | None
     _schema: dict[str, Any]
+    _fast: bool
+    _decoder: Callable[[str | bytes | dict[str, Any]], T] | None
     
     @property
     def name(cls): 
@@ -21,12 +25,39 @@ class Schema(type[T], Schematic, Generic[T]):
     @property
     def schema(cls):
         return cls._schema
+    
+    @property
+    def fast(cls) -> bool:
+        """
+        Whether structured responses of this schema are decoded into instances
+        of it, see `schema`.
+        """
+        return cls._fast
+
+
+    def decode(cls, data: str | bytes | dict[str, Any]) -> T:
+        """
+        Decodes JSON text, or the dict it was parsed into, into an instance of
+        the schema, validating it against the type hints. Raises ValueError
+        when it doesn't match.
+        """
+        if cls.__dict__.get("_decoder") is None:
+            cls._decoder = compile_decoder(cls)
+        return cls._decoder(data)
+
+
+    def to_builtins(cls, value: T) -> Any:
+        """
+        The dict an instance of the schema was decoded from, see `decode`.
+        """
+        return to_builtins(value)
 
 
     def __new__(mcs, name, bases=(), ns={}, *, skip_init = False):
         cls = super().__new__(mcs, name, bases, ns)
         if getattr(cls, "_name", None) is None: cls._name = name
         if not hasattr(cls, "_description"): cls._description = None
+        if not hasattr(cls, "_fast"): cls._fast = False
         if not skip_init: cls = setup_init(cls)
         cls._schema = Schematic.to_json_schema(cls)
         return cls
@@ -111,6 +142,7 @@ class Schema(type[T], Schematic, Generic[T]):
 
         if name: cls._name = name
         if description: cls._description = description
+        Schematic.invalidate(cls)
         cls._schema = Schematic.to_json_schema(cls)
 
         return cls
@@ -122,25 +154,50 @@ class Schema(type[T], Schematic, Generic[T]):
 
 S = TypeVar("S")    
 
+def _fast_schema(cls: Schema[S], annotations: dict[str, Any]) -> Schema[S]:
+    # Fields are read from the annotations of the class itself, the decorated class isn't a dataclass
+    doc = cls.__doc__
+    cls.__annotations__ = annotations
+    cls = dataclasses.dataclass(cls, kw_only=True, frozen=True, slots=True)
+    # dataclass documents classes without a docstring with their signature
+    cls.__doc__ = doc
+    Schematic.invalidate(cls)
+    cls._schema = Schematic.to_json_schema(cls)
+    return cls
+
+
 @dataclass_transform(kw_only_default=True, frozen_default=True)
 @overload
-def schema(cls: type[S], /, *, name: str | None = None, description: str | None = None) -> Schema[S]: ...
+def schema(cls: type[S], /, *, name: str | None = None, description: str | None = None, fast: bool = False) -> Schema[S]: ...
 @overload
-def schema(cls: None = None, /, *, name: str | None = None, description: str | None = None) -> Callable[[type[S]], Schema[S]]: ...
-
-def schema(cls: type[S] | None = None, /, *, name: str | None = None, description: str | None = None):
+def schema(cls: None = None, /, *, name: str | None = None, description: str | None = None, fast: bool = False) -> Callable[[type[S]], Schema[S]]: ...
+
+def schema(cls: type[S] | None = None, /, *, name: str | None = None, description: str | None = None, fast: bool = False):
+    """
+    With `fast`, the schema is compiled into a frozen, slotted dataclass, and
+    structured responses of it are decoded into instances of it by the
+    generator, in a single pass when msgspec is installed. Responses that
+    don't match the schema fail validation, see `Structured.value`.
+    """
     def wrapper(cls) -> Schema[S]: 
+        if fast and issubclass(cls, (int, float, str, bool, list, dict)):
+            raise TypeError(f"Only schemas with fields can be fast, {cls.__name__} is a {cls.__mro__[1].__name__}")
         CombinedMeta = Schema
         if cls.__bases__:
             meta = [type(base) for base in cls.__bases__]
             CombinedMeta = type("Schema", (Schema, *meta), {})
-        class Wrapper(cls, metaclass=CombinedMeta):
+        class Wrapper(cls, metaclass=CombinedMeta, skip_init=fast):
             _name = name
             _description = description
+            _fast = fast
             __doc__ = cls.__doc__
             __name__ = cls.__name__
             __qualname__ = cls.__qualname__
+            # Instances are pickled by reference to the decorated class, e.g. in cached responses
+            __module__ = cls.__module__
 
+        if fast:
+            Wrapper = _fast_schema(Wrapper, get_type_hints(cls, include_extras=True))
         Wrapper.__class__.__name__ = cls.__class__.__name__
         Wrapper.__class__.__qualname__ = cls.__class__.__qualname__
         return Wrapper
@@ -3,8 +3,14 @@ from enum import Enum
 import inspect
 from types import UnionType
 from typing import Annotated, get_type_hints, get_origin, get_args, Union, List, Dict, Literal, Any
+from weakref import WeakKeyDictionary
 from typing_extensions import Doc
-from vespwood_generator._utils import setup_init
+from vespwood_generator._utils import setup_init, freeze
+
+
+# Keyed on the class or function, bound methods on their function. Entries go with dynamically created classes
+_schemas: WeakKeyDictionary[Any, dict[str, Any]] = WeakKeyDictionary()
+_method_schemas: WeakKeyDictionary[Any, dict[str, Any]] = WeakKeyDictionary()
 
 
 class Schematic(ABC):
@@ -44,7 +50,8 @@ class Schematic(ABC):
                 doc = docs[0]
             schema = Schematic.__type_to_json_schema(py_type, fallback)
             if doc:
-                schema["description"] = doc.documentation
+                # Schemas of Schema classes are shared and frozen
+                schema = {**schema, "description": doc.documentation}
             return schema
 
 
@@ -156,7 +163,32 @@ class Schematic(ABC):
 
     @staticmethod
     def to_json_schema(obj):
-        return Schematic.__any_to_json_schema(obj)
+        """
+        The JSON schema of the parameters of a function, or the fields of a
+        class. Schemas are generated once per class or function and shared,
+        so they are frozen, copy them to modify them.
+        """
+        cache = _method_schemas if inspect.ismethod(obj) else _schemas
+        key = obj.__func__ if inspect.ismethod(obj) else obj
+        try:
+            return cache[key]
+        except KeyError:
+            pass
+        except TypeError:
+            # Not weakly referenceable
+            return freeze(Schematic.__any_to_json_schema(obj))
+        schema = cache[key] = freeze(Schematic.__any_to_json_schema(obj))
+        return schema
+
+
+    @staticmethod
+    def invalidate(obj):
+        """
+        Drops the generated schema of a class or function, for classes that
+        change after their schema was generated.
+        """
+        _schemas.pop(obj, None)
+        _method_schemas.pop(obj, None)
 
 
     @staticmethod
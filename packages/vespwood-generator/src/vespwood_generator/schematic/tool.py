@@ -1,18 +1,72 @@
-from typing import Callable, Any, TypeVar, ParamSpec, Generic
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Any, Literal, TypeAlias, TypeVar, ParamSpec, Generic
+import asyncio
+import atexit
+import importlib
+import inspect
+from weakref import WeakKeyDictionary
 
 from vespwood_generator.schematic import Schematic
+from vespwood_generator.schematic.tool_cache import ToolCache
 
 I = ParamSpec('I')
 O = TypeVar('O')
 
+RunIn: TypeAlias = Literal["thread", "process", "inline"]
+
+_process_executor: ProcessPoolExecutor | None = None
+
+
+def _default_process_executor() -> ProcessPoolExecutor:
+    global _process_executor
+    if _process_executor is None:
+        _process_executor = ProcessPoolExecutor()
+    return _process_executor
+
+
+@atexit.register
+def _shutdown_process_executor():
+    # Worker processes of the default pool, a new pool starts if a tool needs one again
+    global _process_executor
+    if _process_executor is not None:
+        executor, _process_executor = _process_executor, None
+        executor.shutdown(cancel_futures=True)
+
+
+def _call_by_reference(module: str, qualname: str, arguments: dict[str, Any]) -> Any:
+    # Runs in a worker process. Decorated tools replace their function in the module,
+    # so the function can't be pickled by reference and is looked up through the Tool
+    target: Any = importlib.import_module(module)
+    for part in qualname.split("."):
+        target = getattr(target, part)
+    if isinstance(target, Tool):
+        target = target._function
+    return target(**arguments)
+
 class Tool(Schematic, Generic[I, O]):
-    __slots__ = "_name", "_description", "_schema", "_function", "_caller",
+    __slots__ = "_name", "_description", "_schema", "_function", "_caller", "_timeout", "_max_concurrency", "_run_in", "_semaphores", "_cache",
 
-    def __init__(self, func: Callable[I, O], *, name: str | None = None, description: str | None = None):
+    def __init__(self, 
+                func: Callable[I, O], 
+                *, 
+                name: str | None = None, 
+                description: str | None = None,
+                timeout: float | None = None,
+                max_concurrency: int | None = None,
+                run_in: RunIn = "inline",
+                cache: bool | ToolCache = False):
         self._name: str = name or func.__name__
         self._description: str | None = description or func.__doc__ or self.__doc__
         self._schema: dict[str, Any] | None = Schematic.to_json_schema(func) if func else None
         self._function: Callable[I, O] = func
+        self._timeout: float | None = timeout
+        self._max_concurrency: int | None = max_concurrency
+        self._run_in: RunIn = run_in
+        # Tools are module level singletons, used from every event loop that runs them
+        self._semaphores: WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore] = WeakKeyDictionary()
+        # Opt in only, the tool has to return the same result for the same arguments
+        self._cache: ToolCache | None = ToolCache() if cache is True else cache if isinstance(cache, ToolCache) else None
 
 
     def update_with(self, *, name: str, description: str, schema: dict[str, Any]):
@@ -36,16 +90,92 @@ class Tool(Schematic, Generic[I, O]):
     def schema(self) -> dict[str, Any]:
         return self._schema
     
+    @property
+    def timeout(self) -> float | None:
+        return self._timeout
+    
+    @property
+    def max_concurrency(self) -> int | None:
+        return self._max_concurrency
+    
+    @property
+    def run_in(self) -> RunIn:
+        return self._run_in
+    
+    @property
+    def cache(self) -> ToolCache | None:
+        return self._cache
+    
+    @property
+    def is_async(self) -> bool:
+        return inspect.iscoroutinefunction(self._function)
+
+
+    async def run(self, arguments: dict[str, Any], *, executor: Executor | None = None, process_executor: Executor | None = None) -> O:
+        """
+        Runs the tool. Coroutine functions are awaited. Sync functions are called
+        on the event loop's thread unless the tool opts out of it: run_in="thread"
+        runs them on `executor` (the loop's default thread pool when None) and
+        run_in="process" on `process_executor`. Raises TimeoutError after
+        `timeout` seconds, which can't interrupt a sync function running inline.
+        """
+        if self._cache is not None:
+            key = ToolCache.key(self._name, arguments)
+            return await self._cache.get_or_run(key, lambda: self.__run_limited__(arguments, executor, process_executor))
+        return await self.__run_limited__(arguments, executor, process_executor)
+
+
+    def __semaphore__(self) -> asyncio.Semaphore | None:
+        if not self._max_concurrency:
+            return None
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self._max_concurrency)
+        return semaphore
+
+
+    async def __run_limited__(self, arguments: dict[str, Any], executor: Executor | None, process_executor: Executor | None) -> O:
+        semaphore = self.__semaphore__()
+        if semaphore is None:
+            return await asyncio.wait_for(self.__run__(arguments, executor, process_executor), self._timeout)
+        async with semaphore:
+            return await asyncio.wait_for(self.__run__(arguments, executor, process_executor), self._timeout)
+
+
+    async def __run__(self, arguments: dict[str, Any], executor: Executor | None, process_executor: Executor | None) -> O:
+        if self.is_async:
+            return await self._function(**arguments)
+        if self._run_in == "inline":
+            return self._function(**arguments)
+        loop = asyncio.get_running_loop()
+        if self._run_in == "process":
+            fn = self._function
+            return await loop.run_in_executor(
+                process_executor or _default_process_executor(),
+                partial(_call_by_reference, fn.__module__, fn.__qualname__, arguments)
+            )
+        return await loop.run_in_executor(executor, partial(self._function, **arguments))
+    
 
     def __call__(self, *args: I.args, **kwargs: I.kwargs) -> O:
         # TODO: look at self._function annotations and convert dicts to object
-        return self._function(*args, **kwargs)
+        if self._cache is None or args:
+            return self._function(*args, **kwargs)
+        if self.is_async:
+            return self._cache.get_or_run(ToolCache.key(self._name, kwargs), lambda: self._function(**kwargs))
+        key = ToolCache.key(self._name, kwargs)
+        found, value = self._cache.lookup(key)
+        if not found:
+            value = self._function(**kwargs)
+            self._cache.store(key, value)
+        return value
 
 
 
-def tool(func: Callable | None = None, *, name: str | None = None, description: str | None = None) -> Tool:
+def tool(func: Callable | None = None, *, name: str | None = None, description: str | None = None, timeout: float | None = None, max_concurrency: int | None = None, run_in: RunIn = "inline", cache: bool | ToolCache = False) -> Tool:
     def wrapper(fn: Callable):
-        return Tool(name=name, description=description, func=fn)
+        return Tool(name=name, description=description, func=fn, timeout=timeout, max_concurrency=max_concurrency, run_in=run_in, cache=cache)
         
     if func:
         wrapper.__qualname__ = func.__qualname__
@@ -0,0 +1,105 @@
+from __future__ import annotations
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from typing import Any
+import asyncio
+import json
+import time
+
+
+class ToolCache:
+    """
+    LRU cache of tool results keyed by tool name and canonical JSON of the
+    arguments, with an optional time to live in seconds. With `single_flight`,
+    concurrent async calls with the same key share one execution.
+    """
+    __slots__ = "_maxsize", "_ttl", "_single_flight", "_entries", "_in_flight", "_hits", "_misses"
+
+    def __init__(self, maxsize: int | None = 1024, ttl: float | None = None, *, single_flight: bool = True):
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._single_flight = single_flight
+        self._entries: OrderedDict[str, tuple[float | None, Any]] = OrderedDict()
+        self._in_flight: dict[str, asyncio.Future] = {}
+        self._hits = 0
+        self._misses = 0
+
+
+    @staticmethod
+    def key(name: str, arguments: dict[str, Any]) -> str:
+        # The standard library, not the JSON backend, whose float and key formatting vary between backends
+        return name + ":" + json.dumps(arguments, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+    @property
+    def hits(self) -> int:
+        return self._hits
+
+
+    @property
+    def misses(self) -> int:
+        return self._misses
+
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+    def lookup(self, key: str) -> tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires, value = entry
+            if expires is None or expires > time.monotonic():
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return True, value
+            del self._entries[key]
+        self._misses += 1
+        return False, None
+
+
+    def store(self, key: str, value: Any):
+        expires = time.monotonic() + self._ttl if self._ttl is not None else None
+        self._entries[key] = (expires, value)
+        self._entries.move_to_end(key)
+        if self._maxsize is not None:
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+
+
+    async def get_or_run(self, key: str, run: Callable[[], Awaitable[Any]]) -> Any:
+        if self._single_flight and key in self._in_flight:
+            self._hits += 1
+            return await asyncio.shield(self._in_flight[key])
+        found, value = self.lookup(key)
+        if found:
+            return value
+        if not self._single_flight:
+            value = await run()
+            self.store(key, value)
+            return value
+
+        future = asyncio.get_running_loop().create_future()
+        # Nobody may be waiting on it, don't warn about an unretrieved exception
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._in_flight[key] = future
+        try:
+            value = await run()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+            raise
+        else:
+            self.store(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            del self._in_flight[key]
+
+
+    def clear(self):
+        self._entries.clear()
+        self._hits = 0
+        self._misses = 0
@@ -0,0 +1,23 @@
+from typing import NamedTuple
+
+
+class Usage(NamedTuple):
+    """
+    Tokens billed for a response. `cache_read_tokens` were served from the
+    provider's prompt cache and `cache_write_tokens` were written to it, both
+    are also counted in `input_tokens`.
+    """
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_read_tokens: int = 0
+    cache_write_tokens: int = 0
+
+
+def sum_usage(*usages: Usage | None) -> Usage | None:
+    """
+    Total of the given usages, None if none was reported.
+    """
+    reported = [usage for usage in usages if usage is not None]
+    if not reported:
+        return None
+    return Usage(*map(sum, zip(*reported)))
@@ -0,0 +1,188 @@
+import asyncio
+import time
+
+import pytest
+
+from vespwood_generator import (
+    CachingGenerator, Generator, MemoryResponseCache, SQLiteResponseCache,
+    Message, Response, Usage, ValidationError, validator
+)
+
+
+class CountingGenerator(Generator):
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.calls = 0
+
+    async def __prompt__(self, messages, schema=None, tools=None, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return Response([f"answer {self.calls}"], usage=Usage(input_tokens=10, output_tokens=self.calls))
+
+
+def ask(generator: Generator, text: str = "hi", **kwargs) -> Response:
+    return generator.get_response([Message("user", text)], {}, None, None, None, **kwargs)
+
+
+def test_identical_requests_hit_the_cache():
+    async def main():
+        wrapped = CountingGenerator()
+        generator = CachingGenerator(wrapped)
+        first = await ask(generator)
+        second = await ask(generator)
+        other = await ask(generator, "bye")
+        return wrapped.calls, generator.hits, generator.misses, first, second, other
+
+    calls, hits, misses, first, second, other = asyncio.run(main())
+
+    assert (calls, hits, misses) == (2, 1, 2)
+    assert second.content == first.content == ["answer 1"]
+    assert second is not first
+    assert other.content == ["answer 2"]
+
+
+def test_hits_keep_the_usage():
+    async def main():
+        generator = CachingGenerator(CountingGenerator())
+        await ask(generator)
+        return await ask(generator)
+
+    assert asyncio.run(main()).usage == Usage(input_tokens=10, output_tokens=1)
+
+
+def test_streamed_hits_keep_the_usage():
+    async def main():
+        generator = CachingGenerator(CountingGenerator())
+        await ask(generator, on_delta=lambda delta: None)
+        return await ask(generator, on_delta=lambda delta: None)
+
+    assert asyncio.run(main()).usage == Usage(input_tokens=10, output_tokens=1)
+
+
+def test_single_flight_shares_one_request():
+    async def main():
+        wrapped = CountingGenerator(delay=0.05)
+        generator = CachingGenerator(wrapped)
+        responses = await asyncio.gather(*(ask(generator) for _ in range(3)))
+        return wrapped.calls, generator.hits, responses
+
+    calls, hits, responses = asyncio.run(main())
+
+    assert calls == 1 and hits == 2
+    assert [response.content for response in responses] == [["answer 1"]] * 3
+    assert len({id(response) for response in responses}) == 3
+
+
+def test_without_single_flight_every_request_is_sent():
+    async def main():
+        wrapped = CountingGenerator(delay=0.05)
+        generator = CachingGenerator(wrapped, single_flight=False)
+        await asyncio.gather(*(ask(generator) for _ in range(3)))
+        return wrapped.calls
+
+    assert asyncio.run(main()) == 3
+
+
+def test_rejected_responses_are_not_replayed():
+    @validator
+    def first_is_wrong(messages, response, format_keys):
+        if response.content == ["answer 1"]:
+            raise ValidationError("wrong")
+
+    async def main():
+        wrapped = CountingGenerator()
+        generator = CachingGenerator(wrapped)
+        response = await generator.get_response([Message("user", "hi")], {}, None, None, [first_is_wrong])
+        replayed = await ask(generator)
+        return wrapped.calls, response, replayed
+
+    calls, response, replayed = asyncio.run(main())
+
+    assert response.content == ["answer 2"]
+    assert calls == 3
+    assert replayed.content == ["answer 3"]
+
+
+def test_memory_cache_evicts_the_least_recently_used():
+    async def main():
+        cache = MemoryResponseCache(maxsize=2)
+        await cache.set("a", Response("a"))
+        await cache.set("b", Response("b"))
+        await cache.get("a")
+        await cache.set("c", Response("c"))
+        return [await cache.get(key) for key in "abc"], len(cache)
+
+    (a, b, c), size = asyncio.run(main())
+
+    assert a.content == ["a"] and b is None and c.content == ["c"]
+    assert size == 2
+
+
+def test_memory_cache_expires_entries():
+    async def main():
+        cache = MemoryResponseCache(ttl=0.05)
+        await cache.set("a", Response("a"))
+        fresh = await cache.get("a")
+        await asyncio.sleep(0.06)
+        return fresh, await cache.get("a"), len(cache)
+
+    fresh, expired, size = asyncio.run(main())
+
+    assert fresh.content == ["a"]
+    assert expired is None and size == 0
+
+
+@pytest.fixture
+def sqlite_cache(tmp_path):
+    cache = SQLiteResponseCache(str(tmp_path / "cache" / "responses.db"), ttl=0.2)
+    yield cache
+    cache.close()
+
+
+def test_sqlite_cache_stores_across_connections(sqlite_cache):
+    async def main():
+        await sqlite_cache.set("a", Response(["a"], usage=Usage(1, 2)))
+        other = SQLiteResponseCache(sqlite_cache.path)
+        try:
+            return await other.get("a"), await other.get("b")
+        finally:
+            other.close()
+
+    found, missing = asyncio.run(main())
+
+    assert found.content == ["a"] and found.usage == Usage(1, 2)
+    assert missing is None
+
+
+def test_sqlite_cache_expires_deletes_and_clears(sqlite_cache):
+    async def main():
+        await sqlite_cache.set("a", Response("a"))
+        await sqlite_cache.set("b", Response("b"))
+        await sqlite_cache.set("c", Response("c"))
+        await sqlite_cache.delete("a")
+        deleted = await sqlite_cache.get("a")
+        await sqlite_cache.clear()
+        cleared = await sqlite_cache.get("b")
+        await sqlite_cache.set("d", Response("d"))
+        fresh = await sqlite_cache.get("d")
+        time.sleep(0.25)
+        return deleted, cleared, fresh, await sqlite_cache.get("d")
+
+    deleted, cleared, fresh, expired = asyncio.run(main())
+
+    assert deleted is None and cleared is None
+    assert fresh.content == ["d"]
+    assert expired is None
+
+
+def test_caching_generator_with_sqlite(sqlite_cache):
+    async def main():
+        wrapped = CountingGenerator()
+        await ask(CachingGenerator(wrapped, sqlite_cache))
+        response = await ask(CachingGenerator(wrapped, sqlite_cache))
+        return wrapped.calls, response
+
+    calls, response = asyncio.run(main())
+
+    assert calls == 1
+    assert response.content == ["answer 1"] and response.usage == Usage(10, 1)
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from vespwood_generator import Generator, Message, Response, RetryPolicy, MaxTokenLimitError, RateLimitError, Usage
+from vespwood_generator import generator as generator_module
+
+
+class TruncatingGenerator(Generator):
+    """
+    Raises MaxTokenLimitError with the text generated so far, like the OpenAI
+    chat completion generator, until `parts` runs out.
+    """
+    def __init__(self, *parts: str):
+        self.parts = list(parts)
+        self.conversations: list[list[Message]] = []
+
+    async def __prompt__(self, messages, schema=None, tools=None, **kwargs):
+        self.conversations.append(messages)
+        text = self.parts.pop(0)
+        usage = Usage(input_tokens=10, output_tokens=len(text))
+        if self.parts:
+            raise MaxTokenLimitError(text, usage=usage)
+        return Response(text, usage=usage)
+
+
+def test_continues_truncated_str_response():
+    generator = TruncatingGenerator("hello wo", "rld")
+    response = asyncio.run(generator.get_response([Message("user", "hi")], {}, None, None, None))
+
+    assert response.content == ["hello wo", "rld"]
+    continuation = generator.conversations[1][-1]
+    assert continuation.role == "assistant"
+    assert continuation.content == ["hello wo"]
+
+
+def test_gives_back_truncated_str_response_when_out_of_continuations():
+    generator = TruncatingGenerator("hello ", "wo", "rld")
+    policy = RetryPolicy(max_continuations=1)
+    with pytest.raises(MaxTokenLimitError) as error:
+        asyncio.run(generator.get_response([Message("user", "hi")], {}, None, None, None, retry_policy=policy))
+
+    assert error.value.generated_content == ["hello ", "wo"]
+
+
+def test_sums_the_usage_of_every_part():
+    generator = TruncatingGenerator("hello wo", "rld")
+    response = asyncio.run(generator.get_response([Message("user", "hi")], {}, None, None, None))
+
+    assert response.usage == Usage(input_tokens=20, output_tokens=11)
+
+
+def test_sums_the_usage_of_every_part_when_out_of_continuations():
+    generator = TruncatingGenerator("hello ", "wo", "rld")
+    policy = RetryPolicy(max_continuations=1)
+    with pytest.raises(MaxTokenLimitError) as error:
+        asyncio.run(generator.get_response([Message("user", "hi")], {}, None, None, None, retry_policy=policy))
+
+    assert error.value.usage == Usage(input_tokens=20, output_tokens=8)
+
+
+class RateLimitedGenerator(Generator):
+    def __init__(self, limited: int):
+        self.limited = limited
+        self.calls = 0
+
+    async def __prompt__(self, messages, schema=None, tools=None, **kwargs):
+        self.calls += 1
+        if self.calls <= self.limited:
+            raise RateLimitError()
+        return Response("ok")
+
+
+def test_retries_rate_limits_until_they_stop(monkeypatch):
+    monkeypatch.setattr(generator_module, "backoff_delay", lambda *args, **kwargs: 0)
+    generator = RateLimitedGenerator(20)
+    response = asyncio.run(generator.get_response([Message("user", "hi")], {}, None, None, None))
+
+    assert response.content == ["ok"]
+    assert generator.calls == 21
+
+
+def test_rate_limit_retries_can_be_bounded_or_disabled(monkeypatch):
+    monkeypatch.setattr(generator_module, "backoff_delay", lambda *args, **kwargs: 0)
+    bounded = RateLimitedGenerator(20)
+    with pytest.raises(RateLimitError):
+        asyncio.run(bounded.get_response([Message("user", "hi")], {}, None, None, None, max_rate_limit_retries=3))
+    disabled = RateLimitedGenerator(20)
+    with pytest.raises(RateLimitError):
+        asyncio.run(disabled.get_response([Message("user", "hi")], {}, None, None, None, retry_on_rate_limit=False))
+
+    assert bounded.calls == 4
+    assert disabled.calls == 1
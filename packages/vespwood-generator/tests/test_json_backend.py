@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+from vespwood_generator import ToolCall, get_json_backend, json_dumps, json_loads, set_json_backend
+
+
+DATA = {"name": "café", "rows": [1, 2.5, None, True], "nested": {"a": "b"}}
+
+
+@pytest.fixture(params=["json", "orjson", "msgspec"])
+def backend(request):
+    default = get_json_backend()
+    try:
+        set_json_backend(request.param)
+    except ImportError:
+        pytest.skip(f"{request.param} is not installed")
+    yield request.param
+    set_json_backend(default)
+
+
+def test_standard_library_output_is_unchanged():
+    default = get_json_backend()
+    set_json_backend("json")
+    try:
+        assert json_dumps(DATA) == json.dumps(DATA)
+        assert json_dumps(DATA, indent=True) == json.dumps(DATA, indent=2)
+        tool = ToolCall(id="a", name="f", arguments={"q": "é"})
+        assert str(tool) == json.dumps(tool.json, indent=2)
+    finally:
+        set_json_backend(default)
+
+
+def test_backends_round_trip(backend):
+    assert json_loads(json_dumps(DATA)) == DATA
+    assert json_loads(json_dumps(DATA, indent=True).encode()) == DATA
+
+
+def test_invalid_json_raises_json_decode_error(backend):
+    with pytest.raises(json.JSONDecodeError):
+        json_loads('{"a": ')
+    with pytest.raises(json.JSONDecodeError):
+        json_loads(b"[1,")
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        set_json_backend("yaml")
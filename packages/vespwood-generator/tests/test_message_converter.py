@@ -0,0 +1,54 @@
+from vespwood_generator import Message, ToolCall
+from vespwood_generator.message_converter import message_converter
+
+
+def counting_converter():
+    converted = []
+
+    @message_converter
+    def convert(message: Message) -> list[dict]:
+        converted.append(message)
+        return [{"role": message.role, "content": [str(block) for block in message]}]
+
+    return convert, converted
+
+
+def test_unchanged_messages_are_converted_once():
+    convert, converted = counting_converter()
+    history = [Message("user", "hi"), Message("assistant", "hello")]
+
+    first = convert(history)
+    second = convert([*history, Message("user", "bye")])
+
+    assert second[:2] == first
+    assert len(converted) == 3
+
+
+def test_added_blocks_and_tool_results_are_converted_again():
+    convert, converted = counting_converter()
+    call = ToolCall(id="a", name="f", arguments={})
+    message = Message("assistant", [call])
+
+    convert([message])
+    message.append("more")
+    convert([message])
+    call.add_result("done")
+    encoded = convert([message])
+
+    assert len(converted) == 3
+    assert "done" in encoded[0]["content"][0] and encoded[0]["content"][1] == "more"
+
+
+def test_content_changed_in_place_is_converted_again():
+    convert, converted = counting_converter()
+    shared = ["hi"]
+    message = Message("user", shared)
+    other = Message("user", shared)
+
+    convert([message])
+    message.content.append("appended")
+    assert convert([message])[0]["content"] == ["hi", "appended"]
+    # Changed through another message sharing the list
+    other.content[0] = "replaced"
+    assert convert([message])[0]["content"] == ["replaced", "appended"]
+    assert len(converted) == 3
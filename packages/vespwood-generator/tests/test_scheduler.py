@@ -0,0 +1,261 @@
+import asyncio
+
+import pytest
+
+from vespwood_generator import Generator, Message, Response, RetryPolicy, RateLimitError, RateScheduler, TokenBucket, Usage
+
+
+def test_token_bucket_refills_over_time():
+    bucket = TokenBucket(60, capacity=2)
+
+    assert bucket.wait_time(2, 0) == 0
+    bucket.take(2, 0)
+    assert bucket.wait_time(1, 0) == pytest.approx(1)
+    assert bucket.wait_time(1, 0.5) == pytest.approx(0.5)
+    assert bucket.wait_time(1, 1) == 0
+    # Never more than its capacity
+    assert bucket.wait_time(2, 100) == 0 and bucket.wait_time(5, 100) == 0
+
+
+def test_token_bucket_adjust_refunds_and_charges():
+    bucket = TokenBucket(600)
+    bucket.take(500, 0)
+
+    bucket.adjust(400, 0)
+    assert bucket.wait_time(500, 0) == 0
+    bucket.adjust(-400, 0)
+    assert bucket.wait_time(500, 0) == pytest.approx(40)
+
+
+def test_waiters_are_admitted_by_priority_then_arrival():
+    async def main():
+        scheduler = RateScheduler(max_concurrency=1)
+        first = await scheduler.acquire()
+        order = []
+
+        async def wait(name: str, priority: int):
+            permit = await scheduler.acquire(priority=priority)
+            order.append(name)
+            permit.release()
+
+        tasks = [asyncio.create_task(wait(name, priority)) for name, priority in [("low", 1), ("high", 0), ("low again", 1)]]
+        await asyncio.sleep(0)
+        assert scheduler.in_flight == 1 and scheduler.waiting == 3
+        first.release()
+        await asyncio.gather(*tasks)
+        return order, scheduler.in_flight
+
+    order, in_flight = asyncio.run(main())
+
+    assert order == ["high", "low", "low again"]
+    assert in_flight == 0
+
+
+def test_cancelled_waiter_does_not_hold_a_slot():
+    async def main():
+        scheduler = RateScheduler(max_concurrency=1)
+        first = await scheduler.acquire()
+        waiter = asyncio.create_task(scheduler.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        first.release()
+        await asyncio.gather(waiter, return_exceptions=True)
+        permit = await asyncio.wait_for(scheduler.acquire(), 1)
+        return scheduler.in_flight, permit
+
+    in_flight, _ = asyncio.run(main())
+
+    assert in_flight == 1
+
+
+def test_release_corrects_the_estimate_with_the_tokens_used():
+    async def main():
+        scheduler = RateScheduler(tokens_per_minute=1_000)
+        permit = await scheduler.acquire(tokens=600)
+        now = asyncio.get_running_loop().time()
+        before = scheduler.__admissible__(900, now)
+        permit.release(used_tokens=10)
+        return before, scheduler.__admissible__(900, now)
+
+    before, after = asyncio.run(main())
+
+    assert before > 0
+    assert after == 0
+
+
+class RateLimitedGenerator(Generator):
+    def __init__(self, scheduler: RateScheduler, *responses):
+        self.scheduler = scheduler
+        self.responses = list(responses)
+        self.in_flight: list[int] = []
+
+    async def __prompt__(self, messages, schema=None, tools=None, **kwargs):
+        self.in_flight.append(self.scheduler.in_flight)
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def test_get_response_takes_a_permit_per_attempt():
+    async def main():
+        scheduler = RateScheduler(requests_per_minute=60, burst=2, max_concurrency=1, adaptive=False)
+        generator = RateLimitedGenerator(scheduler, RateLimitError(), Response(["ok"], usage=Usage(5, 5)))
+        backing_off = []
+        response = await generator.get_response(
+            [Message("user", "hi")], {}, None, None, None,
+            on_rate_limit=lambda e: backing_off.append(scheduler.in_flight),
+            retry_policy=RetryPolicy(backoff_base=0.001),
+            scheduler=scheduler
+        )
+        now = asyncio.get_running_loop().time()
+        return response, generator.in_flight, backing_off, scheduler.in_flight, scheduler.__admissible__(0, now)
+
+    response, in_flight, backing_off, after, wait = asyncio.run(main())
+
+    assert response.content == ["ok"]
+    assert in_flight == [1, 1]
+    # The slot is free while backing off
+    assert backing_off == [0]
+    assert after == 0
+    # Both attempts were charged to the requests-per-minute bucket
+    assert wait > 0
+
+
+def test_get_response_releases_the_permit_on_errors():
+    async def main():
+        scheduler = RateScheduler(max_concurrency=1)
+        generator = RateLimitedGenerator(scheduler, ValueError("boom"))
+        with pytest.raises(ValueError):
+            await generator.get_response([Message("user", "hi")], {}, None, None, None, scheduler=scheduler)
+        return scheduler.in_flight
+
+    assert asyncio.run(main()) == 0
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000.0
+
+    def run(self, test):
+        # The scheduler reads the time from the running loop
+        async def main():
+            asyncio.get_running_loop().time = lambda: self.now
+            return await test()
+        return asyncio.run(main())
+
+
+async def admit(scheduler: RateScheduler, count: int) -> list:
+    return [await scheduler.acquire() for _ in range(count)]
+
+
+def test_rate_limit_halves_the_requests_in_flight():
+    clock = FakeClock()
+
+    async def test():
+        scheduler = RateScheduler(max_concurrency=8)
+        await admit(scheduler, 8)
+        assert scheduler.concurrency_limit == 8
+        scheduler.on_rate_limit()
+        return scheduler.concurrency_limit
+
+    assert clock.run(test) == 4
+
+
+def test_rate_limits_within_the_cooldown_shrink_once():
+    clock = FakeClock()
+
+    async def test():
+        scheduler = RateScheduler(max_concurrency=8)
+        await admit(scheduler, 8)
+        limits = []
+        for step in (0, 0.5, 0.5, 0.5):
+            clock.now += step
+            scheduler.on_rate_limit()
+            limits.append(scheduler.concurrency_limit)
+        # The cooldown is at least the provider's retry-after
+        clock.now += 1
+        scheduler.on_rate_limit(retry_after=5)
+        clock.now += 2
+        scheduler.on_rate_limit()
+        limits.append(scheduler.concurrency_limit)
+        return limits
+
+    assert clock.run(test) == [4, 4, 2, 2, 1]
+
+
+def test_limit_never_goes_below_min_concurrency():
+    clock = FakeClock()
+
+    async def test():
+        scheduler = RateScheduler(max_concurrency=8, min_concurrency=3)
+        await admit(scheduler, 8)
+        for _ in range(5):
+            scheduler.on_rate_limit()
+            clock.now += RateScheduler.DECREASE_COOLDOWN
+        return scheduler.concurrency_limit
+
+    assert clock.run(test) == 3
+
+
+def test_successes_grow_the_limit_back_to_max_concurrency():
+    clock = FakeClock()
+
+    async def test():
+        scheduler = RateScheduler(max_concurrency=8)
+        permits = await admit(scheduler, 8)
+        scheduler.on_rate_limit()
+        clock.now += RateScheduler.DECREASE_COOLDOWN
+        scheduler.on_rate_limit()
+        limits = [scheduler.concurrency_limit]
+        for permit in permits:
+            permit.release(succeeded=True)
+            limits.append(scheduler.concurrency_limit)
+        for _ in range(50):
+            scheduler.on_success()
+        limits.append(scheduler.concurrency_limit)
+        return limits
+
+    limits = clock.run(test)
+
+    # Additive increase, 1/limit a success
+    assert limits[:4] == [2, 2, 2, 3]
+    assert limits == sorted(limits)
+    assert limits[-1] == 8
+
+
+def test_growing_limit_admits_waiters():
+    clock = FakeClock()
+
+    async def test():
+        scheduler = RateScheduler(max_concurrency=4)
+        await admit(scheduler, 1)
+        scheduler.on_rate_limit()
+        waiter = asyncio.create_task(scheduler.acquire())
+        await asyncio.sleep(0)
+        waiting = scheduler.waiting
+        scheduler.on_success()
+        await asyncio.sleep(0)
+        return waiting, waiter.done(), scheduler.in_flight
+
+    assert clock.run(test) == (1, True, 2)
+
+
+def test_retry_after_pauses_admissions():
+    clock = FakeClock()
+
+    async def test():
+        scheduler = RateScheduler(adaptive=False)
+        scheduler.on_rate_limit(retry_after=3)
+        waits = [scheduler.__admissible__(0, clock.now)]
+        clock.now += 2
+        waits.append(scheduler.__admissible__(0, clock.now))
+        clock.now += 1
+        waits.append(scheduler.__admissible__(0, clock.now))
+        return waits, scheduler.concurrency_limit
+
+    waits, limit = clock.run(test)
+
+    assert waits == [3, 1, 0]
+    # Not adaptive, the limit stays unset
+    assert limit is None
@@ -0,0 +1,42 @@
+from typing import Optional
+
+import pytest
+
+from vespwood_generator import schema
+from vespwood_generator.schematic import decoder
+
+
+@schema(fast=True)
+class Person:
+    name: str
+    age: int
+    tags: list[str]
+    nick: Optional[str] = None
+
+
+@pytest.fixture(params=["native", "fallback"])
+def backend(request, monkeypatch):
+    if request.param == "native" and decoder.msgspec is None:
+        pytest.skip("msgspec is not installed")
+    if request.param == "fallback":
+        monkeypatch.setattr(decoder, "msgspec", None)
+    # Decoders are compiled once per class, with the backend of the time
+    monkeypatch.setattr(Person, "_decoder", None, raising=False)
+    return request.param
+
+
+def test_decode_skips_absent_defaulted_field(backend):
+    person = Person.decode('{"name":"b","age":2,"tags":["x"]}')
+
+    assert person == Person(name="b", age=2, tags=["x"], nick=None)
+
+
+def test_decode_reads_present_defaulted_field(backend):
+    person = Person.decode({"name": "b", "age": 2, "tags": ["x"], "nick": "bee"})
+
+    assert person.nick == "bee"
+
+
+def test_decode_rejects_absent_required_field(backend):
+    with pytest.raises(ValueError):
+        Person.decode('{"name":"b","tags":["x"]}')
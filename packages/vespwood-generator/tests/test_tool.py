@@ -0,0 +1,94 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import asyncio
+import importlib
+import os
+import threading
+import time
+
+import pytest
+
+from vespwood_generator import tool
+
+
+@tool
+def thread_name() -> str:
+    "The thread the tool runs on"
+    return threading.current_thread().name
+
+
+@tool(run_in="thread")
+def thread_name_off_loop() -> str:
+    "The thread the tool runs on"
+    return threading.current_thread().name
+
+
+@tool(run_in="process")
+def process_id(offset: int) -> int:
+    "The process the tool runs in"
+    return os.getpid() + offset
+
+
+@tool(timeout=0.05)
+async def late() -> str:
+    "Outlives its timeout"
+    await asyncio.sleep(1)
+    return "late"
+
+
+@tool(max_concurrency=1)
+async def one_at_a_time(delay: float) -> float:
+    "Runs alone"
+    await asyncio.sleep(delay)
+    return time.perf_counter()
+
+
+def test_sync_tools_run_inline_unless_they_opt_out():
+    async def main():
+        with ThreadPoolExecutor(thread_name_prefix="tools") as executor:
+            return (
+                await thread_name.run({}, executor=executor),
+                await thread_name_off_loop.run({}, executor=executor),
+                threading.current_thread().name
+            )
+
+    inline, off_loop, loop_thread = asyncio.run(main())
+
+    assert inline == loop_thread
+    assert off_loop.startswith("tools")
+
+
+def test_process_tools_run_in_another_process():
+    async def main():
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            return await process_id.run({"offset": 0}, process_executor=executor)
+
+    assert asyncio.run(main()) != os.getpid()
+
+
+def test_process_tools_start_a_default_pool_shut_down_at_exit():
+    # The schematic package exports the decorator under the module's name
+    tool_module = importlib.import_module("vespwood_generator.schematic.tool")
+
+    try:
+        assert asyncio.run(process_id.run({"offset": 0})) != os.getpid()
+        assert tool_module._process_executor is not None
+    finally:
+        tool_module._shutdown_process_executor()
+    assert tool_module._process_executor is None
+
+
+def test_timeout_raises():
+    with pytest.raises(TimeoutError):
+        asyncio.run(late.run({}))
+
+
+def test_max_concurrency_holds_in_every_event_loop():
+    async def main():
+        start = time.perf_counter()
+        finished = await asyncio.gather(*(one_at_a_time.run({"delay": 0.05}) for _ in range(3)))
+        return sorted(end - start for end in finished)
+
+    # A semaphore bound to the first loop would fail in the second one
+    for _ in range(2):
+        ends = asyncio.run(main())
+        assert ends[0] >= 0.04 and ends[1] >= 0.09 and ends[2] >= 0.14
@@ -19,10 +19,11 @@ from .expression import Expression
 from .format_object import FormatObject, FormatList, FormatKeys
 
 from .hook import hook, Hook
-from .interceptor import ResponseHandler, interceptor, Interceptor
+from .interceptor import ResponseHandler, DeltaHandler, StreamingResponseHandler, interceptor, Interceptor
 from .logic import Logic
-from .match import match
+from .match import match, compile_match
 from .prompt_mapping import PromptMapping
+from .registry import Registry, NameIndex
 from .tagged_messages import TaggedMessages
 from .message import Prompt
 
@@ -39,10 +40,15 @@ from .types import (
 from vespwood_generator import (
     Role,
     Block, File, Image, Structured, ToolCall,
-    Message, Response,
+    Message, Response, Usage,
+    Delta, TextDelta, StructuredDelta, ToolCallDelta, BlockDone,
     validator, Validator,
-    Schematic, schema, Schema, tool, Tool,
+    Schematic, schema, Schema, tool, Tool, ToolCache,
     GeneratorClass, Generator,
+    CachingGenerator, ResponseCache, MemoryResponseCache, SQLiteResponseCache,
+    RateScheduler,
+    RetryPolicy,
+    JSONBackend, get_json_backend, set_json_backend,
     Tag
 )
 
@@ -66,10 +72,18 @@ __all__ = [
     "StopGeneration",
     "ValidationError",
     
+    # Streaming
+    "Delta",
+    "TextDelta",
+    "StructuredDelta",
+    "ToolCallDelta",
+    "BlockDone",
+
     # Message & Prompt Structure
     "Message",
     "Prompt",
     "Response",
+    "Usage",
     "PromptStructure",
     "MessageList",
 
@@ -77,7 +91,18 @@ __all__ = [
     "Completor",
     "GeneratorClass",
     "Generator",
+    "CachingGenerator",
+    "ResponseCache",
+    "MemoryResponseCache",
+    "SQLiteResponseCache",
     "PromptMapping",
+    "RateScheduler",
+    "Registry",
+    "NameIndex",
+    "RetryPolicy",
+    "JSONBackend",
+    "get_json_backend",
+    "set_json_backend",
     "Tag",
     "TaggedMessages",
     
@@ -87,11 +112,13 @@ __all__ = [
     "Schema",
     "tool",
     "Tool",
+    "ToolCache",
 
     # Logic
     "Logic",
     "Expression",
     "match",
+    "compile_match",
     
     # Generation & Formatting
     "FormatObject",
@@ -102,6 +129,8 @@ __all__ = [
     "hook",
     "Hook",
     "ResponseHandler",
+    "DeltaHandler",
+    "StreamingResponseHandler",
     "interceptor",
     "Interceptor",
     "validator",
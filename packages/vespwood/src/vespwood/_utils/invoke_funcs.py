@@ -10,7 +10,11 @@ async def invoke_funcs(funcs: list[Callable[..., Any]], *args, **kwargs):
             tasks.append(asyncio.create_task(fn(*args, **kwargs)))
         else:
             result = fn(*args, **kwargs)
-            results.append(result)
+            # Objects with an async __call__, like AsyncInterceptor, aren't coroutine functions
+            if inspect.isawaitable(result):
+                tasks.append(asyncio.ensure_future(result))
+            else:
+                results.append(result)
     for awaitable in asyncio.as_completed(tasks):
         result = await awaitable
         results.append(result)
@@ -1,14 +1,22 @@
+from collections.abc import Callable, Iterable
+from concurrent.futures import Executor
+import functools
 import inspect
+import json
 from pathlib import Path
 from typing import Any
 import uuid
 import asyncio
+import warnings
 from vespwood_generator import (
     Generator,
+    RateScheduler,
+    RetryPolicy,
     Schema, Tool,
     Validator,
-    Response,
-    Structured, ToolCall
+    Response, Message,
+    Structured, ToolCall,
+    Tag, Delta, BlockDone
 )
 from vespwood.types import PreparedArgs, HooksList, Params
 from vespwood._utils import invoke_funcs
@@ -17,12 +25,12 @@ from vespwood.format_object import FormatKeys
 from vespwood.tagged_messages import TaggedMessages
 from vespwood.hook import Hook
 from vespwood.prompt_structure import PromptStructure, MessageList
-from vespwood.errors import StopGeneration, MissingParamError, MissingSchemaError, MissingToolError, MissingHookError, MissingValidatorError
-import bisect
+from vespwood.registry import Registry
+from vespwood.errors import StopGeneration, MissingParamError, MissingSchemaError
 
 
 class Completor:
-    __slots__ = "_generator", "_prompt_structure", "_name", "_description", "_params", "_schemas", "_tools", "_hooks", "_validators", "_interceptors", "_delay_constant", "_max_requests", "_generation_queue", "_lock", "_continue_on_max_token", "_retry_on_rate_limit", "_retry_with_delay",
+    __slots__ = "_generator", "_prompt_structure", "_name", "_description", "_params", "_registry", "_inline_schemas", "_interceptors", "_delay_constant", "_max_requests", "_scheduler", "_priority", "_continue_on_max_token", "_retry_on_rate_limit", "_retry_with_delay", "_retry_policy", "_tool_executor", "_process_executor", "_stream", "_dispatch_tools_early",
 
     def __init__(self,
                 generator: Generator,
@@ -34,12 +42,20 @@ class Completor:
                 tools: list[Tool] = [],
                 hooks: list[Hook] = [],
                 validators: list[Validator] = [],
+                registry: Registry | None = None,
                 interceptors: list[Interceptor] = [],
                 delay_constant: int = 0,
                 max_requests: int = 0,
+                scheduler: RateScheduler | None = None,
+                priority: int = 0,
                 continue_on_max_token: bool = True,
                 retry_on_rate_limit: bool = True,
                 retry_with_delay: int = 0,
+                retry_policy: RetryPolicy | None = None,
+                tool_executor: Executor | None = None,
+                process_executor: Executor | None = None,
+                stream: bool = False,
+                dispatch_tools_early: bool = True,
                 **kwargs
             ):
         if isinstance(prompt_structure, str):
@@ -50,13 +66,14 @@ class Completor:
             if not path.is_absolute() and not path.is_file():
                 path = (Path(src_file).parent / path)
                 prompt_structure = str(path)
-            self._prompt_structure = PromptStructure.load_from_file(prompt_structure)
+            self._prompt_structure = PromptStructure.load_shared(prompt_structure)
         
+        # Structures built here belong to this Completor, frozen so their plan is compiled once
         elif isinstance(prompt_structure, dict):
-            self._prompt_structure = PromptStructure.load_from_dict(prompt_structure)
+            self._prompt_structure = PromptStructure.load_from_dict(prompt_structure).freeze()
 
         elif isinstance(prompt_structure, list):
-            self._prompt_structure = PromptStructure.load_from_structure(prompt_structure)
+            self._prompt_structure = PromptStructure.load_from_structure(prompt_structure).freeze()
 
         elif isinstance(prompt_structure, PromptStructure):
             self._prompt_structure = prompt_structure
@@ -66,49 +83,60 @@ class Completor:
         self._params: Params | None = self._prompt_structure.params
 
         schema_list = self._prompt_structure.schemas or []
-        schema_names = set(map(lambda s: s.name, schemas))
-        if diff := set(filter(lambda s: isinstance(s, str), schema_list)) - schema_names:
-            raise MissingSchemaError(diff)
-        for s in filter(lambda s: isinstance(s, dict), schema_list):
-            try:
-                schemas.append(Schema.from_json_schema(**s, schemas=schemas))
-            except KeyError as e:
-                raise MissingSchemaError([*e.args])
-        schemas.sort(key=lambda s: s.name)
-        self._schemas: list[Schema] = schemas
-
-        tools.sort(key=lambda t: t.name)
-        tool_list = set(self._prompt_structure.tools or [])
-        tool_names = set(map(lambda t: t.name, tools))
-        if diff := tool_list - tool_names:
-            raise MissingToolError(diff)
-        self._tools: list[Tool] = tools
-
-        hooks.sort(key=lambda h: h.name)
-        hook_list = set(self._prompt_structure.hooks or [])
-        hook_names = set(map(lambda h: h.name, hooks))
-        if diff := hook_list - hook_names:
-            raise MissingHookError(diff)
-        self._hooks: list[Hook] = hooks
-
-        validators.sort(key=lambda h: h.name)
-        validator_list = set(self._prompt_structure.validators or [])
-        validator_names = set(map(lambda v: v.name, validators))
-        if diff := validator_list - validator_names:
-            raise MissingValidatorError(diff)
-        
-        self._validators: list[Hook] = validators
+        if registry is None:
+            registry = Registry(schemas=schemas, tools=tools, hooks=hooks, validators=validators)
+        elif schemas or tools or hooks or validators:
+            raise ValueError("Pass either a registry or the schemas, tools, hooks and validators lists, not both")
+        registry.schemas.check([s for s in schema_list if isinstance(s, str)])
+        self._inline_schemas: dict[str, Schema] = {}
+        if inline_schemas := [s for s in schema_list if isinstance(s, dict)]:
+            # Inline schemas belong to this structure, the given lists and registry stay untouched
+            known = list(registry.schemas.values())
+            for s in inline_schemas:
+                known.append(self.__build_schema__(s, known))
+            registry = Registry(schemas=known, tools=registry.tools.values(), hooks=registry.hooks.values(), validators=registry.validators.values())
+        registry.tools.check(self._prompt_structure.tools or [])
+        registry.hooks.check(self._prompt_structure.hooks or [])
+        registry.validators.check(self._prompt_structure.validators or [])
+        self._registry: Registry = registry
+        # Schemas declared inline on prompts are built once here instead of on every turn
+        for prompt in self._prompt_structure.iter_prompts():
+            if isinstance(prompt.schema, dict):
+                self.__build_schema__(prompt.schema, registry.schemas.values())
+
         self._generator: Generator = generator
         self._interceptors: list[Interceptor] = interceptors
         self._delay_constant: int = delay_constant
         self._max_requests: int = max_requests
         
-        self._generation_queue: asyncio.Queue = asyncio.Queue(maxsize=max_requests or 0)
-        self._lock = asyncio.Lock()
+        if scheduler is None:
+            if max_requests or delay_constant:
+                # Legacy settings, at most max_requests in flight and one request start every delay_constant seconds
+                warnings.warn(
+                    "max_requests and delay_constant are deprecated, pass a RateScheduler instead. "
+                    "max_requests now limits the requests in flight to the generator rather than the sessions running, "
+                    "and delay_constant the time between two requests rather than two sessions.",
+                    DeprecationWarning,
+                    stacklevel=2
+                )
+                scheduler = RateScheduler(
+                    requests_per_minute=60 / delay_constant if delay_constant else None,
+                    burst=1,
+                    max_concurrency=max_requests or None
+                )
+            else:
+                scheduler = RateScheduler.shared(generator)
+        self._scheduler: RateScheduler = scheduler
+        self._priority: int = priority
 
         self._continue_on_max_token = continue_on_max_token
-        self._retry_on_rate_limit = retry_on_rate_limit,
+        self._retry_on_rate_limit = retry_on_rate_limit
         self._retry_with_delay = retry_with_delay
+        self._retry_policy = retry_policy
+        self._tool_executor = tool_executor
+        self._process_executor = process_executor
+        self._stream = stream
+        self._dispatch_tools_early = dispatch_tools_early
     
 
     @property
@@ -123,42 +151,117 @@ class Completor:
     def params(self) -> Params | None:
         return self._params
     
+    @property
+    def registry(self) -> Registry:
+        return self._registry
+    
     @property
     def schemas(self) -> list[Schema]:
-        return self._schemas
+        return self._registry.schemas.sorted()
     
     @property
     def tools(self) -> list[Tool]:
-        return self._tools
+        return self._registry.tools.sorted()
     
     @property
     def hooks(self) -> list[Hook]:
-        return self._hooks
+        return self._registry.hooks.sorted()
     
     @property
     def validators(self) -> list[Validator]:
-        return self._validators
+        return self._registry.validators.sorted()
+    
+    @property
+    def scheduler(self) -> RateScheduler:
+        return self._scheduler
 
 
     def _invoke_hooks(self, hooks: HooksList, response: Response, messages: TaggedMessages, format_keys: FormatKeys) -> dict[str, Any]:
-        new_keys = {}            
+        new_keys = {}
+        names = [hook if isinstance(hook, str) else hook["name"] for hook in hooks if isinstance(hook, (str, dict))]
+        resolved = iter(self._registry.hooks.resolve(names))
         for hook in hooks:
             if isinstance(hook, str):
-                i = bisect.bisect_left(self.hooks, hook, key=lambda h: h.name)
-                if i == len(self.hooks) or self.hooks[i].name != hook:
-                    raise MissingHookError([hook])
-                k = self.hooks[i](response, messages, format_keys.copy_with_extra(**new_keys))
+                k = next(resolved)(response, messages, format_keys.copy_with_extra(**new_keys))
                 if k: new_keys.update(k)
             elif isinstance(hook, dict):
-                i = bisect.bisect_left(self.hooks, hook["name"], key=lambda h: h.name)
-                if i == len(self.hooks) or self.hooks[i].name != hook["name"]:
-                    raise MissingHookError([hook["name"]])
-                k = self.hooks[i](response, messages, format_keys.copy_with_extra(**new_keys), **(hook["args"] if "args" in hook else {}))
+                k = next(resolved)(response, messages, format_keys.copy_with_extra(**new_keys), **(hook["args"] if "args" in hook else {}))
                 if k: new_keys.update(k)
         return new_keys
     
 
-    async def __complete__(self, prepared_args: PreparedArgs) -> tuple[TaggedMessages, FormatKeys]:
+    def __build_schema__(self, schema: dict[str, Any], schemas: Iterable[Schema]) -> Schema:
+        # A memo key, kept canonical with the standard library whichever JSON backend is installed
+        key = json.dumps(schema, sort_keys=True, separators=(",", ":"), default=str)
+        if (built := self._inline_schemas.get(key)) is None:
+            try:
+                built = self._inline_schemas[key] = Schema.from_json_schema(schema["name"], schema.get("json_schema"), description=schema.get("description"), schemas=schemas)
+            except KeyError as e:
+                raise MissingSchemaError([*e.args])
+        return built
+
+
+    def __resolve_tools__(self, tools: list[str | dict]) -> list[Tool]:
+        if all(isinstance(tool, str) for tool in tools):
+            return list(self._registry.tools.resolve(tools))
+        index = self._registry.tools
+        index.check([tool if isinstance(tool, str) else tool["name"] for tool in tools])
+        _tools = []
+        for tool in tools:
+            if isinstance(tool, str):
+                _tools.append(index[tool])
+            elif isinstance(tool, dict):
+                _tool = index[tool["name"]]
+                _tool.update_with(description=tool.get("description"), schema=tool.get("schema"))
+                _tools.append(_tool)
+        return _tools
+
+
+    def __start_tool__(self, tool: Tool, block: ToolCall) -> asyncio.Future:
+        return asyncio.ensure_future(tool.run(block.arguments, executor=self._tool_executor, process_executor=self._process_executor))
+
+
+    def __dispatch_tool__(self, delta: Delta, tools: list[Tool], dispatched: dict[ToolCall, asyncio.Future]):
+        # Tool calls start as soon as their arguments finish streaming, while the model keeps generating.
+        # Only the tools offered for this request can run, the rest is reported by __run_tools__
+        if isinstance(delta, BlockDone) and isinstance(delta.block, ToolCall) and delta.block.result is None:
+            tool = next((tool for tool in tools if tool.name == delta.block.name), None)
+            if tool is not None and delta.block not in dispatched:
+                dispatched[delta.block] = self.__start_tool__(tool, delta.block)
+
+
+    def __discard_tools__(self, dispatched: dict[ToolCall, asyncio.Future], kept: list):
+        # Tools started by an attempt that was retried, unless their call is carried into the next one
+        kept_ids = {id(block) for block in kept}
+        for block in [block for block in dispatched if id(block) not in kept_ids]:
+            future = dispatched.pop(block)
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            future.cancel()
+
+
+    async def __run_tools__(self, prompts: list[Message], dispatched: dict[ToolCall, asyncio.Future] | None = None):
+        dispatched = dispatched if dispatched is not None else {}
+        blocks = [block for prompt in prompts for block in prompt if isinstance(block, ToolCall) and block.result is None]
+        if not blocks:
+            return
+        # Missing tools are reported before any tool is started
+        self._registry.tools.check(block.name for block in blocks if block not in dispatched)
+        futures = [
+            dispatched.pop(block) if block in dispatched else self.__start_tool__(self._registry.tools[block.name], block)
+            for block in blocks
+        ]
+        try:
+            results = await asyncio.gather(*futures)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            await asyncio.gather(*futures, return_exceptions=True)
+            raise
+        for block, result in zip(blocks, results):
+            block.add_result(result)
+
+
+    async def __complete__(self, prepared_args: PreparedArgs, on_delta: Callable[[Tag, Delta], Any] | None = None) -> tuple[TaggedMessages, FormatKeys]:
         session_id = uuid.uuid4().hex
         await invoke_funcs(
             list(map(lambda i: i.bind_name_with_session, self._interceptors)),
@@ -167,121 +270,100 @@ class Completor:
             self._description
         )
         message_list = MessageList.from_prompt_structure(self._prompt_structure, keys=prepared_args)
-        prompts, format_keys, tag, schema, tools, hooks, validators, saves = message_list.get_prompt_list()
-        while tag:
-            on_response_callbacks = await invoke_funcs(
-                self._interceptors,
-                session_id,
-                prompts,
-                format_keys, 
-                tag, 
-                schema, 
-                tools, 
-                hooks, 
-                validators, 
-                saves
-            )
-            for prompt in prompts:
-                for block in prompt:
-                    if isinstance(block, ToolCall) and block.result is None:
-                        i = bisect.bisect_left(self.tools, block.name, key=lambda t: t.name)
-                        if i == len(self.tools) or self.tools[i].name != block.name:
-                            raise MissingToolError([block.name])
-                        result = self.tools[i](**block.arguments)
-                        block.add_result(result)
+        dispatched: dict[ToolCall, asyncio.Future] = {}
+        try:
+            prompts, format_keys, tag, schema, tools, hooks, validators, saves = message_list.get_prompt_list()
+            while tag:
+                on_response_callbacks = await invoke_funcs(
+                    self._interceptors,
+                    session_id,
+                    prompts,
+                    format_keys, 
+                    tag, 
+                    schema, 
+                    tools, 
+                    hooks, 
+                    validators, 
+                    saves
+                )
+                await self.__run_tools__(prompts, dispatched)
             
-            _schema = None
-            if schema:
-                if isinstance(schema, str):
-                    i = bisect.bisect_left(self.schemas, schema, key=lambda s: s.name)
-                    if i == len(self.schemas) or self.schemas[i].name != schema:
-                        raise MissingSchemaError([schema])
-                    _schema = self.schemas[i]
-                else:
-                    try:
-                        _schema = Schema.from_json_schema(schema["name"], schema.get("json_schema"), description=schema.get("description"), schemas=self.schemas)
-                    except KeyError as e:
-                        raise MissingSchemaError([*e.args]) 
-
-            _tools = []
-            if tools:
-                _missing_tools = [] 
-                for tool in tools:
-                    _tool: Tool
-                    if isinstance(tool, str):
-                        i = bisect.bisect_left(self.tools, tool, key=lambda t: t.name)
-                        if i == len(self.tools) or self.tools[i].name != tool:
-                            _missing_tools.append(tool)
-                        else:
-                            _tool = self.tools[i]
-                    elif isinstance(tool, dict):
-                        i = bisect.bisect_left(self.tools, tool["name"], key=lambda t: t.name)
-                        if i == len(self.tools) or self.tools[i].name != tool["name"]:
-                            _missing_tools.append(tool["name"])
-                        else:
-                            _tool = self.tools[i]
-                        _tool.update_with(description=tool.get("description"), schema=tool.get("schema"))
-                    _tools.append(_tool)
-                if _missing_tools:
-                    raise MissingToolError(_missing_tools)
-
-            _validators = []
-            if validators:
-                for validator in validators:
-                    i = bisect.bisect_left(self.validators, validator, key=lambda v: v.name)
-                    if i == len(self.validators) or self.validators[i].name != validator:
-                        raise MissingValidatorError([validator])
-                    _validator = self.validators[i]
-                    _validators.append(_validator)
+                _schema = None
+                if schema:
+                    if isinstance(schema, str):
+                        _schema = self._registry.schemas[schema]
+                    else:
+                        _schema = self.__build_schema__(schema, self._registry.schemas.values())
+
+                _tools = self.__resolve_tools__(tools) if tools else []
+                _validators = list(self._registry.validators.resolve(validators)) if validators else []
+
+                # Requests are streamed when asked for, or when anyone listens to the deltas
+                delta_handlers = [callback.on_delta for callback in on_response_callbacks if hasattr(callback, "on_delta")]
+                if on_delta is not None:
+                    delta_handlers.append(functools.partial(on_delta, tag))
+                _on_delta = None
+                if self._stream or delta_handlers:
+                    async def _on_delta(delta: Delta, delta_handlers=delta_handlers, tools=_tools):
+                        if self._dispatch_tools_early:
+                            self.__dispatch_tool__(delta, tools, dispatched)
+                        if delta_handlers:
+                            await invoke_funcs(delta_handlers, delta)
              
-            try:
-                response = await self._generator.get_response(
-                    prompts, 
-                    format_keys, 
-                    _schema, 
-                    _tools, 
-                    _validators, 
-                    self._continue_on_max_token, 
-                    self._retry_on_rate_limit, 
-                    self._retry_with_delay,
-                ) @ tag
-                await invoke_funcs(list(filter(lambda c: c is not None, on_response_callbacks)), response)
-                saved_keys = {}
-                if saves:
-                    for k, v in saves.items():
-                        for content in response:
-                            if isinstance(content, Structured):
-                                saved_keys[v] = content[k]
-                message_list.add_response(response, keys=saved_keys)
-                if hooks:
-                    keys = self._invoke_hooks(hooks, response, message_list.tagged_messages, format_keys)
-                    message_list.add_keys(keys)
-
-                prompts, format_keys, tag, schema, tools, hooks, validators, saves = message_list.get_prompt_list()
-                print("Received tag", tag)
-
-            except StopGeneration as e:
-                await self._generation_queue.get()
-                return message_list.tagged_messages, message_list.format_keys
+                try:
+                    # Every request sent to the provider, retries included, waits for its own permit
+                    response = await self._generator.get_response(
+                        prompts, 
+                        format_keys, 
+                        _schema, 
+                        _tools, 
+                        _validators, 
+                        self._continue_on_max_token, 
+                        self._retry_on_rate_limit, 
+                        self._retry_with_delay,
+                        retry_policy=self._retry_policy,
+                        on_delta=_on_delta,
+                        on_retry=functools.partial(self.__discard_tools__, dispatched),
+                        scheduler=self._scheduler,
+                        priority=self._priority
+                    ) @ tag
+                    self.__discard_tools__(dispatched, response.content)
+                    await invoke_funcs(list(filter(lambda c: c is not None, on_response_callbacks)), response)
+                    saved_keys = {}
+                    if saves:
+                        for k, v in saves.items():
+                            for content in response:
+                                if isinstance(content, Structured):
+                                    saved_keys[v] = content[k]
+                    message_list.add_response(response, keys=saved_keys)
+                    if hooks:
+                        keys = self._invoke_hooks(hooks, response, message_list.tagged_messages, format_keys)
+                        message_list.add_keys(keys)
+
+                    prompts, format_keys, tag, schema, tools, hooks, validators, saves = message_list.get_prompt_list()
+                    print("Received tag", tag)
+
+                except StopGeneration as e:
+                    return message_list.tagged_messages, message_list.format_keys
             
-        await self._generation_queue.get() # Signals a request completed
-        return message_list.tagged_messages, message_list.format_keys
-    
+            return message_list.tagged_messages, message_list.format_keys
+        finally:
+            # Tools started for a response that failed, or that ended the structure
+            for future in dispatched.values():
+                future.cancel()
+            if dispatched:
+                await asyncio.gather(*dispatched.values(), return_exceptions=True)
+
 
-    async def __schedule__(self, prepared_args: PreparedArgs) -> tuple[TaggedMessages, FormatKeys]:
-        if self._generation_queue.full():
-            print("Generation queue is full. Waiting for a request to complete.")
-        async with self._lock:
-            queuing_task = asyncio.create_task(self._generation_queue.put(None)) # Wait if max_requests reached
-            delay_task = asyncio.create_task(asyncio.sleep(self._delay_constant))  # Delay before processing the request
-            await asyncio.gather(queuing_task, delay_task)
-        return await self.__complete__(prepared_args=prepared_args)
+    async def __schedule__(self, prepared_args: PreparedArgs, on_delta: Callable[[Tag, Delta], Any] | None = None) -> tuple[TaggedMessages, FormatKeys]:
+        # Each request to the generator waits for a permit from the scheduler inside __complete__
+        return await self.__complete__(prepared_args=prepared_args, on_delta=on_delta)
 
 
-    async def __call__(self, args: PreparedArgs) -> tuple[TaggedMessages, FormatKeys]:
+    async def __call__(self, args: PreparedArgs, *, on_delta: Callable[[Tag, Delta], Any] | None = None) -> tuple[TaggedMessages, FormatKeys]:
         if self.params:
             params = set(map(lambda p: p if isinstance(p, str) else list(p)[0], params))
             if diff := params - set(args):
                 raise MissingParamError(*diff)
             print("Invoking ", self.name)
-        return await self.__schedule__(args)
\ No newline at end of file
+        return await self.__schedule__(args, on_delta=on_delta)
\ No newline at end of file
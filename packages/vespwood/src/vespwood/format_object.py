@@ -1,14 +1,17 @@
-from typing import Any
+from functools import lru_cache
+from typing import Any, NamedTuple
+from vespwood_generator import json_dumps
 from vespwood.prompt_mapping import PromptMapping
 from vespwood.types import Params
 from vespwood._utils import get_key_index
 
 
+# Wraps only the top level, FormatKeys and FormatList convert their children on first access
 def deep_convert(data: Any) -> Any:
     if data is None: return None
     
     if isinstance(data, dict) and not isinstance(data, FormatKeys):
-        return FormatKeys({k: deep_convert(v) for k, v in data.items()})
+        return FormatKeys(data)
     if isinstance(data, list) and not isinstance(data, FormatList):
         return FormatList(data)
     if isinstance(data, int) and not isinstance(data, FormatInt):
@@ -24,10 +27,63 @@ def deep_convert(data: Any) -> Any:
     if not isinstance(data, skip_types):
         cls = data.__class__
         annotations = getattr(cls, "__annotations__", {})
-        return FormatKeys({name: deep_convert(getattr(data, name)) for name in annotations})
+        return FormatKeys({name: getattr(data, name) for name in annotations})
     return data
 
 
+def _needs_convert(value: Any) -> bool:
+    return value is not None and not isinstance(value, FormatObject)
+
+
+_KEY, _ATTR, _INDEX = 0, 1, 2
+
+
+class KeyPath(NamedTuple):
+    ops: tuple[tuple[int, Any], ...]
+    extra: str | None = None
+    base: str | None = None
+    index: int | None = None
+
+
+def _split_indices(part: str) -> tuple[str, list[int]]:
+    indices = []
+    while "#" in part:
+        part, index = get_key_index(part)
+        indices.insert(0, index)
+    return part, indices
+
+
+@lru_cache(maxsize=4096)
+def compile_key_path(key: str) -> KeyPath:
+    if "?" in key:
+        parts = key.split("?")
+        assert len(parts) == 2
+        return KeyPath(compile_key_path(parts[0]).ops, extra=parts[1])
+
+    if "." in key:
+        ops = []
+        for part in key.split("."):
+            if "#" in part:
+                # getattr on FormatKeys with a '#' always falls through to a key lookup
+                part, indices = _split_indices(part)
+                ops.append((_KEY, part))
+                ops.extend((_INDEX, index) for index in indices)
+            else:
+                ops.append((_ATTR, part))
+        if "#" in key.rsplit(".", 1)[1]:
+            # Setting 'a.b#2' sets index 2 of 'a.b'
+            base, index = get_key_index(key)
+            return KeyPath(tuple(ops), base=base, index=index)
+        return KeyPath(tuple(ops))
+
+    if "#" in key:
+        base, index = get_key_index(key)
+        name, indices = _split_indices(key)
+        return KeyPath(((_KEY, name), *((_INDEX, i) for i in indices)), base=base, index=index)
+
+    return KeyPath(((_KEY, key),))
+
+
 class FormatObject:
     __extras__: dict[str, Any]
 
@@ -45,8 +101,8 @@ class FormatObject:
         value = self
         match format_spec:
             case "pretty":
-                import json
-                value = json.dumps(value, indent=2)
+                # A scope only stores its own keys, the ones it falls back to are serialized too
+                value = json_dumps(value.__flatten__() if isinstance(value, FormatKeys) else value, indent=True)
             case "count" | "length":
                 return str(len(value))
             case _:
@@ -74,7 +130,31 @@ class FormatBytes(bytes, FormatObject):
 
 class FormatList(list, FormatObject):
     def __init__(self, value: list):
-        super().__init__([deep_convert(v) for v in value])
+        super().__init__(value)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            for idx in range(*i.indices(len(self))):
+                self.__getitem__(idx)
+            return super().__getitem__(i)
+        value = super().__getitem__(i)
+        if _needs_convert(value):
+            value = deep_convert(value)
+            super().__setitem__(i, value)
+        return value
+
+    def __iter__(self):
+        i = 0
+        while i < len(self):
+            yield self.__getitem__(i)
+            i += 1
+
+    def __reversed__(self):
+        for i in range(len(self) - 1, -1, -1):
+            yield self.__getitem__(i)
+
+    def pop(self, i: int = -1):
+        return deep_convert(super().pop(i))
 
     def append(self, v: Any) -> None:
         super().append(deep_convert(v))
@@ -93,16 +173,94 @@ class FormatList(list, FormatObject):
 
     
 class FormatKeys(dict[str, Any], FormatObject):
+    _parent: "FormatKeys | None" = None
+
     def __init__(self, value: dict[str, Any] = {}):
-        for k, v in value.items():
-            super().__setitem__(k, deep_convert(v))
+        super().__init__(value)
 
     @classmethod
     def from_format_keys(cls, format_keys: "FormatKeys", **new_keys):
         return cls({ **format_keys, **new_keys })
 
+    def scoped(self, **extra_keys) -> "FormatKeys":
+        # Child scope holding only the extra keys, every other lookup falls back to self
+        scope = FormatKeys(extra_keys)
+        scope._parent = self
+        return scope
+
     def copy_with_extra(self, **extra_keys):
-        return FormatKeys.from_format_keys(self, **extra_keys)
+        return self.scoped(**extra_keys)
+
+    @property
+    def parent(self) -> "FormatKeys | None":
+        return self._parent
+
+    def __lookup__(self, key: str):
+        scope = self
+        while scope is not None:
+            if dict.__contains__(scope, key):
+                value = dict.__getitem__(scope, key)
+                if _needs_convert(value):
+                    # Cached in the scope holding the key so extras attach to the same object
+                    value = deep_convert(value)
+                    dict.__setitem__(scope, key, value)
+                return value
+            scope = scope._parent
+        return None
+
+    def __convert_all__(self):
+        for key, value in list(dict.items(self)):
+            if _needs_convert(value):
+                dict.__setitem__(self, key, deep_convert(value))
+
+    def __flatten__(self) -> dict[str, Any]:
+        self.__convert_all__()
+        if self._parent is None:
+            return dict(dict.items(self))
+        flattened = self._parent.__flatten__()
+        flattened.update(dict.items(self))
+        return flattened
+
+    def __contains__(self, key) -> bool:
+        scope = self
+        while scope is not None:
+            if dict.__contains__(scope, key):
+                return True
+            scope = scope._parent
+        return False
+
+    def __iter__(self):
+        if self._parent is None:
+            return dict.__iter__(self)
+        return iter(self.__flatten__())
+
+    def __len__(self) -> int:
+        if self._parent is None:
+            return dict.__len__(self)
+        return len(self.__flatten__())
+
+    def keys(self):
+        if self._parent is None:
+            return dict.keys(self)
+        return self.__flatten__().keys()
+
+    def values(self):
+        if self._parent is None:
+            self.__convert_all__()
+            return dict.values(self)
+        return self.__flatten__().values()
+
+    def items(self):
+        if self._parent is None:
+            self.__convert_all__()
+            return dict.items(self)
+        return self.__flatten__().items()
+
+    def get(self, key: str, default: Any = None):
+        return self.__lookup__(key) if key in self else default
+
+    def __repr__(self) -> str:
+        return repr(self.__flatten__())
 
 
     def __getattr__(self, name):
@@ -112,57 +270,52 @@ class FormatKeys(dict[str, Any], FormatObject):
         return self.__contains__(name)
     
 
+    def __resolve__(self, ops: tuple[tuple[int, Any], ...]):
+        value = self
+        for op, arg in ops:
+            if op == _INDEX:
+                if value:
+                    value = value.__getitem__(arg) if arg < len(value) else None
+            elif isinstance(value, FormatKeys) and (op == _KEY or not hasattr(FormatKeys, arg)):
+                value = value.__lookup__(arg)
+            elif op == _ATTR:
+                value = getattr(value, arg, None)
+            else:
+                value = None
+        return value
+
+
     def __getitem__(self, key: str):
-        if "?" in key:
-            parts = key.split("?")
-            assert len(parts) == 2
-            object = self.__getitem__(parts[0])
-            assert isinstance(object, FormatObject)
-            return object.extras[parts[1]]
-
-        if "." in key:
-            parts = key.split(".")
-            value = self
-            for part in parts:
-                if hasattr(value, part):
-                    value = getattr(value, part)
-                else:
-                    return None
-            return value
-        
-        if "#" in key:
-            key, index = get_key_index(key)
-            base = self.__getitem__(key)
-            if base:
-                if index >= len(base):
-                    return None
-                return base.__getitem__(index)
-        if key in self: 
-            return super().__getitem__(key)
+        path = compile_key_path(key)
+        value = self.__resolve__(path.ops)
+        if path.extra is not None:
+            assert isinstance(value, FormatObject)
+            return value.extras[path.extra]
+        return value
     
 
     def __setitem__(self, key: str, value):
-        if "?" in key:
-            parts = key.split("?")
-            assert len(parts) == 2
-            object = self.__getitem__(parts[0])
+        path = compile_key_path(key)
+        if path.extra is not None:
+            object = self.__resolve__(path.ops)
             if object is None:
-                raise ValueError(f"To set extra {parts[1]} at {parts[0]}, there should be some value present at {parts[0]}")
+                base = key.split("?")[0]
+                raise ValueError(f"To set extra {path.extra} at {base}, there should be some value present at {base}")
             assert isinstance(object, FormatObject)
-            object.set_extra(parts[1], value)
+            object.set_extra(path.extra, value)
             return
         
         value = deep_convert(value)
-        if "#" in key:
-            key, index = get_key_index(key)
-            base = self.__getitem__(key)
+        if path.index is not None:
+            index = path.index
+            base = self.__getitem__(path.base)
             if base:
                 assert isinstance(base, list)
                 if index >= len(base): 
                     base.extend([None] * (index - len(base) + 1))
                 base.__setitem__(index, value)
             else:
-                self.__setitem__(key, [*[None] * (index - 1), value])
+                self.__setitem__(path.base, [*[None] * (index - 1), value])
         else:
             super().__setitem__(key, value)
     
@@ -3,7 +3,7 @@ from collections.abc import Callable, Awaitable
 import inspect
 from typing import Protocol, TypeAlias, overload
 from vespwood_generator import (
-    Tag, Response,
+    Tag, Response, Delta,
 )
 from vespwood.message import Prompt
 from vespwood.types import HooksList, Saves, SchemaInfo, ToolsList, ValidatorsList
@@ -20,6 +20,44 @@ class AsyncOnResponse(Protocol):
 
 ResponseHandler: TypeAlias = OnResponse | AsyncOnResponse
 
+
+class OnDelta(Protocol):
+    def __call__(self, delta: Delta) -> None: ...
+
+
+class AsyncOnDelta(Protocol):
+    async def __call__(self, delta: Delta) -> None: ...
+
+
+DeltaHandler: TypeAlias = OnDelta | AsyncOnDelta
+
+
+class StreamingResponseHandler:
+    """
+    Response handler that also receives the deltas of the response while it
+    is generated. Returning one from an interceptor makes the Completor stream
+    that request.
+    """
+    __slots__ = "_on_response", "_on_delta"
+
+    def __init__(self, on_response: ResponseHandler | None = None, *, on_delta: DeltaHandler):
+        self._on_response = on_response
+        self._on_delta = on_delta
+
+
+    async def on_delta(self, delta: Delta):
+        result = self._on_delta(delta)
+        if inspect.isawaitable(result):
+            await result
+
+
+    async def __call__(self, response: Response):
+        if self._on_response is None:
+            return
+        result = self._on_response(response)
+        if inspect.isawaitable(result):
+            await result
+
 NameSession: TypeAlias = Callable[[str, str | None, str | None], None]
 
 
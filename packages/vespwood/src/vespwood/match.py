@@ -1,61 +1,144 @@
-from typing import Any
+from __future__ import annotations
+from functools import lru_cache
+from typing import Any, Callable, Mapping, TypeAlias
+import operator
 import re
 
 from vespwood.expression import Expression
 from vespwood.logic import Logic
+from vespwood.template import Template
 
 
-def match(val: Any, mval: Logic | Expression | Any):
-    if isinstance(mval, Logic):
-        assert len(mval.exprs) >= 2
-        eval: bool
-        if mval.conj == "and":
-            eval = True
-            for expr in mval.exprs:
-                eval &= match(val, expr)
-            return eval
-        elif mval.conj == "or":
-            eval = False
-            for expr in mval.exprs:
-                eval |= match(val, expr)
-            return eval
-        elif mval.conj == "xor":
+# Called with the value and, when the structure has params, the mapping its match is formatted with
+Predicate: TypeAlias = "Callable[[Any, Mapping[str, Any] | None], bool]"
+
+
+_OPERATORS: dict[str, Callable[[int, int], bool]] = {
+    ">": operator.gt, "gt": operator.gt,
+    ">=": operator.ge, "gte": operator.ge,
+    "<": operator.lt, "lt": operator.lt,
+    "<=": operator.le, "lte": operator.le,
+    "==": operator.eq, "eq": operator.eq,
+    "!=": operator.ne, "not": operator.ne,
+}
+
+
+_regex = lru_cache(maxsize=1024)(re.compile)
+
+
+def _renderer(source: str) -> tuple[bool, Callable[[Mapping[str, Any]], str]]:
+    try:
+        template = Template.compile(source)
+    except ValueError:
+        # Stray braces, only an error once the source actually gets formatted
+        return False, source.format_map
+    return template.is_static, template.format_map
+
+
+def _compile_logic(mval: Logic) -> Predicate:
+    assert len(mval.exprs) >= 2
+    predicates = tuple(_compile(expr) for expr in mval.exprs)
+    if mval.conj == "and":
+        def predicate(val, mapping=None):
+            return all(p(val, mapping) for p in predicates)
+    elif mval.conj == "or":
+        def predicate(val, mapping=None):
+            return any(p(val, mapping) for p in predicates)
+    elif mval.conj == "xor":
+        def predicate(val, mapping=None):
             true_count = 0
-            for expr in mval.exprs:
-                if match(val, expr):
+            for p in predicates:
+                if p(val, mapping):
                     true_count += 1
-                if true_count > 1:
-                    return False
+                    if true_count > 1:
+                        return False
             return true_count == 1
-        
+    else:
+        def predicate(val, mapping=None):
+            return val == mval
+    return predicate
+
+
+def _compile_expression(mval: Expression) -> Predicate:
+    compare = _OPERATORS.get(mval.op)
+    if compare is None:
+        def predicate(val, mapping=None):
+            raise ValueError("Unidentified operator passed in match")
+        return predicate
+
+    source = mval.val
+    is_static, render = _renderer(source)
+    if is_static:
+        try:
+            rhs = int(source)
+        except ValueError:
+            pass
+        else:
+            def predicate(val, mapping=None):
+                return compare(int(val), rhs)
+            return predicate
+
+    def predicate(val, mapping=None):
+        return compare(int(val), int(source if mapping is None else render(mapping)))
+    return predicate
+
+
+def _compile_pattern(mval: str) -> Predicate:
+    is_static, render = _renderer(mval)
+    if is_static:
+        pattern = re.compile(mval)
+        def predicate(val, mapping=None):
+            return pattern.match(str(val)) is not None
+        return predicate
+
+    def predicate(val, mapping=None):
+        return _regex(mval if mapping is None else render(mapping)).match(str(val)) is not None
+    return predicate
+
+
+def _compile(mval: Logic | Expression | Any) -> Predicate:
+    if isinstance(mval, Logic):
+        return _compile_logic(mval)
     if isinstance(mval, Expression):
-        op = mval.op
-        match op:
-            case ">" | "gt":
-                return int(val) > int(mval.val)
-            case ">=" | "gte":
-                return int(val) >= int(mval.val)
-            case "<" | "lt":
-                return int(val) < int(mval.val)
-            case "<=" | "lte":
-                return int(val) <= int(mval.val)
-            case "==" | "eq":
-                return int(val) == int(mval.val)
-            case "!=" | "not":
-                return int(val) != int(mval.val)
-            case _:
-                raise ValueError("Unidentified operator passed in match")
-            
+        return _compile_expression(mval)
     if isinstance(mval, str):
-        return bool(re.match(mval, str(val)))
-    elif mval is None:
-        return bool(val)
+        return _compile_pattern(mval)
+    if mval is None:
+        def predicate(val, mapping=None):
+            return bool(val)
     elif isinstance(mval, bool):
-        return bool(val) == mval
+        def predicate(val, mapping=None):
+            return bool(val) == mval
     elif isinstance(mval, int):
-        try:
-            val = int(val)
-        except:
-            raise TypeError("Match value is integer but value is not parseable to integer")
-        return val == mval
-    return val == mval
\ No newline at end of file
+        def predicate(val, mapping=None):
+            try:
+                val = int(val)
+            except:
+                raise TypeError("Match value is integer but value is not parseable to integer")
+            return val == mval
+    else:
+        def predicate(val, mapping=None):
+            return val == mval
+    return predicate
+
+
+@lru_cache(maxsize=1024, typed=True)
+def _compile_cached(mval: Logic | Expression | Any) -> Predicate:
+    return _compile(mval)
+
+
+def compile_match(mval: Logic | Expression | Any) -> Predicate:
+    """
+    Compiles a match value into a predicate. Regexes are compiled once, Logic
+    trees short-circuit, and fields in the expression are only filled in when
+    a mapping is passed.
+    """
+    try:
+        return _compile_cached(mval)
+    except TypeError:
+        # Unhashable match values are compared by equality and can't be cached
+        return _compile(mval)
+
+
+def match(val: Any, mval: Logic | Expression | Any, mapping: Mapping[str, Any] | None = None) -> bool:
+    return compile_match(mval)(val, mapping)
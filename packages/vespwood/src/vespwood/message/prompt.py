@@ -1,18 +1,28 @@
 
-from typing import Any
+from typing import Any, NamedTuple
 
 from vespwood_generator import (
     Message,
     File, Image, ToolCall,
-    Tag, Role
+    Tag, Role,
+    json_dumps
 )
 
 from vespwood.types import (
     Params, HooksList, SchemaInfo, ToolsList, ValidatorsList, Saves
 )
+from vespwood.template import Template
+
+
+class CompiledPrompt(NamedTuple):
+    content: tuple[Any, ...] | None
+    hooks: tuple[Template | tuple[Template, tuple[tuple[Template, Template], ...]], ...] | None
+    saves: tuple[tuple[Template, Template], ...] | None
+    is_static: bool
+
 
 class Prompt(Message):
-    __slots__ = "_params", "_schema", "_tools", "_hooks", "_validators", "_saves", "_json", "_tag"
+    __slots__ = "_params", "_schema", "_tools", "_hooks", "_validators", "_saves", "_json", "_tag", "_compiled"
 
     @property
     def is_tagged(self) -> bool:
@@ -45,7 +55,8 @@ class Prompt(Message):
                 tools: ToolsList | None = None,
                 hooks: HooksList | None = None,
                 validators: ValidatorsList | None = None,
-                saves: Saves | None = None):
+                saves: Saves | None = None,
+                cache: bool = False):
         self._params: Params | None = params
         self._schema: SchemaInfo | None = schema
         self._tools: ToolsList | None = tools
@@ -53,7 +64,8 @@ class Prompt(Message):
         self._validators: ValidatorsList | None = validators
         self._saves: Saves | None = saves
         self._tag: Tag = None
-        super().__init__(role, content)
+        self._compiled: CompiledPrompt | None = None
+        super().__init__(role, content, cache=cache)
 
 
     @classmethod
@@ -92,6 +104,7 @@ class Prompt(Message):
         hooks = data.get("hooks")
         validators = data.get("validators")
         saves = data.get("saves")
+        cache = data.get("cache", False)
         prompt = cls(
             content=content, 
             role=role, 
@@ -100,7 +113,8 @@ class Prompt(Message):
             tools=tools, 
             hooks=hooks, 
             validators=validators, 
-            saves=saves
+            saves=saves,
+            cache=cache
         ) 
 
         tag = data.get("tag")
@@ -126,38 +140,88 @@ class Prompt(Message):
             tools=self._tools.copy() if self._tools else None,
             hooks=self._hooks.copy() if self._hooks else None,
             validators=self._validators.copy() if self._validators else None,
-            saves=self._saves.copy() if self._saves else None)
-        if self.is_tagged: 
-            prompt @= self.tag
+            saves=self._saves.copy() if self._saves else None,
+            cache=self._cache)
+        prompt._tag = self._tag
         return prompt
     
     def __copy__(self):
         return self.copy()
 
 
+    def indexed(self, *indices: int) -> "Prompt":
+        prompt = self.copy()
+        if indices and prompt.is_tagged:
+            prompt._tag = prompt._tag.indexed(*indices)
+        return prompt
+
+
+    @property
+    def compiled(self) -> CompiledPrompt:
+        if self._compiled is None:
+            templates: list[Template] = []
+            def compile(source: str) -> Template:
+                template = Template.compile(source)
+                templates.append(template)
+                return template
+
+            content = tuple(
+                compile(block) if isinstance(block, str) else block for block in self._content
+            ) if self._content else None
+            hooks = tuple(
+                compile(hook) if isinstance(hook, str) else
+                (compile(hook["name"]), tuple((compile(k), compile(v)) for k, v in hook.get("args", {}).items()))
+                for hook in self._hooks
+            ) if self._hooks else None
+            saves = tuple(
+                (compile(key), compile(to)) for key, to in self._saves.items()
+            ) if self._saves else None
+            self._compiled = CompiledPrompt(content, hooks, saves, all(t.is_static for t in templates))
+        return self._compiled
+
+
+    @property
+    def is_static(self) -> bool:
+        return self.compiled.is_static
+
+
     def format_map(self, prompt_mapping) -> "Prompt":
+        compiled = self.compiled
+        if compiled.is_static:
+            return self
         prompt = self.copy()
-        if prompt._content: 
-            content = []
-            for block in prompt._content:
-                if isinstance(block, str):
-                    block = block.format_map(prompt_mapping)
-                content.append(block)
-            prompt._content = content
-        if prompt._hooks:
+        if compiled.content:
+            prompt._content = [
+                block.format_map(prompt_mapping) if isinstance(block, Template) else block
+                for block in compiled.content
+            ]
+        if compiled.hooks:
             hooks = []
-            for hook in prompt._hooks:
-                if isinstance(hook, str):
+            for hook in compiled.hooks:
+                if isinstance(hook, Template):
                     hooks.append(hook.format_map(prompt_mapping))
                 else:
-                    hook = {
-                        "name": hook["name"].format_map(prompt_mapping),
-                        "args": { k.format_map(prompt_mapping): v.format_map(prompt_mapping) for k, v in hook["args"].items() }
-                    }
-                    hooks.append(hook)
+                    name, args = hook
+                    hooks.append({
+                        "name": name.format_map(prompt_mapping),
+                        "args": { k.format_map(prompt_mapping): v.format_map(prompt_mapping) for k, v in args }
+                    })
             prompt._hooks = hooks
-        if prompt._saves:
-            prompt._saves = { key.format_map(prompt_mapping): to.format_map(prompt_mapping) for key, to in prompt._saves.items() }
+        if compiled.saves:
+            prompt._saves = { key.format_map(prompt_mapping): to.format_map(prompt_mapping) for key, to in compiled.saves }
+        return prompt
+
+
+    def render(self, format_keys, indices: tuple[int, ...] = ()) -> "Prompt":
+        # Untagged prompts without fields are shared as is, tagged ones are copied as update_message mutates them
+        prompt = self
+        if self._params and not self.is_static:
+            prompt = self.format_map(format_keys.get_params(self._params))
+        if prompt.is_tagged:
+            if prompt is self:
+                prompt = self.copy()
+            if indices:
+                prompt._tag = prompt._tag.indexed(*indices)
         return prompt
 
 
@@ -165,6 +229,8 @@ class Prompt(Message):
         if self.role != message.role:
             raise ValueError("Cannot add messsage with different role to prompt")
         self._content = message._content
+        self._version += 1
+        self._compiled = None
 
     @property
     def params(self):
@@ -193,14 +259,11 @@ class Prompt(Message):
     
 
     def __str__(self) -> str:
-        data = self.json
-        import json
-        return json.dumps(data, indent=2)
+        return json_dumps(self.json, indent=True)
 
 
     def __repr__(self) -> str:
         data = { "role": self._role, "content": list(map(lambda block: block.json if isinstance(block, ToolCall) else block, self.content)) }
         if self.is_tagged:
             data.update({ "tag": self.tag })
-        import json
-        return json.dumps(data, indent=2)
\ No newline at end of file
+        return json_dumps(data, indent=True)
\ No newline at end of file
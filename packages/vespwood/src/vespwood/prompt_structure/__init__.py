@@ -1,2 +1,4 @@
-from .prompt_structure import PromptStructure
-from .message_list import MessageList
\ No newline at end of file
+from .plan import ExecutionPlan, PlanCursor
+from .prompt_structure import PromptStructure, SequenceNode, CaseNode, ForNode, WhileNode, IfNode, SwitchNode
+from .message_list import MessageList
+from .registry import PromptStructureRegistry, registry
@@ -0,0 +1,71 @@
+from __future__ import annotations
+from importlib import metadata
+from typing import TYPE_CHECKING
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+
+if TYPE_CHECKING:
+    from .prompt_structure import PromptStructure
+
+
+_CACHE_FORMAT = 4
+
+
+def _version() -> str:
+    try:
+        return metadata.version("vespwood")
+    except metadata.PackageNotFoundError:
+        return "dev"
+
+
+# Pickled classes are only valid for the vespwood and python that wrote them
+_CACHE_TAG = f"vespwood-{_version()}-{sys.implementation.cache_tag}-{_CACHE_FORMAT}"
+
+
+def content_key(source: bytes) -> str:
+    return hashlib.sha256(source).hexdigest()
+
+
+def cache_path(file_name: str, cache_dir: str | None = None) -> str:
+    file_name = os.path.abspath(file_name)
+    directory, base_name = os.path.split(file_name)
+    if cache_dir is None:
+        cache_dir = os.path.join(directory, "__pycache__")
+    else:
+        # A shared cache directory can hold files with the same name from different folders
+        base_name = f"{base_name}.{hashlib.sha256(directory.encode()).hexdigest()[:16]}"
+    return os.path.join(cache_dir, f"{base_name}.{_CACHE_TAG}.pickle")
+
+
+def load(path: str, key: str) -> PromptStructure | None:
+    try:
+        with open(path, "rb") as file:
+            cached_key, structure = pickle.load(file)
+    except FileNotFoundError:
+        return None
+    except Exception:
+        # Corrupt or written by something else, the source gets parsed again
+        return None
+    if cached_key != key:
+        return None
+    return structure
+
+
+def store(path: str, key: str, structure: PromptStructure):
+    directory = os.path.dirname(path)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                pickle.dump((key, structure), file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except (OSError, pickle.PicklingError, TypeError, AttributeError):
+        # Read-only locations or unpicklable values just skip the cache
+        pass
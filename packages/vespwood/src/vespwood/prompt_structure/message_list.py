@@ -15,9 +15,20 @@ from vespwood.message import Prompt
 from vespwood.format_object import FormatKeys
 from vespwood.tagged_messages import TaggedMessages
 from .prompt_structure import PromptStructure
+from .plan import PlanCursor
 
 
 class MessageList(PromptStructure):
+    # The root of a session can be any node type, so it keeps every node attribute
+    __slots__ = (
+        "_iterator", "_iter_key", "_index_key", "_co_iterators", "_co_iter_keys", "_default_co_iter_values",
+        "_initial", "_while", "_if", "_match", "_predicate", "_then", "_switch", "_cases",
+        "_format_keys", "_tagged_messages", "_cursor"
+    )
+    __node_attrs__ = (
+        "_iterator", "_iter_key", "_index_key", "_co_iterators", "_co_iter_keys", "_default_co_iter_values",
+        "_initial", "_while", "_if", "_match", "_then", "_switch", "_cases"
+    )
     DEFAULT_LAST_TAG = "response_last"
 
     def __init__(self,
@@ -70,6 +81,7 @@ class MessageList(PromptStructure):
         )
         self._format_keys: FormatKeys = FormatKeys(kwargs)
         self._tagged_messages: dict[str, Message] = {}
+        self._cursor: PlanCursor | None = None
 
 
     @classmethod
@@ -98,6 +110,7 @@ class MessageList(PromptStructure):
             params=prompt_structure.params
             
         )
+        self._plan = prompt_structure.compile()
         self._format_keys.update(keys)
         return self
     
@@ -113,11 +126,9 @@ class MessageList(PromptStructure):
     
 
     def  get_prompt_list(self) -> tuple[list[Prompt], FormatKeys, Tag | None, SchemaInfo | None, ToolsList | None, HooksList | None, ValidatorsList | None, Saves | None]:
-        msgs, format_keys, tag, *rest = self.get_usables(self._format_keys, tagged_messages=self._tagged_messages)
-        for prompt in msgs:
-            if prompt.is_tagged:
-                if prompt.tag not in self._tagged_messages:
-                    self._tagged_messages[prompt.tag] = prompt
+        if self._cursor is None:
+            self._cursor = self.compile().cursor(self._format_keys, self._tagged_messages)
+        msgs, format_keys, tag, *rest = self._cursor.advance()
 
         # Adding default last message
         if tag is None and len(msgs) > 0 and msgs[-1].role != "assistant":
@@ -146,6 +157,8 @@ class MessageList(PromptStructure):
             raise ValueError(f"Tag {tag} not found in MessageList")
         self._tagged_messages[tag] = message
         self._format_keys[tag] = message.content
+        if self._cursor:
+            self._cursor.update_message(tag, message)
 
 
     def add_keys(self, keys: dict[str, Any]):
@@ -153,10 +166,9 @@ class MessageList(PromptStructure):
 
 
     def __repr__(self):
-        msgs, *_ = self.get_usables(self._format_keys, tagged_messages=self._tagged_messages)
-        return str(msgs)
+        # The prompts sent so far, as the cursor rendered them
+        return str(self._cursor.messages if self._cursor else [])
     
 
     def __str__(self):
-        msgs, *_ = self.get_usables(self._format_keys, tagged_messages=self._tagged_messages)
-        return str(msgs)        
+        return str(self._cursor.messages if self._cursor else [])
@@ -0,0 +1,295 @@
+from __future__ import annotations
+from collections.abc import Iterator
+from typing import TYPE_CHECKING, Any, NamedTuple, TypeAlias
+
+from vespwood_generator import Tag, Message
+
+from vespwood.types import (
+    Params,
+    SchemaInfo,
+    ToolsList,
+    HooksList,
+    ValidatorsList,
+    Saves
+)
+from vespwood.match import Predicate
+from vespwood.expression import Expression
+from vespwood.logic import Logic
+from vespwood.format_object import FormatKeys
+from vespwood.prompt_mapping import PromptMapping
+from vespwood.message import Prompt
+
+if TYPE_CHECKING:
+    from .prompt_structure import PromptStructure
+
+
+Usables: TypeAlias = "tuple[list[Prompt], FormatKeys, Tag | None, SchemaInfo | None, ToolsList | None, HooksList | None, ValidatorsList | None, Saves | None]"
+Step: TypeAlias = "PromptStep | SequenceStep | ForStep | WhileStep | IfStep | SwitchStep | IndexedStep"
+
+
+class _Awaiting(NamedTuple):
+    prompt: Prompt
+    format_keys: FormatKeys
+
+
+def _format(value: Any, params: Params | None, format_keys: FormatKeys) -> Any:
+    if params and isinstance(value, (str, Expression, Logic)):
+        return value.format_map(format_keys.get_params(params))
+    return value
+
+
+def _mapping(params: Params | None, format_keys: FormatKeys) -> PromptMapping | None:
+    return format_keys.get_params(params) if params else None
+
+
+class PromptStep(NamedTuple):
+    prompt: Prompt
+
+    def run(self, cursor: PlanCursor, format_keys: FormatKeys, indices: tuple[int, ...]) -> Iterator[Prompt | _Awaiting]:
+        prompt = self.prompt.render(format_keys, indices)
+        if prompt.is_tagged:
+            tag = prompt.tag
+            while True:
+                if tag in cursor.tagged_messages:
+                    prompt.update_message(cursor.tagged_messages[tag])
+                if not prompt.response_awaited:
+                    break
+                yield _Awaiting(prompt, format_keys)
+        yield prompt
+
+
+class SequenceStep(NamedTuple):
+    steps: tuple[Step, ...]
+
+    def run(self, cursor: PlanCursor, format_keys: FormatKeys, indices: tuple[int, ...]) -> Iterator[Prompt | _Awaiting]:
+        for step in self.steps:
+            yield from step.run(cursor, format_keys, indices)
+
+
+class ForStep(NamedTuple):
+    iterator: str
+    iter_key: str
+    index_key: str
+    co_iterators: tuple[str, ...]
+    co_iter_keys: tuple[str, ...]
+    default_co_iter_values: tuple[Any, ...] | None
+    initial: SequenceStep | None
+    body: SequenceStep
+    params: Params | None
+
+    def run(self, cursor: PlanCursor, format_keys: FormatKeys, indices: tuple[int, ...]) -> Iterator[Prompt | _Awaiting]:
+        iterator = format_keys[_format(self.iterator, self.params, format_keys)]
+        co_iterators = [format_keys[_format(co_iter, self.params, format_keys)] for co_iter in self.co_iterators]
+        for index, value in enumerate(iterator):
+            structure = self.initial if self.initial is not None and index == 0 else self.body
+            extra_keys = { self.iter_key: value, self.index_key: index }
+            for idx, co_iterator in enumerate(co_iterators):
+                if len(co_iterator) <= index or co_iterator[index] is None:
+                    extra_keys[self.co_iter_keys[idx]] = self.default_co_iter_values[idx] if self.default_co_iter_values else None
+                else:
+                    extra_keys[self.co_iter_keys[idx]] = co_iterator[index]
+            yield from structure.run(cursor, format_keys.scoped(**extra_keys), (*indices, index))
+
+
+class WhileStep(NamedTuple):
+    whilekey: str
+    predicate: Predicate
+    index_key: str
+    initial: SequenceStep | None
+    body: SequenceStep
+    params: Params | None
+
+    def run(self, cursor: PlanCursor, format_keys: FormatKeys, indices: tuple[int, ...]) -> Iterator[Prompt | _Awaiting]:
+        index = 0
+        while True:
+            # Re-read on every iteration, responses inside the body may have changed it
+            value = format_keys[_format(self.whilekey, self.params, format_keys)]
+            if not self.predicate(value, _mapping(self.params, format_keys)):
+                return
+            structure = self.initial if self.initial is not None and index == 0 else self.body
+            yield from structure.run(cursor, format_keys.scoped(**{ self.index_key: index }), (*indices, index))
+            index += 1
+
+
+class IfStep(NamedTuple):
+    ifkey: str
+    predicate: Predicate
+    then: SequenceStep
+    orelse: SequenceStep
+    params: Params | None
+
+    def run(self, cursor: PlanCursor, format_keys: FormatKeys, indices: tuple[int, ...]) -> Iterator[Prompt | _Awaiting]:
+        value = format_keys[_format(self.ifkey, self.params, format_keys)]
+        if self.predicate(value, _mapping(self.params, format_keys)):
+            yield from self.then.run(cursor, format_keys, indices)
+        else:
+            yield from self.orelse.run(cursor, format_keys, indices)
+
+
+class CaseStep(NamedTuple):
+    predicate: Predicate
+    body: SequenceStep
+    params: Params | None
+
+
+class SwitchStep(NamedTuple):
+    switch: str
+    cases: tuple[CaseStep, ...]
+    default: SequenceStep
+    params: Params | None
+
+    def run(self, cursor: PlanCursor, format_keys: FormatKeys, indices: tuple[int, ...]) -> Iterator[Prompt | _Awaiting]:
+        value = format_keys[_format(self.switch, self.params, format_keys)]
+        for case in self.cases:
+            if case.predicate(value, _mapping(case.params, format_keys)):
+                yield from case.body.run(cursor, format_keys, indices)
+                return
+        yield from self.default.run(cursor, format_keys, indices)
+
+
+class IndexedStep(NamedTuple):
+    indices: tuple[int, ...]
+    step: Step
+
+    def run(self, cursor: PlanCursor, format_keys: FormatKeys, indices: tuple[int, ...]) -> Iterator[Prompt | _Awaiting]:
+        yield from self.step.run(cursor, format_keys, (*indices, *self.indices))
+
+
+def _compile_sequence(prompt_list: list[Prompt | PromptStructure]) -> SequenceStep:
+    return SequenceStep(tuple(
+        PromptStep(prompt) if isinstance(prompt, Prompt) else _compile(prompt)
+        for prompt in prompt_list
+    ))
+
+
+def _compile(structure: PromptStructure) -> Step:
+    step = _compile_node(structure)
+    if structure.indices:
+        return IndexedStep(structure.indices, step)
+    return step
+
+
+def _compile_node(structure: PromptStructure) -> Step:
+    initial = _compile_sequence(structure.initial) if structure.has_initial else None
+
+    # Iterator
+    if structure.is_iterator:
+        co_iterators = tuple(structure.co_iterators or ())
+        return ForStep(
+            iterator=structure.iterator,
+            iter_key=structure.iter_key,
+            index_key=structure.index_key,
+            co_iterators=co_iterators,
+            co_iter_keys=tuple(structure.co_iter_keys or ()),
+            default_co_iter_values=tuple(structure.default_co_iter_values) if structure.default_co_iter_values else None,
+            initial=initial,
+            body=_compile_sequence(structure),
+            params=structure.params
+        )
+
+    # Switch
+    elif structure.is_switch:
+        return SwitchStep(
+            switch=structure.switch,
+            cases=tuple(CaseStep(case.predicate, _compile_sequence(case), case.params) for case in structure.cases),
+            default=_compile_sequence(structure),
+            params=structure.params
+        )
+
+    # If
+    elif structure.is_if:
+        return IfStep(
+            ifkey=structure.ifkey,
+            predicate=structure.predicate,
+            then=_compile_sequence(structure.then),
+            orelse=_compile_sequence(structure),
+            params=structure.params
+        )
+
+    # While
+    elif structure.is_while:
+        return WhileStep(
+            whilekey=structure.whilekey,
+            predicate=structure.predicate,
+            index_key=structure.index_key,
+            initial=initial,
+            body=_compile_sequence(structure),
+            params=structure.params
+        )
+
+    # Normal
+    return _compile_sequence(structure)
+
+
+class ExecutionPlan:
+    __slots__ = "_root",
+
+    def __init__(self, root: Step):
+        self._root = root
+
+
+    @classmethod
+    def from_prompt_structure(cls, prompt_structure: PromptStructure) -> ExecutionPlan:
+        return cls(_compile(prompt_structure))
+
+
+    @property
+    def root(self) -> Step:
+        return self._root
+
+
+    def cursor(self, format_keys: FormatKeys, tagged_messages: dict[str, Message]) -> PlanCursor:
+        return PlanCursor(self, format_keys, tagged_messages)
+
+
+class PlanCursor:
+    """
+    Walks an ExecutionPlan once, stopping at every prompt that awaits a response.
+    Prompts already emitted are kept, so each call to advance only renders the
+    nodes reached after the last awaited tag.
+    """
+    __slots__ = "_plan", "_format_keys", "_tagged_messages", "_messages", "_walker"
+
+    def __init__(self, plan: ExecutionPlan, format_keys: FormatKeys, tagged_messages: dict[str, Message]):
+        self._plan = plan
+        self._format_keys = format_keys
+        self._tagged_messages = tagged_messages
+        self._messages: list[Prompt] = []
+        self._walker: Iterator[Prompt | _Awaiting] = plan.root.run(self, format_keys, ())
+
+
+    @property
+    def plan(self) -> ExecutionPlan:
+        return self._plan
+
+
+    @property
+    def format_keys(self) -> FormatKeys:
+        return self._format_keys
+
+
+    @property
+    def tagged_messages(self) -> dict[str, Message]:
+        return self._tagged_messages
+
+
+    @property
+    def messages(self) -> list[Prompt]:
+        return self._messages
+
+
+    def advance(self) -> Usables:
+        for item in self._walker:
+            if isinstance(item, _Awaiting):
+                prompt = item.prompt
+                return list(self._messages), item.format_keys, prompt.tag, prompt.schema, prompt.tools, prompt.hooks, prompt.validators, prompt.saves
+            if item.is_tagged and item.tag not in self._tagged_messages:
+                self._tagged_messages[item.tag] = item
+            self._messages.append(item)
+        return list(self._messages), self._format_keys, *([None] * 6)
+
+
+    def update_message(self, tag: str, message: Message):
+        for prompt in self._messages:
+            if prompt.is_tagged and prompt.tag == tag:
+                prompt.update_message(message)
@@ -2,24 +2,26 @@ from __future__ import annotations
 import copy
 import uuid
 
+from collections.abc import Iterator
 from typing import Any, Self, TypeAlias
 
-from vespwood_generator import Tag, Message
+from vespwood_generator import json_dumps, json_loads
 
 from vespwood.types import (
     Params,
     SchemaInfo, 
     ToolsList, 
     HooksList, 
-    ValidatorsList, 
-    Saves
+    ValidatorsList
 )
 from vespwood.parse_expr import parse_exprs, parse_dict
-from vespwood.match import match
+from vespwood.match import Predicate, compile_match
 from vespwood.expression import Expression
 from vespwood.logic import Logic
 from vespwood.format_object import FormatKeys
 from vespwood.message import Prompt
+from .plan import ExecutionPlan
+from . import cache as _cache
 
 
 
@@ -29,7 +31,41 @@ PromptStructureData: TypeAlias = "list[PromptStructureDataUnit | str]"
 PromptLike: TypeAlias = "Prompt | PromptStructure"
 
 
+_UNPICKLED = frozenset(("_predicate", "_plan", "_frozen"))
+
+
+def _frozen_guard(method):
+    def guarded(self, *args, **kwargs):
+        if self._frozen:
+            raise TypeError("PromptStructure is frozen, copy it before modifying it")
+        return method(self, *args, **kwargs)
+    guarded.__name__ = method.__name__
+    guarded.__doc__ = method.__doc__
+    return guarded
+
+
 class PromptStructure(list[PromptLike]):
+    """
+    Constructing a PromptStructure returns the node type for its configuration,
+    SequenceNode, ForNode, WhileNode, IfNode, SwitchNode or CaseNode. Each node
+    only has slots for its own attributes, the rest read as None.
+    """
+    __slots__ = "_id", "_name", "_description", "_schemas", "_tools", "_hooks", "_validators", "_params", "_indices", "_plan", "_frozen"
+    # Attributes a node type stores, everything else falls back to the defaults below
+    __node_attrs__: tuple[str, ...] = ()
+
+    _iterator = _iter_key = _index_key = None
+    _co_iterators = _co_iter_keys = _default_co_iter_values = None
+    _initial = _while = _if = _match = _then = _switch = _cases = None
+    _predicate = staticmethod(compile_match(None))
+
+    def __new__(cls, prompt_list: list[Prompt | PromptStructure] | None = None, /, **kwargs):
+        if cls is PromptStructure:
+            cls = _node_type(kwargs)
+        self = super().__new__(cls)
+        self._frozen = False
+        return self
+
 
     def __init__(self, 
                 prompt_list: list[Prompt | PromptStructure], 
@@ -63,33 +99,41 @@ class PromptStructure(list[PromptLike]):
         self._tools = tools
         self._hooks = hooks
         self._validators = validators
-        self._iterator = iterator
-        self._iter_key = iter_key
-        self._index_key = index_key
-        self._co_iterators = co_iterators
-        self._co_iter_keys = co_iter_keys
-        self._default_co_iter_values = default_co_iter_values
-        self._initial = initial
-        self._while = whilekey
-        self._if = ifkey
-        if isinstance(match, str):
-            match = parse_exprs(match)
-        elif isinstance(match, dict):
-            match = parse_dict(match)
-        self._match: str | int | bool | Logic | Expression = match
-        self._then = then
-        self._switch = switch
-        self._cases = cases
         self._params = params
+        self._indices: tuple[int, ...] = ()
+        self._plan: ExecutionPlan | None = None
+
+        node_attrs = self.__node_attrs__
+        if not node_attrs:
+            return
+        if "_match" in node_attrs:
+            if isinstance(match, str):
+                match = parse_exprs(match)
+            elif isinstance(match, dict):
+                match = parse_dict(match)
+            self._predicate: Predicate = compile_match(match)
+        values = {
+            "_iterator": iterator,
+            "_iter_key": iter_key,
+            "_index_key": index_key,
+            "_co_iterators": co_iterators,
+            "_co_iter_keys": co_iter_keys,
+            "_default_co_iter_values": default_co_iter_values,
+            "_initial": initial,
+            "_while": whilekey,
+            "_if": ifkey,
+            "_match": match,
+            "_then": then,
+            "_switch": switch,
+            "_cases": cases,
+        }
+        for attr in node_attrs:
+            setattr(self, attr, values[attr])
 
 
     def match(self, value: Any, format_keys: FormatKeys) -> bool:
-        if isinstance(self._match, str) or isinstance(self._match, Expression) or isinstance(self._match, Logic):
-            if self._params:
-                mapping = format_keys.get_params(self._params)
-                self._match = self._match.format_map(mapping)
-        result = match(value, self._match)
-        return result
+        mapping = format_keys.get_params(self._params) if self._params else None
+        return self._predicate(value, mapping)
     
 
     @classmethod
@@ -231,28 +275,77 @@ class PromptStructure(list[PromptLike]):
 
 
     @classmethod
-    def load_from_file(cls, file_name: str) -> Self:
-        with open(file_name, "r") as file:
-            structure = None
-            # Load from JSON file
-            if file_name.endswith(".json"):
-                import json
-                structure = json.load(file)
-            # Load from YAML file
-            elif file_name.endswith(".yaml"):
-                try:
-                    import yaml # type: ignore
-                except:
-                    raise ImportError("To load from prompt structure from a yaml file, you need to install the optional dependency yaml. Try running 'pip install vespwood[yaml]'") from None
-                structure = yaml.safe_load(file)
-
-            if isinstance(structure, dict): 
-                return PromptStructure.load_from_dict(structure)
-            elif isinstance(structure, list):
-                return PromptStructure.load_from_structure(
-                    structure, 
-                    name=file_name.split(".")[0]
-                )
+    def load_from_file(cls, file_name: str, *, cache: bool = True, cache_dir: str | None = None) -> Self:
+        """
+        Loads a JSON or YAML prompt structure. Loaded structures are pickled to
+        `__pycache__` next to the file (or `cache_dir`), keyed by a hash of the
+        file contents, so unchanged files skip parsing on the next load.
+        """
+        with open(file_name, "rb") as file:
+            source = file.read()
+
+        path = key = None
+        if cache:
+            key = _cache.content_key(source)
+            path = _cache.cache_path(file_name, cache_dir)
+            cached = _cache.load(path, key)
+            if cached is not None:
+                return cached
+
+        structure = None
+        # Load from JSON file
+        if file_name.endswith(".json"):
+            structure = json_loads(source)
+        # Load from YAML file
+        elif file_name.endswith(".yaml"):
+            try:
+                import yaml # type: ignore
+            except:
+                raise ImportError("To load from prompt structure from a yaml file, you need to install the optional dependency yaml. Try running 'pip install vespwood[yaml]'") from None
+            structure = yaml.safe_load(source)
+
+        if isinstance(structure, dict): 
+            self = PromptStructure.load_from_dict(structure)
+        elif isinstance(structure, list):
+            self = PromptStructure.load_from_structure(
+                structure, 
+                name=file_name.split(".")[0]
+            )
+        else:
+            return None
+
+        if cache:
+            _cache.store(path, key, self)
+        return self
+
+
+    @classmethod
+    def load_shared(cls, file_name: str) -> PromptStructure:
+        """
+        Same as load_from_file, but returns one frozen structure per file shared
+        across the process. It is loaded again only when the file changes.
+        """
+        from .registry import registry
+        return registry.load(file_name)
+
+
+    def __getstate__(self) -> dict[str, Any]:
+        state = {}
+        for klass in type(self).__mro__:
+            for attr in klass.__dict__.get("__slots__", ()):
+                # Compiled forms hold closures, they are rebuilt on load
+                if attr not in _UNPICKLED and hasattr(self, attr):
+                    state[attr] = getattr(self, attr)
+        return state
+
+
+    def __setstate__(self, state: dict[str, Any]):
+        for attr, value in state.items():
+            setattr(self, attr, value)
+        self._id = uuid.uuid4().hex
+        self._plan = None
+        if "_match" in self.__node_attrs__:
+            self._predicate = compile_match(self._match)
     
 
     @property
@@ -344,6 +437,11 @@ class PromptStructure(list[PromptLike]):
         return self._match
 
 
+    @property
+    def predicate(self) -> Predicate:
+        return self._predicate
+
+
     @property
     def then(self):
         return self._then
@@ -359,6 +457,11 @@ class PromptStructure(list[PromptLike]):
         return self._cases
 
 
+    @property
+    def indices(self) -> tuple[int, ...]:
+        return self._indices
+
+
     @property
     def is_iterator(self) -> bool:
         return self._iterator is not None
@@ -389,6 +492,67 @@ class PromptStructure(list[PromptLike]):
         return PromptStructure(list(self))
 
 
+    def compile(self) -> ExecutionPlan:
+        # Only frozen structures keep their plan, others can change after compiling, nested structures included
+        if self._plan is not None:
+            return self._plan
+        plan = ExecutionPlan.from_prompt_structure(self)
+        if self._frozen:
+            self._plan = plan
+        return plan
+
+
+    @property
+    def is_frozen(self) -> bool:
+        return self._frozen
+
+
+    def freeze(self) -> Self:
+        """
+        Marks this structure and every nested structure read-only, so it can be
+        shared between completors. copy() returns a mutable structure.
+        """
+        if self._frozen:
+            return self
+        nested = [*self, *(self._cases or ())]
+        if self._initial is not None: nested.append(self._initial)
+        if self._then is not None: nested.append(self._then)
+        for structure in nested:
+            if isinstance(structure, PromptStructure):
+                structure.freeze()
+        self._frozen = True
+        self.compile()
+        return self
+
+
+    def iter_prompts(self) -> Iterator[Prompt]:
+        """
+        Every prompt in this structure and its nested structures, in no particular order.
+        """
+        nested = [*self, *(self._cases or ())]
+        if self._initial is not None: nested.append(self._initial)
+        if self._then is not None: nested.append(self._then)
+        for item in nested:
+            if isinstance(item, PromptStructure):
+                yield from item.iter_prompts()
+            elif isinstance(item, Prompt):
+                yield item
+
+
+    append = _frozen_guard(list.append)
+    extend = _frozen_guard(list.extend)
+    insert = _frozen_guard(list.insert)
+    remove = _frozen_guard(list.remove)
+    pop = _frozen_guard(list.pop)
+    clear = _frozen_guard(list.clear)
+    sort = _frozen_guard(list.sort)
+    reverse = _frozen_guard(list.reverse)
+    __setitem__ = _frozen_guard(list.__setitem__)
+    __delitem__ = _frozen_guard(list.__delitem__)
+    __iadd__ = _frozen_guard(list.__iadd__)
+    __imul__ = _frozen_guard(list.__imul__)
+
+
     def copy(self) -> PromptStructure:
         new_co_iterators = self._co_iterators.copy() if self._co_iterators else None
         new_co_iter_keys = self._co_iter_keys.copy() if self._co_iter_keys else None
@@ -402,7 +566,7 @@ class PromptStructure(list[PromptLike]):
             for prompt_structure in self._cases:
                 new_case.append(prompt_structure.copy())
         
-        return PromptStructure(
+        new_self = PromptStructure(
             [p.copy() for p in self],
             id=self._id, 
             name=self._name,
@@ -426,6 +590,8 @@ class PromptStructure(list[PromptLike]):
             cases=new_case,
             params=new_params
         )
+        new_self._indices = self._indices
+        return new_self
     
     
     def __copy__(self):
@@ -449,138 +615,82 @@ class PromptStructure(list[PromptLike]):
 
 
     def __repr__(self) -> str:
-        data = self.json
-        import json
-        return json.dumps(data, indent=2)
+        return json_dumps(self.json, indent=True)
         
         
     def __str__(self) -> str:
-        data = self.json
-        import json
-        return json.dumps(data, indent=2)
+        return json_dumps(self.json, indent=True)
     
     
     def indexed(self, idx: int) -> "PromptStructure":
-        new_self = self.copy()
-        new_self.clear()
+        # Overlay sharing every node with self, the index is applied to tags while walking
+        view = PromptStructure(
+            self,
+            id=self._id,
+            name=self._name,
+            description=self._description,
+            schemas=self._schemas,
+            tools=self._tools,
+            hooks=self._hooks,
+            validators=self._validators,
+            iterator=self._iterator,
+            iter_key=self._iter_key,
+            index_key=self._index_key,
+            co_iterators=self._co_iterators,
+            co_iter_keys=self._co_iter_keys,
+            default_co_iter_values=self._default_co_iter_values,
+            initial=self._initial,
+            whilekey=self._while,
+            ifkey=self._if,
+            match=self._match,
+            then=self._then,
+            switch=self._switch,
+            cases=self._cases,
+            params=self._params
+        )
+        view._indices = (*self._indices, idx)
+        return view
 
-        new_self._then = new_self._then.indexed(idx) if new_self._then else new_self._then
-        new_self._cases = list(map(lambda case: case.indexed(idx), new_self._cases)) if new_self._cases else new_self._cases
-        new_self._initial = new_self._initial.indexed(idx) if new_self._initial else new_self._initial
 
-        for prompt in self:
-            if isinstance(prompt, PromptStructure):
-                new_self.append(prompt.indexed(idx))
-            else:
-                if prompt.is_tagged:
-                    prompt @= prompt.tag.indexed(idx)
-                    new_self.append(prompt.copy())
-                else:
-                    new_self.append(prompt.copy())
-        return new_self
-        
-    # TODO: Change FormatKeys to CompletedArgs (alias of dict[str, Any])
-    def get_usables(self, format_keys: FormatKeys, /, tagged_messages: dict[str, Message] = {}) -> tuple[list[Prompt], FormatKeys, Tag | None, SchemaInfo | None, ToolsList | None, HooksList | None, ValidatorsList | None, Saves | None]:
-        prompt_structure = self.copy()
-        msgs: list[Prompt] = []
-        allNone = ([None] * 6)
-
-        # Iterator
-        if prompt_structure.is_iterator:
-            if prompt_structure._params:
-                mapping = format_keys.get_params(prompt_structure._params)
-                prompt_structure._iterator = prompt_structure._iterator.format_map(mapping)
-                prompt_structure._co_iterators = [co_iter.format_map(mapping) for co_iter in (prompt_structure._co_iterators or [])]
-            iterator = format_keys[prompt_structure._iterator]
-            iter_key = prompt_structure._iter_key
-            index_key = prompt_structure._index_key
-            co_iterators = [format_keys[co_iter] for co_iter in (prompt_structure._co_iterators or [])]
-            co_iter_keys = prompt_structure._co_iter_keys
-            default_co_iter_values = prompt_structure._default_co_iter_values
-            for index, value in enumerate(iterator):
-                structure = None
-                if prompt_structure.has_initial and index == 0:
-                    structure = prompt_structure._initial
-                else:
-                    structure = prompt_structure.normalised
-                indexed_structure = structure.indexed(index)
-                extra_keys = { iter_key : value, index_key: index }
-                for idx, co_iterator in enumerate(co_iterators):
-                    if len(co_iterator) <= index or co_iterator[index] is None:
-                        extra_keys.update({co_iter_keys[idx]: default_co_iter_values[idx] if default_co_iter_values else None})
-                    else:
-                        extra_keys.update({co_iter_keys[idx]: co_iterator[index]})
-                format_keys = format_keys.copy_with_extra(**extra_keys)
-                prompts, format_keys, tag, *rest = indexed_structure.get_usables(format_keys, tagged_messages=tagged_messages)
-                msgs.extend(prompts)
-                if tag: return msgs, format_keys, tag, *rest
-            return msgs, format_keys, *allNone
-        
-        # Switch
-        elif prompt_structure.is_switch:
-            if prompt_structure._params:
-                mapping = format_keys.get_params(prompt_structure._params)
-                prompt_structure._switch = prompt_structure._switch.format_map(mapping)
-            case_data = format_keys[prompt_structure._switch]
-            for case in prompt_structure._cases:
-                if case.match(case_data, format_keys):
-                    return case.get_usables(format_keys, tagged_messages=tagged_messages)
-            normalised_structure = prompt_structure.normalised
-            return normalised_structure.get_usables(format_keys, tagged_messages=tagged_messages)
-            
-        # If
-        elif prompt_structure.is_if:
-            if prompt_structure._params:
-                mapping = format_keys.get_params(prompt_structure._params)
-                prompt_structure._if = prompt_structure._if.format_map(mapping)
-            case_data = format_keys[prompt_structure._if]
-            if prompt_structure.match(case_data, format_keys):
-                return prompt_structure._then.get_usables(format_keys, tagged_messages=tagged_messages)
-            normalised_structure = prompt_structure.normalised
-            return normalised_structure.get_usables(format_keys, tagged_messages=tagged_messages)
-        
-        # While
-        elif prompt_structure.is_while:
-            if prompt_structure._params:
-                mapping = format_keys.get_params(prompt_structure._params)
-                prompt_structure._while = prompt_structure._while.format_map(mapping)
-            case_data = format_keys[prompt_structure._while]
-            index_key = prompt_structure._index_key
-            index = 0
-            while prompt_structure.match(format_keys.get(f"{prompt_structure._while}?{self._id}#{index}", case_data), format_keys):
-                structure = None
-                if prompt_structure.has_initial and index == 0:
-                    structure = prompt_structure._initial
-                else:
-                    structure = prompt_structure.normalised
-                indexed_structure = structure.indexed(index)
-                extra_keys = { index_key: index }
-                format_keys = format_keys.copy_with_extra(**extra_keys)
-                prompts, format_keys, tag, *rest = indexed_structure.get_usables(format_keys, tagged_messages=tagged_messages)
-                msgs.extend(prompts)
-                if not f"{prompt_structure._while}?{self._id}#{index}" in format_keys:
-                    format_keys[f"{prompt_structure._while}?{self._id}#{index}"] = case_data
-                if tag: return msgs, format_keys, tag, *rest
-                index += 1
-            return msgs, format_keys, *allNone
-
-        # Normal
-        for prompt in prompt_structure:
-            if isinstance(prompt, PromptStructure):
-                prompts, format_keys, tag, *rest = prompt.get_usables(format_keys, tagged_messages=tagged_messages)
-                msgs.extend(prompts)
-                if tag: return msgs, format_keys, tag, *rest
-            else:
-                if prompt.params:
-                    mapping = format_keys.get_params(prompt._params)
-                    prompt = prompt.format_map(mapping)
-                if prompt.is_tagged:
-                    tag = prompt.tag
-                    if tag in tagged_messages:
-                        message = tagged_messages[tag]
-                        prompt.update_message(message)
-                    if prompt.response_awaited:
-                        return msgs, format_keys, tag, prompt.schema, prompt.tools, prompt.hooks, prompt.validators, prompt.saves    
-                msgs.append(prompt)
-
-        return msgs, format_keys, *allNone
\ No newline at end of file
+class SequenceNode(PromptStructure):
+    __slots__ = ()
+
+
+class CaseNode(PromptStructure):
+    __slots__ = "_match", "_predicate"
+    __node_attrs__ = "_match",
+
+
+class ForNode(PromptStructure):
+    __slots__ = "_iterator", "_iter_key", "_index_key", "_co_iterators", "_co_iter_keys", "_default_co_iter_values", "_initial"
+    __node_attrs__ = __slots__
+
+
+class WhileNode(PromptStructure):
+    __slots__ = "_while", "_match", "_predicate", "_index_key", "_initial"
+    __node_attrs__ = "_while", "_match", "_index_key", "_initial"
+
+
+class IfNode(PromptStructure):
+    __slots__ = "_if", "_match", "_predicate", "_then"
+    __node_attrs__ = "_if", "_match", "_then"
+
+
+class SwitchNode(PromptStructure):
+    __slots__ = "_switch", "_cases"
+    __node_attrs__ = __slots__
+
+
+def _node_type(kwargs: dict[str, Any]) -> type[PromptStructure]:
+    # Same precedence as the is_iterator, is_switch, is_if, is_while checks
+    if kwargs.get("iterator") is not None:
+        return ForNode
+    if kwargs.get("switch"):
+        return SwitchNode
+    if kwargs.get("ifkey") is not None:
+        return IfNode
+    if kwargs.get("whilekey") is not None:
+        return WhileNode
+    if kwargs.get("match") is not None:
+        return CaseNode
+    return SequenceNode
@@ -0,0 +1,57 @@
+from __future__ import annotations
+import os
+import threading
+
+from .prompt_structure import PromptStructure
+
+
+class PromptStructureRegistry:
+    """
+    Process-wide store of frozen prompt structures keyed by resolved path.
+    An entry is reloaded once the file's mtime or size changes.
+    """
+    __slots__ = "_entries", "_lock"
+
+    def __init__(self):
+        self._entries: dict[str, tuple[tuple[int, int], PromptStructure]] = {}
+        self._lock = threading.Lock()
+
+
+    def load(self, file_name: str) -> PromptStructure:
+        path = os.path.realpath(file_name)
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        entry = self._entries.get(path)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == version:
+                return entry[1]
+            structure = PromptStructure.load_from_file(file_name)
+            if structure is None:
+                return None
+            structure.freeze()
+            self._entries[path] = (version, structure)
+            return structure
+
+
+    def discard(self, file_name: str):
+        with self._lock:
+            self._entries.pop(os.path.realpath(file_name), None)
+
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+    def __contains__(self, file_name: str) -> bool:
+        return os.path.realpath(file_name) in self._entries
+
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+registry = PromptStructureRegistry()
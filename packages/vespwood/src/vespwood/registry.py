@@ -0,0 +1,112 @@
+from __future__ import annotations
+from collections.abc import Iterable, Iterator, Mapping
+from types import MappingProxyType
+from typing import Generic, TypeVar
+
+from vespwood_generator import Schema, Tool, Validator
+
+from vespwood.hook import Hook
+from vespwood.errors import MissingSchemaError, MissingToolError, MissingHookError, MissingValidatorError
+
+
+T = TypeVar("T")
+
+
+class NameIndex(Mapping[str, T], Generic[T]):
+    """
+    Read-only mapping from name to schema, tool, hook or validator. Lookups
+    of missing names raise the index's Missing*Error with every missing name.
+    """
+    __slots__ = "_items", "_error"
+
+    def __init__(self, items: Iterable[T], error: type[Exception]):
+        # The first item of a name wins, as bisect_left over the stably sorted list used to find it
+        by_name: dict[str, T] = {}
+        for item in items:
+            by_name.setdefault(item.name, item)
+        self._items: Mapping[str, T] = MappingProxyType(by_name)
+        self._error = error
+
+
+    def __getitem__(self, name: str) -> T:
+        try:
+            return self._items[name]
+        except KeyError:
+            raise self._error([name]) from None
+
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._items
+
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._items)
+
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+    def check(self, names: Iterable[str]):
+        if missing := [name for name in names if name not in self._items]:
+            raise self._error(missing)
+
+
+    def resolve(self, names: Iterable[str]) -> tuple[T, ...]:
+        """
+        Items for `names` in order.
+        """
+        names = tuple(names)
+        self.check(names)
+        return tuple(self._items[name] for name in names)
+
+
+    def sorted(self) -> list[T]:
+        return [self._items[name] for name in sorted(self._items)]
+
+
+    def __repr__(self) -> str:
+        return f"NameIndex({list(self._items)})"
+
+
+class Registry:
+    """
+    Schemas, tools, hooks and validators of a Completor, indexed by name.
+    Built once and never modified, so it can be shared between Completors.
+    """
+    __slots__ = "_schemas", "_tools", "_hooks", "_validators"
+
+    def __init__(self,
+                *,
+                schemas: Iterable[Schema] = (),
+                tools: Iterable[Tool] = (),
+                hooks: Iterable[Hook] = (),
+                validators: Iterable[Validator] = ()):
+        self._schemas: NameIndex[Schema] = NameIndex(schemas, MissingSchemaError)
+        self._tools: NameIndex[Tool] = NameIndex(tools, MissingToolError)
+        self._hooks: NameIndex[Hook] = NameIndex(hooks, MissingHookError)
+        self._validators: NameIndex[Validator] = NameIndex(validators, MissingValidatorError)
+
+
+    @property
+    def schemas(self) -> NameIndex[Schema]:
+        return self._schemas
+
+
+    @property
+    def tools(self) -> NameIndex[Tool]:
+        return self._tools
+
+
+    @property
+    def hooks(self) -> NameIndex[Hook]:
+        return self._hooks
+
+
+    @property
+    def validators(self) -> NameIndex[Validator]:
+        return self._validators
+
+
+    def __repr__(self) -> str:
+        return f"Registry(schemas={list(self._schemas)}, tools={list(self._tools)}, hooks={list(self._hooks)}, validators={list(self._validators)})"
@@ -0,0 +1,88 @@
+from __future__ import annotations
+from functools import lru_cache
+from string import Formatter
+from typing import Any, Mapping, NamedTuple
+from _string import formatter_field_name_split
+
+
+_formatter = Formatter()
+
+
+class Field(NamedTuple):
+    name: Any
+    accessors: tuple[tuple[bool, Any], ...]
+    conversion: str | None
+    format_spec: str | Template
+
+    def render(self, mapping: Mapping[str, Any]) -> str:
+        if self.name is None:
+            raise ValueError("Format string contains positional fields")
+        value = mapping[self.name]
+        for is_attr, key in self.accessors:
+            value = getattr(value, key) if is_attr else value[key]
+        if self.conversion:
+            value = _formatter.convert_field(value, self.conversion)
+        format_spec = self.format_spec
+        if isinstance(format_spec, Template):
+            format_spec = format_spec.format_map(mapping)
+        return format(value, format_spec)
+
+
+class Template:
+    """
+    A format string parsed once into literal segments and field references.
+    format_map renders it the same way str.format_map does.
+    """
+    __slots__ = "_source", "_segments", "_literal"
+
+    def __init__(self, source: str):
+        segments: list[str | Field] = []
+        for literal, field_name, format_spec, conversion in _formatter.parse(source):
+            if literal:
+                segments.append(literal)
+            if field_name is not None:
+                name, rest = formatter_field_name_split(field_name)
+                if isinstance(name, int) or name == "":
+                    name = None
+                if format_spec and "{" in format_spec:
+                    format_spec = Template(format_spec)
+                segments.append(Field(name, tuple(rest), conversion, format_spec or ""))
+        self._source = source
+        self._segments: tuple[str | Field, ...] = tuple(segments)
+        self._literal: str | None = None if any(isinstance(s, Field) for s in segments) else "".join(segments)
+
+
+    @classmethod
+    def compile(cls, source: str) -> Template:
+        return _compile(source)
+
+
+    @property
+    def source(self) -> str:
+        return self._source
+
+
+    @property
+    def has_fields(self) -> bool:
+        return self._literal is None
+
+
+    @property
+    def is_static(self) -> bool:
+        # Renders back to its own source, no fields and no escaped braces
+        return self._literal == self._source
+
+
+    def format_map(self, mapping: Mapping[str, Any]) -> str:
+        if self._literal is not None:
+            return self._literal
+        return "".join([s if isinstance(s, str) else s.render(mapping) for s in self._segments])
+
+
+    def __repr__(self) -> str:
+        return f"Template({self._source!r})"
+
+
+@lru_cache(maxsize=4096)
+def _compile(source: str) -> Template:
+    return Template(source)
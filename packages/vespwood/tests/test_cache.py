@@ -0,0 +1,92 @@
+import json
+import os
+
+import pytest
+
+from vespwood import PromptStructure
+from vespwood.prompt_structure import cache
+
+
+STRUCTURE = {"structure": [{"system": "sys"}, {"in": "items", "for": "it", "structure": [{"user": "{it}", "params": ["it"]}]}]}
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "prompt.json"
+    path.write_text(json.dumps(STRUCTURE))
+    return str(path)
+
+
+def parses(monkeypatch) -> list:
+    # A structure is stored after every parse
+    calls = []
+    store = cache.store
+    def counting(path, key, structure):
+        calls.append(path)
+        store(path, key, structure)
+    monkeypatch.setattr(cache, "store", counting)
+    return calls
+
+
+def test_second_load_comes_from_the_cache(source, monkeypatch):
+    calls = parses(monkeypatch)
+    first = PromptStructure.load_from_file(source)
+    second = PromptStructure.load_from_file(source)
+
+    assert len(calls) == 1
+    assert os.path.exists(cache.cache_path(source))
+    assert second is not first
+    assert second.json == first.json
+    assert second.id != first.id
+
+
+def test_changed_source_is_parsed_again(source, monkeypatch):
+    calls = parses(monkeypatch)
+    PromptStructure.load_from_file(source)
+    with open(source, "w") as file:
+        json.dump({"structure": [{"system": "changed"}]}, file)
+    structure = PromptStructure.load_from_file(source)
+
+    assert len(calls) == 2
+    assert structure[0].content == ["changed"]
+
+
+def test_other_version_is_parsed_again(source, monkeypatch):
+    calls = parses(monkeypatch)
+    PromptStructure.load_from_file(source)
+    monkeypatch.setattr(cache, "_CACHE_TAG", "vespwood-other")
+    PromptStructure.load_from_file(source)
+
+    assert len(calls) == 2
+    assert os.path.exists(cache.cache_path(source))
+
+
+def test_corrupt_cache_file_is_replaced(source, monkeypatch):
+    calls = parses(monkeypatch)
+    PromptStructure.load_from_file(source)
+    path = cache.cache_path(source)
+    with open(path, "wb") as file:
+        file.write(b"not a pickle")
+
+    structure = PromptStructure.load_from_file(source)
+
+    assert len(calls) == 2
+    assert structure.json == PromptStructure.load_from_dict(STRUCTURE).json
+    assert cache.load(path, cache.content_key(json.dumps(STRUCTURE).encode())) is not None
+
+
+def test_failed_store_leaves_no_files(tmp_path):
+    path = str(tmp_path / "cache" / "prompt.pickle")
+    cache.store(path, "key", lambda: None)
+
+    assert os.listdir(tmp_path / "cache") == []
+    assert cache.load(path, "key") is None
+
+
+def test_cache_dir_and_disabled_cache(source, tmp_path):
+    cache_dir = str(tmp_path / "shared")
+    PromptStructure.load_from_file(source, cache_dir=cache_dir)
+    PromptStructure.load_from_file(source, cache=False)
+
+    assert len(os.listdir(cache_dir)) == 1
+    assert not os.path.exists(cache.cache_path(source))
@@ -0,0 +1,135 @@
+import asyncio
+import time
+
+import pytest
+
+from vespwood import BlockDone, Completor, Generator, RateLimitError, RetryPolicy, ToolCall, ValidationError, tool, validator
+
+
+started: list[str] = []
+finished: list[str] = []
+
+
+@tool
+async def slow(name: str) -> str:
+    "Takes its time"
+    started.append(name)
+    await asyncio.sleep(0.1)
+    finished.append(name)
+    return f"ran {name}"
+
+
+@tool
+def other(name: str) -> str:
+    "Registered, but not offered for the response"
+    started.append(name)
+    return f"ran {name}"
+
+
+@pytest.fixture(autouse=True)
+def reset():
+    started.clear()
+    finished.clear()
+
+
+class ScriptedGenerator(Generator):
+    """
+    Streams the attempts in order, a tool call and then a text block after
+    `delay`. An attempt can also end with an error.
+    """
+    def __init__(self, *attempts, delay: float = 0.1):
+        self.attempts = list(attempts)
+        self.delay = delay
+        self.requests = []
+        self.started_while_streaming = []
+
+    async def __prompt__(self, messages, schema=None, tools=None, **kwargs):
+        raise AssertionError("Only streamed")
+
+    async def __prompt_stream__(self, messages, schema=None, tools=None, **kwargs):
+        self.requests.append(messages)
+        if not self.attempts:
+            yield BlockDone(0, "done")
+            return
+        name, error = self.attempts.pop(0)
+        yield BlockDone(0, ToolCall(id=name, name=name.split(":")[0], arguments={"name": name}))
+        await asyncio.sleep(self.delay)
+        self.started_while_streaming.append(list(started))
+        if error is not None:
+            raise error
+        yield BlockDone(1, "text")
+
+
+def completor(generator: Generator, validators: list | None = None, **kwargs) -> Completor:
+    response = {"assistant": None, "tag": "a", "tools": ["slow"]}
+    if validators:
+        response["validators"] = [validator.name for validator in validators]
+    structure = [{"user": "go"}, response, {"user": "next"}]
+    return Completor(generator, prompt_structure=structure, tools=[slow, other], validators=validators or [], stream=True, **kwargs)
+
+
+def tool_results(generator: ScriptedGenerator) -> list:
+    return [block.result for message in generator.requests[-1] for block in message if isinstance(block, ToolCall)]
+
+
+def test_tools_start_while_the_response_streams():
+    async def main(early: bool):
+        generator = ScriptedGenerator(("slow:a", None))
+        start = time.perf_counter()
+        await completor(generator, dispatch_tools_early=early)({})
+        return time.perf_counter() - start, tool_results(generator)
+
+    early, results = asyncio.run(main(True))
+    late, _ = asyncio.run(main(False))
+
+    assert results == ["ran slow:a"]
+    assert early < 0.18 <= late
+
+
+def test_tools_of_a_rejected_attempt_are_cancelled():
+    @validator
+    def reject_first(messages, response, format_keys):
+        if response.content[0].id == "slow:first":
+            raise ValidationError("again")
+
+    async def main():
+        generator = ScriptedGenerator(("slow:first", None), ("slow:second", None), delay=0.01)
+        await completor(generator, validators=[reject_first])({})
+        return tool_results(generator)
+
+    results = asyncio.run(main())
+
+    assert results == ["ran slow:second"]
+    assert started == ["slow:first", "slow:second"]
+    assert finished == ["slow:second"]
+
+
+def test_tools_of_a_rate_limited_attempt_are_cancelled_before_backing_off():
+    async def main():
+        generator = ScriptedGenerator(("slow:first", RateLimitError(retry_after=0.2)), ("slow:second", None), delay=0.01)
+        await completor(generator, retry_policy=RetryPolicy(backoff_base=0.001))({})
+        return tool_results(generator)
+
+    results = asyncio.run(main())
+
+    assert results == ["ran slow:second"]
+    assert finished == ["slow:second"]
+
+
+def test_tools_not_offered_for_the_response_never_start_early():
+    async def main():
+        generator = ScriptedGenerator(("other", None))
+        await completor(generator)({})
+        return generator.started_while_streaming
+
+    assert asyncio.run(main()) == [[]]
+
+
+def test_tools_are_cancelled_when_the_request_fails():
+    async def main():
+        generator = ScriptedGenerator(("slow:a", ValueError("boom")), delay=0.01)
+        await completor(generator)({})
+
+    with pytest.raises(ValueError):
+        asyncio.run(main())
+    assert started == ["slow:a"] and finished == []
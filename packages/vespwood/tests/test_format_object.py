@@ -0,0 +1,139 @@
+import json
+
+from vespwood.format_object import deep_convert, FormatKeys, FormatList, FormatStr, FormatInt, FormatFloat, FormatBytes
+
+
+def test_scope_falls_back_to_parent_keys():
+    parent = FormatKeys({"name": "bob", "doc": {"title": "a", "tags": ["x", "y"]}})
+    scope = parent.scoped(index=1)
+
+    assert scope["name"] == "bob"
+    assert scope["doc.title"] == "a"
+    assert scope["doc.tags#1"] == "y"
+    assert scope["index"] == 1
+    assert "name" in scope and "index" in scope and "missing" not in scope
+    assert scope.get("missing", 3) == 3
+    assert dict(scope) == {"name": "bob", "doc": {"title": "a", "tags": ["x", "y"]}, "index": 1}
+    assert len(scope) == 3
+
+
+def test_scope_shadows_parent_keys():
+    parent = FormatKeys({"it": "outer", "other": 1})
+    scope = parent.scoped(it="inner")
+    nested = scope.scoped(index=0)
+
+    assert scope["it"] == "inner"
+    assert nested["it"] == "inner"
+    assert parent["it"] == "outer"
+    assert dict(nested) == {"it": "inner", "other": 1, "index": 0}
+
+
+def test_scope_sees_later_parent_writes_but_keeps_its_own():
+    parent = FormatKeys({"count": 1, "items": [1, 2]})
+    scope = parent.scoped()
+
+    parent["count"] = 2
+    parent["items"].append(3)
+    scope["answer"] = "yes"
+    scope["count"] = 10
+
+    assert scope["count"] == 10
+    assert scope["items"] == [1, 2, 3]
+    assert parent["count"] == 2
+    assert "answer" not in parent
+
+
+def test_scope_extras_attach_to_parent_values():
+    parent = FormatKeys({"doc": {"tags": ["x"]}})
+    scope = parent.scoped()
+
+    scope["doc.tags?seen"] = True
+
+    assert parent["doc.tags?seen"] is True
+
+
+def test_indexed_set_through_dotted_path():
+    keys = FormatKeys({"doc": {"tags": ["x", "y"]}})
+
+    keys["doc.tags#1"] = "z"
+    keys["doc.tags#3"] = "w"
+
+    assert keys["doc.tags"] == ["x", "z", None, "w"]
+    assert "doc.tags#1" not in keys
+
+
+def test_pretty_format_of_a_scope_includes_parent_keys():
+    scope = FormatKeys({"name": "bob"}).scoped(index=0)
+
+    assert json.loads(format(scope, "pretty")) == {"name": "bob", "index": 0}
+
+
+def eager(data):
+    # What deep_convert returned before children were converted on access
+    if isinstance(data, dict):
+        return FormatKeys({key: eager(value) for key, value in data.items()})
+    if isinstance(data, list):
+        return FormatList([eager(value) for value in data])
+    return deep_convert(data)
+
+
+def assert_same(lazy, expected):
+    assert type(lazy) is type(expected)
+    assert lazy == expected
+    if isinstance(expected, dict):
+        for key in expected:
+            assert_same(lazy[key], dict.__getitem__(expected, key))
+    elif isinstance(expected, list):
+        for lazy_item, item in zip(lazy, expected):
+            assert_same(lazy_item, item)
+
+
+DATA = {"docs": [{"title": "a", "tags": ["x", 1]}, {"title": "b", "score": 2.5}, None, "c"], "raw": b"\x01"}
+
+
+def test_lazy_access_matches_eager_conversion():
+    assert_same(deep_convert(DATA), eager(DATA))
+
+
+def test_lazy_nested_access():
+    keys = deep_convert(DATA)
+
+    assert type(keys["docs"]) is FormatList
+    assert type(keys["docs"][0]) is FormatKeys
+    assert type(keys["docs#0.tags#0"]) is FormatStr
+    assert type(keys.docs[0].tags[1]) is FormatInt
+    assert type(keys["docs"][1]["score"]) is FormatFloat
+    assert keys["docs"][2] is None
+    assert type(keys["raw"]) is FormatBytes
+
+
+def test_lazy_slices_reversed_and_pop():
+    expected = eager(DATA)["docs"]
+
+    assert_same(deep_convert(DATA)["docs"][1:], expected[1:])
+    assert_same(deep_convert(DATA)["docs"][::-2], expected[::-2])
+    assert_same(FormatList(list(reversed(deep_convert(DATA)["docs"]))), FormatList(list(reversed(expected))))
+    docs = deep_convert(DATA)["docs"]
+    assert_same(docs.pop(), expected[-1])
+    assert_same(docs.pop(0), expected[0])
+    assert len(docs) == 2
+
+
+def test_lazy_values_are_converted_once():
+    keys = deep_convert(DATA)
+
+    assert keys["docs"] is keys["docs"]
+    assert keys["docs"][0] is keys["docs"][0]
+    assert next(iter(keys["docs"])) is keys["docs#0"]
+    assert dict.__getitem__(keys, "docs") is keys["docs"]
+
+
+def test_extras_stick_to_lazily_converted_values():
+    keys = deep_convert(DATA)
+
+    keys["docs#0.tags?seen"] = True
+    keys["docs#3?seen"] = False
+
+    assert keys["docs#0.tags?seen"] is True
+    assert keys["docs"][0]["tags"].extras == {"seen": True}
+    assert [doc for doc in keys["docs"]][3].extras == {"seen": False}
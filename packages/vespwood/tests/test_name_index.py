@@ -0,0 +1,63 @@
+import pytest
+
+from vespwood import Completor, Generator, Registry, Response, tool
+from vespwood.errors import MissingToolError
+
+
+@tool
+def first() -> str:
+    "First"
+    return "first"
+
+
+@tool(name="first")
+def shadowed() -> str:
+    "Same name as first"
+    return "shadowed"
+
+
+@tool
+def second() -> str:
+    "Second"
+    return "second"
+
+
+class EchoGenerator(Generator):
+    async def __prompt__(self, messages, schema=None, tools=None, **kwargs):
+        return Response("ok")
+
+
+def test_lookup_and_resolve_in_order():
+    tools = Registry(tools=[second, first]).tools
+
+    assert tools["first"] is first
+    assert "second" in tools and "third" not in tools
+    assert tools.resolve(["second", "first", "second"]) == (second, first, second)
+    assert tools.sorted() == [first, second]
+
+
+def test_first_item_of_a_duplicate_name_wins():
+    tools = Registry(tools=[first, shadowed]).tools
+
+    assert tools["first"] is first
+    assert len(tools) == 1
+
+
+def test_missing_names_are_reported_together():
+    tools = Registry(tools=[first]).tools
+
+    with pytest.raises(MissingToolError) as error:
+        tools.resolve(["first", "third", "fourth"])
+    assert error.value.tools == ["third", "fourth"]
+    with pytest.raises(MissingToolError):
+        tools["third"]
+
+
+def test_completor_takes_a_registry_or_lists():
+    structure = [{"user": "hi", "tools": ["first"]}]
+    registry = Registry(tools=[first])
+
+    assert Completor(EchoGenerator(), prompt_structure=structure, registry=registry).registry is registry
+    assert Completor(EchoGenerator(), prompt_structure=structure, tools=[first]).tools == [first]
+    with pytest.raises(ValueError):
+        Completor(EchoGenerator(), prompt_structure=structure, registry=registry, tools=[second])
@@ -0,0 +1,118 @@
+from vespwood_generator import Message, Response
+
+from vespwood import PromptStructure, MessageList
+from vespwood.format_object import FormatKeys
+
+
+def cursor(structure: list, **keys):
+    plan = PromptStructure.load_from_structure(structure).compile()
+    return plan.cursor(FormatKeys(keys), {})
+
+
+def texts(messages) -> list:
+    return [(message.role, *message.content) for message in messages]
+
+
+def respond(cursor, tag: str, content: str):
+    cursor.tagged_messages[tag] = Response([content]) @ tag
+
+
+def test_for_renders_every_item_with_index_and_co_iterators():
+    c = cursor([
+        {"in": "items", "for": "it", "co_iterators": ["co"], "co_iter_keys": ["c"], "default_co_iter_values": ["-"],
+         "initial": [{"user": "first {it} {c}", "params": ["it", "c"]}],
+         "structure": [{"user": "{index}: {it} {c}", "params": ["index", "it", "c"]}]},
+    ], items=["a", "b", "c"], co=["x"])
+    msgs, _, tag, *rest = c.advance()
+
+    assert tag is None and rest == [None] * 5
+    assert texts(msgs) == [("user", "first a x"), ("user", "1: b -"), ("user", "2: c -")]
+
+
+def test_if_and_switch_take_the_matching_branch():
+    c = cursor([
+        {"if": "n", "match": "gt 3", "then": [{"user": "big"}], "else": [{"user": "small"}]},
+        {"switch": "kind", "cases": [
+            {"case": "^a", "structure": [{"user": "case a"}]},
+            {"case": "b.*", "structure": [{"user": "case b"}]},
+        ], "default": [{"user": "default"}]},
+        {"switch": "other", "cases": [{"case": "^a", "structure": [{"user": "case a"}]}], "default": [{"user": "default"}]},
+    ], n=2, kind="bee", other="zed")
+    msgs, *_ = c.advance()
+
+    assert texts(msgs) == [("user", "small"), ("user", "case b"), ("user", "default")]
+
+
+def test_while_rereads_its_key_after_every_response():
+    c = cursor([
+        {"while": "go", "match": True, "structure": [
+            {"user": "turn {index}", "params": ["index"]},
+            {"assistant": None, "tag": "w"},
+        ]},
+        {"user": "done"},
+    ], go=True)
+
+    for index in range(3):
+        msgs, _, tag, *_ = c.advance()
+        assert tag == f"w#{index}"
+        assert texts(msgs)[-1] == ("user", f"turn {index}")
+        if index == 2:
+            c.format_keys["go"] = False
+        respond(c, tag, f"r{index}")
+
+    msgs, _, tag, *_ = c.advance()
+    assert tag is None
+    assert texts(msgs)[-2:] == [("assistant", "r2"), ("user", "done")]
+
+
+def test_resumes_after_an_awaited_tag_without_rendering_again():
+    c = cursor([
+        {"system": "sys"},
+        {"user": "question"},
+        {"assistant": None, "tag": "answer", "schema": "S", "saves": {"x": "y"}},
+        {"user": "follow up {answer}", "params": ["answer"]},
+        {"assistant": None, "tag": "second"},
+    ])
+    msgs, _, tag, schema, _, _, _, saves = c.advance()
+
+    assert tag == "answer" and schema == "S" and saves == {"x": "y"}
+    assert texts(msgs) == [("system", "sys"), ("user", "question")]
+    # Nothing changes until the awaited tag gets its response
+    msgs, _, tag, *_ = c.advance()
+    assert tag == "answer" and len(msgs) == 2
+
+    first = c.messages[0]
+    respond(c, "answer", "yes")
+    c.format_keys["answer"] = "yes"
+    msgs, _, tag, *_ = c.advance()
+
+    assert tag == "second"
+    assert texts(msgs) == [("system", "sys"), ("user", "question"), ("assistant", "yes"), ("user", "follow up yes")]
+    assert c.messages[0] is first
+
+
+def test_update_message_replaces_the_emitted_prompt():
+    c = cursor([{"user": "question"}, {"assistant": None, "tag": "answer"}, {"user": "next"}])
+    _, _, tag, *_ = c.advance()
+    respond(c, tag, "first")
+    c.advance()
+
+    c.update_message("answer", Message("assistant", ["edited"]))
+    msgs, *_ = c.advance()
+
+    assert texts(msgs) == [("user", "question"), ("assistant", "edited"), ("user", "next")]
+
+
+def test_message_list_prints_the_prompts_sent():
+    structure = PromptStructure.load_from_structure([
+        {"while": "go", "match": True, "structure": [{"user": "turn {index}", "params": ["index"]}, {"assistant": None, "tag": "w"}]},
+    ])
+    message_list = MessageList.from_prompt_structure(structure, keys={"go": True})
+    assert str(message_list) == "[]"
+
+    for index in range(2):
+        msgs, _, tag, *_ = message_list.get_prompt_list()
+        message_list.add_response(Response([f"r{index}"]) @ tag, keys={"go": index == 0})
+    msgs, _, tag, *_ = message_list.get_prompt_list()
+
+    assert str(message_list) == str(msgs)
@@ -0,0 +1,85 @@
+import json
+import os
+
+import pytest
+
+from vespwood import PromptStructure
+from vespwood.message import Prompt
+from vespwood.prompt_structure import PromptStructureRegistry
+
+
+STRUCTURE = {"structure": [{"system": "sys"}, {"if": "flag", "then": [{"user": "on"}], "else": [{"user": "off"}]}]}
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "prompt.json"
+    path.write_text(json.dumps(STRUCTURE))
+    return str(path)
+
+
+def test_returns_one_shared_frozen_instance(source):
+    registry = PromptStructureRegistry()
+    structure = registry.load(source)
+
+    assert registry.load(source) is structure
+    assert registry.load(os.path.join(os.path.dirname(source), ".", "prompt.json")) is structure
+    assert structure.is_frozen
+    assert source in registry and len(registry) == 1
+
+
+def test_shared_instance_can_not_be_modified(source):
+    structure = PromptStructureRegistry().load(source)
+
+    with pytest.raises(TypeError):
+        structure.append(Prompt("user", ["more"]))
+    with pytest.raises(TypeError):
+        structure[1].then.append(Prompt("user", ["nested"]))
+    with pytest.raises(TypeError):
+        del structure[0]
+
+    copy = structure.copy()
+    copy.append(Prompt("user", ["more"]))
+    assert not copy.is_frozen and len(copy) == 3 and len(structure) == 2
+
+
+def test_reloads_when_the_size_changes(source):
+    registry = PromptStructureRegistry()
+    structure = registry.load(source)
+    with open(source, "w") as file:
+        json.dump({"structure": [{"system": "changed"}]}, file)
+
+    reloaded = registry.load(source)
+
+    assert reloaded is not structure
+    assert reloaded[0].content == ["changed"]
+
+
+def test_reloads_when_the_mtime_changes(source):
+    registry = PromptStructureRegistry()
+    structure = registry.load(source)
+    stat = os.stat(source)
+    with open(source, "w") as file:
+        file.write(json.dumps(STRUCTURE).replace('"sys"', '"new"'))
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    reloaded = registry.load(source)
+
+    assert reloaded is not structure
+    assert reloaded[0].content == ["new"]
+
+
+def test_discard_and_clear(source):
+    registry = PromptStructureRegistry()
+    structure = registry.load(source)
+
+    registry.discard(source)
+    assert source not in registry
+    assert registry.load(source) is not structure
+
+    registry.clear()
+    assert len(registry) == 0
+
+
+def test_load_shared_uses_the_process_registry(source):
+    assert PromptStructure.load_shared(source) is PromptStructure.load_shared(source)